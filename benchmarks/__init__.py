@@ -0,0 +1 @@
+"""Бенчмарки заметочника: python -m benchmarks run|compare"""
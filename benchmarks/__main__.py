@@ -0,0 +1,63 @@
+"""Запуск набора бенчмарков.
+
+    python -m benchmarks run [--sizes 1000 10000 100000] [-o results.json] [--baseline base.json]
+    python -m benchmarks compare base.json results.json [--threshold 0.25]
+
+Код выхода 1, если при сравнении найдены регрессии.
+"""
+import argparse
+import sys
+
+from .suite import (DEFAULT_SIZES, DEFAULT_THRESHOLD, HEADER, compare, format_comparison,
+                    load_results, run, save_results)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Бенчмарки команд и методов Storage')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Прогнать бенчмарки')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help='Размеры корпуса (число заметок)')
+    run_parser.add_argument('--seed', type=int, default=42, help='Зерно генератора корпуса')
+    run_parser.add_argument('--repeats', type=int, default=30,
+                            help='Максимум замеров на случай')
+    run_parser.add_argument('--budget', type=float, default=2.0,
+                            help='Время на случай, секунд (минимум 3 замера)')
+    run_parser.add_argument('--only', nargs='+', help='Только случаи, содержащие эти строки')
+    run_parser.add_argument('--corpus-dir', help='Каталог для переиспользуемых корпусов')
+    run_parser.add_argument('-o', '--output', help='Файл для результатов в JSON')
+    run_parser.add_argument('--baseline', help='Сравнить с базовыми результатами')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Допустимое ухудшение (доля), по умолчанию 0.25')
+
+    compare_parser = subparsers.add_parser('compare', help='Сравнить результаты с базовыми')
+    compare_parser.add_argument('baseline', help='Базовые результаты (JSON)')
+    compare_parser.add_argument('current', help='Новые результаты (JSON)')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='Допустимое ухудшение (доля), по умолчанию 0.25')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        print(HEADER)
+        results = run(sizes=args.sizes, seed=args.seed, repeats=args.repeats,
+                      budget=args.budget, only=args.only, corpus_dir=args.corpus_dir)
+        if args.output:
+            save_results(results, args.output)
+            print(f"Результаты записаны в {args.output}")
+        if not args.baseline:
+            return 0
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        results = load_results(args.current)
+
+    rows = compare(baseline, results, args.threshold)
+    print(format_comparison(rows))
+    return 1 if any(row['regressions'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Сравнение вывода списка с полной загрузкой текста и с краткой проекцией
+на базе с большими заметками (вставленные логи по сотне КБ).
+
+Запуск: python benchmarks/bench_list.py [размеры...]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+
+# Средний размер текста заметки, символов
+CONTENT_SIZE = 100_000
+REPEATS = 3
+
+
+def fill(db_path, size):
+    rnd = random.Random(42)
+    line = "2024-01-01 00:00:00 INFO request handled in 12ms status=200\n"
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            'INSERT INTO notes (title, content, category, priority, tags, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((f"Лог {i}",
+              line * (rnd.randint(CONTENT_SIZE // 2, CONTENT_SIZE * 3 // 2) // len(line)),
+              "work", "medium", '["log"]', "active",
+              f"2024-01-01T00:00:{i % 60:02d}", "2024-01-01T00:00:00")
+             for i in range(size))
+        )
+
+
+def render(storage, full):
+    """То же, что делает list: выборка и форматирование каждой заметки"""
+    return "\n".join(str(note) for note in storage.find_notes(full=full))
+
+
+def measure(storage, full):
+    render(storage, full)  # прогрев кэша страниц
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        render(storage, full)
+    elapsed = (time.perf_counter() - start) / REPEATS * 1000
+
+    tracemalloc.start()
+    render(storage, full)
+    peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 5_000]
+    print(f"{'notes':>8} {'full, ms':>10} {'summary, ms':>12} {'full, MB':>10} {'summary, MB':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = Storage(db_path=os.path.join(tmp, "bench.db"))
+            storage.connection  # схема создается при первом обращении
+            fill(storage.db_path, size)
+            full_ms, full_mb = measure(storage, True)
+            summary_ms, summary_mb = measure(storage, False)
+            storage.close()
+            print(f"{size:>8} {full_ms:>10.1f} {summary_ms:>12.1f} {full_mb:>10.1f} {summary_mb:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Память на одну заметку при массовой загрузке: прежний Note с __dict__,
+Note на __slots__ и представление NoteRow поверх строки БД.
+
+Запуск: python benchmarks/bench_memory.py [размеры...]
+"""
+import gc
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.models import NoteCategory, NotePriority, Status
+from notebook.storage import Storage
+
+
+class LegacyNote:
+    """Прежняя модель: обычный класс с __dict__ у каждого экземпляра"""
+    TRACKED_FIELDS = frozenset(['title', 'content', 'category', 'priority',
+                                'tags', 'status', 'updated_at'])
+
+    def __init__(self, id, title, content, category=NoteCategory.OTHER,
+                 priority=NotePriority.MEDIUM, tags=None, status=Status.ACTIVE,
+                 created_at=None, updated_at=None):
+        object.__setattr__(self, '_dirty', set())
+        self.id = id
+        self.title = title
+        self.content = content
+        self.category = category
+        self.priority = priority
+        self.tags = tags or []
+        self.status = status
+        self.created_at = created_at or datetime.now().isoformat()
+        self.updated_at = updated_at or datetime.now().isoformat()
+        self._dirty.clear()
+
+    def __setattr__(self, name, value):
+        if name in self.TRACKED_FIELDS:
+            self._dirty.add(name)
+        object.__setattr__(self, name, value)
+
+
+def load_legacy(storage):
+    with storage.connection as conn:
+        rows = conn.execute('SELECT * FROM notes ORDER BY created_at DESC').fetchall()
+    return [LegacyNote(
+        id=row[0], title=row[1], content=row[2],
+        category=NoteCategory(row[3]) if row[3] else NoteCategory.OTHER,
+        priority=NotePriority(row[4]) if row[4] else NotePriority.MEDIUM,
+        tags=json.loads(row[5]) if row[5] and row[5] != "[]" else [],
+        status=Status(row[6]) if row[6] else Status.ACTIVE,
+        created_at=row[7], updated_at=row[8]
+    ) for row in rows]
+
+
+def fill(db_path, size):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            'INSERT INTO notes (title, content, category, priority, tags, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((f"Заметка {i}", f"Текст заметки {i}", "work", "medium", '["work", "todo"]',
+              "active", f"2024-01-01T00:00:{i % 60:02d}", "2024-01-01T00:00:00")
+             for i in range(size))
+        )
+
+
+def measure(load, size):
+    """Возвращает (байт на заметку, время загрузки в секундах)"""
+    # Время - без tracemalloc, он замедляет создание объектов в разы
+    gc.collect()
+    start = time.perf_counter()
+    notes = load()
+    elapsed = time.perf_counter() - start
+    del notes
+
+    gc.collect()
+    tracemalloc.start()
+    notes = load()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(notes) == size
+    del notes
+    return retained / size, elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'notes':>9} {'model':>16} {'bytes/note':>11} {'load, s':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = Storage(db_path=os.path.join(tmp, "bench.db"))
+            storage.connection  # схема создается при первом обращении
+            fill(storage.db_path, size)
+            for name, load in (("Note (__dict__)", lambda: load_legacy(storage)),
+                               ("Note (__slots__)", storage.load_notes),
+                               ("NoteRow", storage.load_rows)):
+                per_note, elapsed = measure(load, size)
+                print(f"{size:>9} {name:>16} {per_note:>11.0f} {elapsed:>8.2f}")
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Замер задержки add/edit/archive/delete при росте числа заметок.
+
+Запуск: python benchmarks/bench_point_writes.py [размеры...]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+from notebook.commands import Commands
+
+REPEATS = 50
+
+
+def fill(db_path, size):
+    """Быстро заполняет базу size заметками одной транзакцией"""
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            'INSERT INTO notes (title, content, category, priority, tags, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((f"Note {i}", f"Content {i}", "work", "medium", '["bench"]', "active",
+              "2024-01-01T00:00:00", "2024-01-01T00:00:00") for i in range(size))
+        )
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def run(size):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(db_path=os.path.join(tmp, "bench.db"))
+        storage.connection  # схема создается при первом обращении
+        fill(storage.db_path, size)
+        commands = Commands(storage)
+
+        ids = iter(range(1, size + 1))
+        return {
+            "add": measure(lambda: commands.add_note("Bench", "Bench content", "work")),
+            "edit": measure(lambda: commands.edit_note(size // 2, title="Edited")),
+            "archive": measure(lambda: commands.archive_note(next(ids))),
+            "delete": measure(lambda: commands.delete_note(next(ids))),
+        }
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"{'notes':>10} {'add, ms':>10} {'edit, ms':>10} {'archive, ms':>12} {'delete, ms':>11}")
+    for size in sizes:
+        r = run(size)
+        print(f"{size:>10} {r['add']:>10.3f} {r['edit']:>10.3f} {r['archive']:>12.3f} {r['delete']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
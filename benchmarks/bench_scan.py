@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Ускорение поиска перебором (search --substring/--regex) от числа процессов.
+
+Для каждого числа процессов пул создается заранее (запуск процессов
+в замер не входит), затем замеряется медиана поиска. Один процесс -
+перебор в текущем процессе, как на базах меньше порога.
+
+Запуск: python benchmarks/bench_scan.py [число заметок] [числа процессов...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.corpus import build_db
+from notebook.storage import Storage
+
+# Запросы, которые триграммный индекс не обслуживает (подстрока короче
+# трех символов, регулярные выражения), - иначе пул процессов не участвует
+QUERIES = [("тч", False), (r"ase\s+bu", True), (r"\bбюдж\w*\s+(релиз|тест)", True)]
+REPEATS = 5
+
+
+def measure(storage):
+    """Медиана времени одного запроса, мс"""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for term, regex in QUERIES:
+            storage._scan_ids(term, "all", regex)
+        samples.append((time.perf_counter() - start) * 1000 / len(QUERIES))
+    return statistics.median(samples)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cores = os.cpu_count() or 1
+    counts = ([int(arg) for arg in sys.argv[2:]] or
+              sorted({1, *(n for n in (2, 4, 8, 16, 32) if n < cores), cores}))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'notes.db')
+        build_db(db_path, size).close()
+
+        print(f"notes: {size}, cores: {cores}")
+        print(f"{'workers':>8} {'ms/query':>10} {'speedup':>9} {'efficiency':>11}")
+        baseline = None
+        for workers in counts:
+            storage = Storage(db_path=db_path, scan_threshold=0, scan_workers=workers)
+            try:
+                storage._scan_ids("прогрев", "all", False)
+                elapsed = measure(storage)
+            finally:
+                storage.close()
+            baseline = baseline or elapsed
+            speedup = baseline / elapsed
+            print(f"{workers:>8} {elapsed:>10.1f} {speedup:>8.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
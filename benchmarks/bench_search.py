@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Сравнение поиска по FTS5 и по триграммному индексу с прежним линейным перебором заметок.
+
+Запуск: python benchmarks/bench_search.py [размеры...]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+
+WORDS = ["проект", "отчет", "встреча", "покупки", "идея", "python", "sqlite",
+         "deadline", "release", "заметка", "задача", "план", "review", "bug"]
+# Словарь из ~4000 слов, чтобы запросы были избирательными, как в реальных заметках
+VOCABULARY = [f"{word}{n}" for word in WORDS for n in range(300)]
+QUERIES = [("отчет17", "all"), ("python42", "title"), ("release7", "content"), ("задача99", "tags")]
+REPEATS = 5
+
+
+def fill(db_path, size):
+    rnd = random.Random(42)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            'INSERT INTO notes (title, content, category, priority, tags, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((" ".join(rnd.choices(VOCABULARY, k=3)),
+              " ".join(rnd.choices(VOCABULARY, k=30)),
+              "work", "medium",
+              '["' + rnd.choice(VOCABULARY) + '"]',
+              "active", f"2024-01-01T00:00:{i % 60:02d}", "2024-01-01T00:00:00")
+             for i in range(size))
+        )
+
+
+def linear_search(storage, search_term, search_in):
+    """Прежняя реализация Commands.search_notes: перебор всех заметок в Python"""
+    search_term = search_term.lower()
+    found = []
+    for note in storage.load_notes():
+        if search_in in ["all", "title"] and search_term in note.title.lower():
+            found.append(note)
+        elif search_in in ["all", "content"] and search_term in note.content.lower():
+            found.append(note)
+        elif search_in in ["all", "tags"] and any(search_term in tag.lower() for tag in note.tags):
+            found.append(note)
+    return found
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for term, search_in in QUERIES:
+            func(term, search_in)
+    return (time.perf_counter() - start) / (REPEATS * len(QUERIES)) * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'notes':>10} {'linear, ms':>12} {'fts5, ms':>10} {'speedup':>9} "
+          f"{'trigram, ms':>12} {'speedup':>9}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = Storage(db_path=os.path.join(tmp, "bench.db"))
+            storage.set_trigram_index(True)  # индекс по запросу, схема - при первом обращении
+            fill(storage.db_path, size)
+            linear = measure(lambda term, where: linear_search(storage, term, where))
+            fts = measure(storage.search_notes)
+            # Та же семантика подстроки, что у линейного перебора
+            trigram = measure(storage.scan_notes)
+            print(f"{size:>10} {linear:>12.1f} {fts:>10.1f} {linear / fts:>8.1f}x "
+                  f"{trigram:>12.1f} {linear / trigram:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Замер времени холодного запуска CLI: отдельный процесс на каждый вызов.
+
+Кэш теплый: байткод уже скомпилирован (отдельный PYTHONPYCACHEPREFIX),
+файл базы в кэше страниц ОС после прогревочных запусков.
+
+Запуск: python benchmarks/bench_startup.py [число заметок]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.corpus import build_db
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+WARMUP = 3
+REPEATS = 20
+# Цель для медианы `main.py list --limit 20` на 10 000 заметок
+TARGET_MS = 60.0
+
+CASES = {
+    'python -c pass': ['-c', 'pass'],
+    'main.py --help': [MAIN, '--help'],
+    'main.py list --limit 20': [MAIN, 'list', '--limit', '20'],
+    'main.py search отчет --limit 20': [MAIN, 'search', 'отчет', '--limit', '20'],
+}
+
+
+def measure(args, cwd, env):
+    """Медиана и минимум времени выполнения процесса, мс"""
+    command = [sys.executable, *args]
+    for _ in range(WARMUP):
+        subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, check=True)
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        # main.py открывает notes.db в текущем каталоге
+        build_db(os.path.join(tmp, 'notes.db'), size).close()
+
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        env['PYTHONPYCACHEPREFIX'] = os.path.join(tmp, 'pycache')
+
+        print(f"{'case':<34} {'median, ms':>11} {'min, ms':>9}")
+        results = {}
+        for case, args in CASES.items():
+            results[case] = measure(args, tmp, env)
+            print(f"{case:<34} {results[case][0]:>11.1f} {results[case][1]:>9.1f}")
+
+        # Тот же list через резидентный демон (main.py daemon)
+        daemon = subprocess.Popen([sys.executable, MAIN, 'daemon'], cwd=tmp, env=env,
+                                  stdout=subprocess.DEVNULL)
+        try:
+            socket_file = os.path.join(tmp, 'notes.db.sock')
+            while not os.path.exists(socket_file):
+                time.sleep(0.05)
+            case = 'main.py list --limit 20 (демон)'
+            results[case] = measure(CASES['main.py list --limit 20'], tmp, env)
+            print(f"{case:<34} {results[case][0]:>11.1f} {results[case][1]:>9.1f}")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    median = results['main.py list --limit 20'][0]
+    verdict = "OK" if median <= TARGET_MS else "ПРЕВЫШЕНА"
+    print(f"\nЦель для list: {TARGET_MS:.0f} мс, медиана {median:.1f} мс - {verdict}")
+    return 0 if median <= TARGET_MS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
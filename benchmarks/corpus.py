@@ -0,0 +1,85 @@
+"""Детерминированный синтетический корпус заметок для бенчмарков.
+
+Одинаковые count и seed всегда дают одинаковые заметки: русский и
+английский текст, теги с распределением Ципфа (немного частых тегов и
+длинный хвост редких), смесь активных и архивных заметок.
+"""
+import contextlib
+import io
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from notebook.models import Note, NoteCategory, NotePriority, Status
+from notebook.storage import Storage
+
+RUSSIAN_WORDS = (
+    "проект отчет встреча задача план покупки идея заметка список дела срок "
+    "команда клиент договор бюджет релиз ошибка тест сервер база данные запрос "
+    "поиск индекс время неделя месяц утро вечер книга курс лекция экзамен "
+    "молоко хлеб подарок звонок письмо документ таблица график результат"
+).split()
+ENGLISH_WORDS = (
+    "project report meeting task plan shopping idea note list deadline team "
+    "client contract budget release bug test server database query search index "
+    "review deploy backlog sprint design draft feedback metrics latency cache "
+    "python sqlite migration refactor benchmark profile notebook"
+).split()
+
+# Пул тегов: частота k-го тега пропорциональна 1 / k
+TAGS = ([f"tag{n}" for n in range(1, 181)] +
+        "работа учеба дом срочно важно python sqlite идеи покупки книги "
+        "work study home urgent todo review bug release meeting travel".split())
+TAG_WEIGHTS = [1 / rank for rank in range(1, len(TAGS) + 1)]
+
+CATEGORY_WEIGHTS = {
+    NoteCategory.WORK: 30, NoteCategory.PERSONAL: 20, NoteCategory.STUDY: 15,
+    NoteCategory.SHOPPING: 10, NoteCategory.IDEAS: 15, NoteCategory.OTHER: 10,
+}
+PRIORITY_WEIGHTS = {NotePriority.LOW: 25, NotePriority.MEDIUM: 55, NotePriority.HIGH: 20}
+ARCHIVED_SHARE = 0.25
+
+START = datetime(2023, 1, 1)
+SPAN = timedelta(days=730)
+
+
+def _text(rnd: random.Random, words: int) -> str:
+    # Заметка пишется на одном языке, изредка с вкраплениями другого
+    main, other = (RUSSIAN_WORDS, ENGLISH_WORDS) if rnd.random() < 0.6 else (ENGLISH_WORDS, RUSSIAN_WORDS)
+    return " ".join(rnd.choice(other if rnd.random() < 0.1 else main) for _ in range(words))
+
+
+def generate_notes(count: int, seed: int = 42) -> Iterator[Note]:
+    """Выдает count заметок в порядке создания (ID назначит БД)"""
+    rnd = random.Random(seed)
+    categories, category_weights = zip(*CATEGORY_WEIGHTS.items())
+    priorities, priority_weights = zip(*PRIORITY_WEIGHTS.items())
+    cumulative_tags = list(itertools.accumulate(TAG_WEIGHTS))
+    step = SPAN / max(count, 1)
+
+    for i in range(count):
+        created = START + step * i
+        # Длина текста: в основном короткие заметки, изредка длинные
+        words = int(rnd.lognormvariate(3.5, 0.9)) + 1
+        tags = rnd.choices(TAGS, cum_weights=cumulative_tags, k=rnd.choice((0, 1, 1, 2, 2, 3, 5)))
+        updated = created + timedelta(minutes=rnd.randrange(0, 60 * 24 * 30))
+        yield Note(
+            id=None,
+            title=_text(rnd, rnd.randint(2, 7)).capitalize(),
+            content=_text(rnd, words),
+            category=rnd.choices(categories, category_weights)[0],
+            priority=rnd.choices(priorities, priority_weights)[0],
+            tags=list(dict.fromkeys(tags)),
+            status=Status.ARCHIVED if rnd.random() < ARCHIVED_SHARE else Status.ACTIVE,
+            created_at=created.isoformat(),
+            updated_at=updated.isoformat(),
+        )
+
+
+def build_db(db_path: str, count: int, seed: int = 42, **storage_options) -> Storage:
+    """Создает базу с корпусом из count заметок и возвращает открытое хранилище"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage = Storage(db_path=db_path, **storage_options)
+        storage.bulk_insert(generate_notes(count, seed))
+    return storage
@@ -0,0 +1,219 @@
+"""Набор бенчмарков команд и методов Storage на корпусах разного размера.
+
+Для каждого случая и размера корпуса измеряются перцентили задержки,
+пропускная способность и пиковая память (tracemalloc, отдельным прогоном).
+Результаты пишутся в JSON; режим compare сравнивает их с базовым файлом
+и отмечает регрессии.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from notebook.commands import Commands
+from notebook.models import NoteCategory, Status
+from notebook.storage import Storage
+
+from .corpus import build_db
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_THRESHOLD = 0.25
+# Разница меньше этой считается шумом, даже если превышает порог в процентах
+MIN_DELTA_MS = 0.05
+MIN_DELTA_MB = 0.5
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Перцентиль p (0..100) с линейной интерполяцией"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _cases(storage, commands: Commands, size: int) -> Dict[str, Callable[[], object]]:
+    """Замеряемые операции; каждая вызывается многократно на одной базе"""
+    counter = iter(range(10 ** 9))
+    ids = iter(range(1, 10 ** 9))
+    # Архивируются заметки с начала диапазона ID, удаляются - с конца,
+    # каждая один раз; edit меняет одну заметку в середине
+    archive_ids = iter(range(1, size + 1))
+    delete_ids = iter(range(size, 0, -1))
+    snapshot = []
+
+    def add_note():
+        n = next(counter)
+        return commands.add_note(f"Бенчмарк {n}", f"benchmark note {n} текст", "work",
+                                 tags=["bench", "todo"])
+
+    def save_notes():
+        # Перезапись тех же заметок; список загружается один раз
+        if not snapshot:
+            snapshot.extend(storage.load_notes())
+        return storage.save_notes(snapshot)
+
+    return {
+        'add_note': add_note,
+        'list_notes': lambda: commands.list_notes(),
+        'list_notes --limit 50': lambda: commands.list_notes(limit=50),
+        'list_notes -c work -s archived': lambda: commands.list_notes(category="work", status="archived"),
+        'search_notes': lambda: commands.search_notes("отчет"),
+        'search_notes --limit 50': lambda: commands.search_notes("project", limit=50),
+        'search_notes --top 20': lambda: commands.search_notes("отчет", top=20),
+        'search_notes --words --top 20': lambda: commands.search_notes("отчет", mode="words",
+                                                                       top=20),
+        'list_tags': lambda: commands.list_tags(),
+        'edit_note': lambda: commands.edit_note(size // 2, title=f"Изменено {next(counter)}"),
+        'archive_note': lambda: commands.archive_note(next(archive_ids)),
+        'delete_note': lambda: commands.delete_note(next(delete_ids)),
+        'Storage.get_note_by_id': lambda: storage.get_note_by_id(next(ids) % size + 1),
+        'Storage.find_notes': lambda: storage.find_notes(category=NoteCategory.STUDY,
+                                                         status=Status.ACTIVE),
+        'Storage.load_notes': storage.load_notes,
+        'Storage.save_notes': save_notes,
+    }
+
+
+def measure(func: Callable[[], object], repeats: int, budget: float) -> dict:
+    """Замеряет func не более repeats раз (и не меньше 3) в пределах budget секунд"""
+    func()  # прогрев: кэш страниц SQLite, ленивые инициализации
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeats:
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+        if len(samples) >= 3 and time.perf_counter() - started > budget:
+            break
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = sum(samples)
+    return {
+        'repeats': len(samples),
+        'mean_ms': total / len(samples),
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': max(samples),
+        'ops_per_sec': len(samples) / (total / 1000) if total else 0.0,
+        'peak_mb': peak / (1 << 20),
+    }
+
+
+def _corpus(tmp: str, size: int, seed: int, corpus_dir: Optional[str]) -> str:
+    """Путь к рабочей копии корпуса; готовые корпуса берутся из corpus_dir"""
+    path = os.path.join(tmp, f"bench-{size}.db")
+    if corpus_dir is None:
+        build_db(path, size, seed).close()
+        return path
+
+    cached = os.path.join(corpus_dir, f"corpus-{size}-{seed}.db")
+    if not os.path.exists(cached):
+        os.makedirs(corpus_dir, exist_ok=True)
+        build_db(cached, size, seed).close()
+    shutil.copyfile(cached, path)
+    return path
+
+
+def run(sizes=DEFAULT_SIZES, seed: int = 42, repeats: int = 30, budget: float = 2.0,
+        only: Optional[List[str]] = None, corpus_dir: Optional[str] = None,
+        log=print) -> dict:
+    """Прогоняет все случаи на корпусах заданных размеров"""
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            log(f"Корпус {size} заметок...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                storage = Storage(db_path=_corpus(tmp, size, seed, corpus_dir))
+            commands = Commands(storage)
+
+            for case, func in _cases(storage, commands, size).items():
+                if only and not any(name in case for name in only):
+                    continue
+                stats = measure(func, repeats, budget)
+                results.append({'case': case, 'size': size, **stats})
+                log(format_row(results[-1]))
+            storage.close()
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def format_row(result: dict) -> str:
+    return (f"{result['case']:<32} {result['size']:>9} {result['p50_ms']:>10.3f} "
+            f"{result['p90_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['ops_per_sec']:>10.1f} {result['peak_mb']:>9.2f}")
+
+
+HEADER = (f"{'case':<32} {'notes':>9} {'p50, ms':>10} {'p90, ms':>10} {'p99, ms':>10} "
+          f"{'ops/s':>10} {'peak, MB':>9}")
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """Сравнивает результаты по (case, size); возвращает строки с отметкой регрессий"""
+    base = {(r['case'], r['size']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = base.get((result['case'], result['size']))
+        if old is None:
+            continue
+        regressions = []
+        if (result['p50_ms'] > old['p50_ms'] * (1 + threshold)
+                and result['p50_ms'] - old['p50_ms'] > MIN_DELTA_MS):
+            regressions.append('latency')
+        if (result['peak_mb'] > old['peak_mb'] * (1 + threshold)
+                and result['peak_mb'] - old['peak_mb'] > MIN_DELTA_MB):
+            regressions.append('memory')
+        rows.append({
+            'case': result['case'],
+            'size': result['size'],
+            'p50_change': result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0,
+            'peak_change': result['peak_mb'] / old['peak_mb'] - 1 if old['peak_mb'] else 0.0,
+            'regressions': regressions,
+        })
+    return rows
+
+
+def format_comparison(rows: List[dict]) -> str:
+    lines = [f"{'case':<32} {'notes':>9} {'p50':>9} {'peak':>9}"]
+    for row in rows:
+        mark = f"  РЕГРЕССИЯ: {', '.join(row['regressions'])}" if row['regressions'] else ""
+        lines.append(f"{row['case']:<32} {row['size']:>9} {row['p50_change']:>+9.1%} "
+                     f"{row['peak_change']:>+9.1%}{mark}")
+    regressed = sum(1 for row in rows if row['regressions'])
+    lines.append(f"Регрессий: {regressed} из {len(rows)}")
+    return "\n".join(lines)
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def save_results(results: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, ensure_ascii=False, indent=2)
+        fp.write('\n')
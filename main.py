@@ -1,72 +1,415 @@
 #!/usr/bin/env python3
+import time
+
+# Отсчет для фазы импорта в --timings
+_STARTED = time.perf_counter()
+
 import argparse
+import functools
 import sys
-from notebook.storage import Storage
-from notebook.commands import Commands
 
 
-def main():
-    storage = Storage()
-    commands = Commands(storage)
+def __getattr__(name):
+    """Storage и Commands загружаются при первом обращении.
 
-    parser = argparse.ArgumentParser(description="Блокнот - управление заметками")
-    subparsers = parser.add_subparsers(dest='command', help='Доступные команды')
+    Клиенту демона хранилище не нужно, а его импорт - заметная доля
+    времени запуска. Доступ идет через атрибуты модуля (см. _module),
+    поэтому подмены main.Storage/main.Commands в тестах продолжают работать.
+    """
+    if name == 'Storage':
+        from notebook.storage import Storage
+        return Storage
+    if name == 'Commands':
+        from notebook.commands import Commands
+        return Commands
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _module():
+    return sys.modules[__name__]
+
+
+def positive_int(value: str) -> int:
+    """Тип аргумента argparse: целое число больше нуля"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число: '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"ожидается положительное число: {number}")
+    return number
 
-    # Команда добавления
-    add_parser = subparsers.add_parser('add', help='Добавить новую заметку')
+
+CATEGORIES = ['work', 'personal', 'study', 'shopping', 'ideas', 'other']
+PRIORITIES = ['low', 'medium', 'high']
+
+
+def _add_arguments(add_parser):
     add_parser.add_argument('title', help='Заголовок заметки')
     add_parser.add_argument('content', help='Текст заметки')
-    add_parser.add_argument('-c', '--category',
-                            choices=['work', 'personal', 'study', 'shopping', 'ideas', 'other'],
+    add_parser.add_argument('-c', '--category', choices=CATEGORIES,
                             default='other', help='Категория заметки')
-    add_parser.add_argument('-p', '--priority', choices=['low', 'medium', 'high'],
+    add_parser.add_argument('-p', '--priority', choices=PRIORITIES,
                             default='medium', help='Приоритет заметки')
     add_parser.add_argument('-t', '--tags', nargs='+', help='Теги через пробел')
 
-    # Команда списка
-    list_parser = subparsers.add_parser('list', help='Показать список заметок')
-    list_parser.add_argument('-c', '--category',
-                             choices=['work', 'personal', 'study', 'shopping', 'ideas', 'other'],
+
+def _list_arguments(list_parser):
+    list_parser.add_argument('-c', '--category', choices=CATEGORIES,
                              help='Фильтр по категории')
-    list_parser.add_argument('-p', '--priority', choices=['low', 'medium', 'high'],
+    list_parser.add_argument('-p', '--priority', choices=PRIORITIES,
                              help='Фильтр по приоритету')
     list_parser.add_argument('-s', '--status', choices=['active', 'archived'],
                              default='active', help='Статус заметок')
     list_parser.add_argument('--full', action='store_true',
                              help='Показать полное содержимое')
+    list_parser.add_argument('--limit', '--page-size', dest='limit', type=positive_int,
+                             help='Количество заметок на странице')
+    list_parser.add_argument('--after', help='Токен продолжения с предыдущей страницы')
+
 
-    # Команда поиска
-    search_parser = subparsers.add_parser('search', help='Поиск заметок')
+def _search_arguments(search_parser):
     search_parser.add_argument('search_term', help='Текст для поиска')
     search_parser.add_argument('--in', dest='search_in',
                                choices=['title', 'content', 'tags', 'all'],
                                default='all', help='Где искать')
+    search_parser.add_argument('--full', action='store_true',
+                               help='Показать полное содержимое')
+    search_parser.add_argument('--limit', '--page-size', dest='limit', type=positive_int,
+                               help='Количество результатов на странице')
+    search_parser.add_argument('--after', help='Токен продолжения с предыдущей страницы')
+    search_parser.add_argument('--top', type=positive_int, metavar='K',
+                               help='Показать K самых релевантных заметок (BM25)')
+    mode = search_parser.add_mutually_exclusive_group()
+    mode.add_argument('--substring', dest='mode', action='store_const', const='substring',
+                      help='Искать произвольную подстроку (по умолчанию)')
+    mode.add_argument('--words', dest='mode', action='store_const', const='words',
+                      help='Искать слова запроса по началу слов (индекс FTS5)')
+    mode.add_argument('--regex', dest='mode', action='store_const', const='regex',
+                      help='Искать по регулярному выражению (перебор заметок)')
+    mode.add_argument('--fuzzy', dest='mode', action='store_const', const='fuzzy',
+                      help='Искать слова с опечатками, самые похожие сначала')
+    search_parser.set_defaults(mode='substring')
 
-    # Команда удаления
-    delete_parser = subparsers.add_parser('delete', help='Удалить заметку')
-    delete_parser.add_argument('note_id', type=int, help='ID заметки')
 
-    # Команда архивации
-    archive_parser = subparsers.add_parser('archive', help='Архивировать заметку')
-    archive_parser.add_argument('note_id', type=int, help='ID заметки')
+def _note_id_argument(parser):
+    parser.add_argument('note_id', type=int, help='ID заметки')
 
-    # Команда редактирования
-    edit_parser = subparsers.add_parser('edit', help='Редактировать заметку')
+
+def _edit_arguments(edit_parser):
     edit_parser.add_argument('note_id', type=int, help='ID заметки')
     edit_parser.add_argument('--title', help='Новый заголовок')
     edit_parser.add_argument('--content', help='Новый текст')
-    edit_parser.add_argument('-c', '--category',
-                             choices=['work', 'personal', 'study', 'shopping', 'ideas', 'other'],
+    edit_parser.add_argument('-c', '--category', choices=CATEGORIES,
                              help='Новая категория')
-    edit_parser.add_argument('-p', '--priority', choices=['low', 'medium', 'high'],
+    edit_parser.add_argument('-p', '--priority', choices=PRIORITIES,
                              help='Новый приоритет')
     edit_parser.add_argument('-t', '--tags', nargs='+', help='Новые теги')
 
-    # Команда тегов
-    tags_parser = subparsers.add_parser('tags', help='Показать все теги')
 
+def _import_arguments(import_parser):
+    import_parser.add_argument('path', help='Файл JSON, JSONL или CSV')
+    import_parser.add_argument('-f', '--format', choices=['json', 'jsonl', 'csv'],
+                               help='Формат файла (по умолчанию - по расширению)')
+    import_parser.add_argument('--chunk-size', type=int, default=10000,
+                               help='Размер пачки вставки')
+    import_parser.add_argument('--keep-indexes', action='store_true',
+                               help='Не снимать индексы и триггеры на время загрузки')
+
+
+def _export_arguments(export_parser):
+    export_parser.add_argument('path', help="Файл ('-' - стандартный вывод) или каталог для markdown")
+    export_parser.add_argument('-f', '--format', choices=['json', 'jsonl', 'csv', 'markdown'],
+                               default='jsonl', help='Формат экспорта')
+    export_parser.add_argument('-z', '--gzip', action='store_true',
+                               help='Сжать вывод gzip')
+
+
+def _migrate_arguments(migrate_parser):
+    migrate_parser.add_argument('--dry-run', action='store_true',
+                                help='Показать недостающие миграции, ничего не меняя')
+    migrate_parser.add_argument('--batch-size', type=int,
+                                help='Заметок в одной транзакции дозаполнения')
+    migrate_parser.add_argument('--trigram', choices=['on', 'off'],
+                                help='Построить или удалить триграммный индекс поиска по подстроке')
+
+
+def _daemon_arguments(daemon_parser):
+    daemon_parser.add_argument('--workers', type=int, default=4,
+                               help='Число потоков, обслуживающих запросы')
+    daemon_parser.add_argument('--cache-size', type=int, default=256,
+                               help='Размер кэша результатов запросов на поток')
+
+
+def _batch_arguments(batch_parser):
+    batch_parser.add_argument('path', help="Файл с командами по одной на строку ('-' - стандартный ввод)")
+    batch_parser.add_argument('--group', type=int, default=500, metavar='N',
+                              help='Команд в одной транзакции')
+    batch_parser.add_argument('--stop-on-error', action='store_true',
+                              help='Остановиться на первой команде с ошибкой')
+
+
+# Команда -> (справка, функция добавления аргументов)
+COMMANDS = {
+    'add': ('Добавить новую заметку', _add_arguments),
+    'list': ('Показать список заметок', _list_arguments),
+    'search': ('Поиск заметок', _search_arguments),
+    'delete': ('Удалить заметку', _note_id_argument),
+    'archive': ('Архивировать заметку', _note_id_argument),
+    'edit': ('Редактировать заметку', _edit_arguments),
+    'tags': ('Показать все теги', None),
+    'import': ('Импортировать заметки из файла', _import_arguments),
+    'export': ('Экспортировать заметки', _export_arguments),
+    'migrate': ('Обновить схему базы данных', _migrate_arguments),
+    'daemon': ('Запустить резидентный сервер команд на Unix-сокете', _daemon_arguments),
+    'batch': ('Выполнить команды из файла в одном процессе', _batch_arguments),
+}
+
+
+def _requested_command(argv):
+    """Имя подкоманды из argv или None, если его нет или оно неизвестно"""
+    args = iter(argv)
+    for arg in args:
+        if arg == '--profile':
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg if arg in COMMANDS else None
+    return None
+
+
+def build_parser(argv=None):
+    """Строит парсер CLI.
+
+    Аргументы подкоманд добавляются только для вызванной команды; если
+    команда не распознана, строится полное дерево для справки и ошибок.
+    """
+    command = _requested_command(sys.argv[1:] if argv is None else argv)
+    parser = argparse.ArgumentParser(description="Блокнот - управление заметками")
+    parser.add_argument('--timings', action='store_true',
+                        help='Вывести в stderr время по фазам выполнения')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Записать профиль cProfile в FILE (смотреть: python -m pstats FILE)')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Выполнить команду в этом процессе, даже если запущен демон')
+    subparsers = parser.add_subparsers(dest='command', help='Доступные команды')
+
+    for name, (help_text, add_arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if add_arguments is not None and command in (None, name):
+            add_arguments(subparser)
+    return parser
+
+
+def main():
+    main_started = time.perf_counter()
+    parser = build_parser()
     args = parser.parse_args()
 
+    if args.command == 'daemon':
+        serve(args)
+        return
+    # Замеры и профиль относятся к этому процессу, поэтому с ними демон не используется
+    if not (args.timings or args.profile or args.no_daemon) and forward(args):
+        return
+
+    timings = None
+    if args.timings:
+        from notebook.timings import Timings
+        timings = Timings()
+        timings.started = _STARTED
+        timings.record('import', main_started - _STARTED)
+        timings.record('argparse', time.perf_counter() - main_started)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        run(args, parser, timings)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Профиль записан в {args.profile}", file=sys.stderr)
+        if timings is not None:
+            print(timings.report(), file=sys.stderr)
+
+
+def command_call(args):
+    """Метод Commands и его аргументы для разобранной команды; None, если команда неизвестна"""
+    if args.command == 'add':
+        return 'add_note', (), dict(
+            title=args.title,
+            content=args.content,
+            category=args.category,
+            priority=args.priority,
+            tags=args.tags
+        )
+    if args.command == 'list':
+        return 'list_notes', (), dict(
+            category=args.category,
+            priority=args.priority,
+            status=args.status,
+            show_content=args.full,
+            limit=args.limit,
+            after=args.after
+        )
+    if args.command == 'search':
+        return 'search_notes', (), dict(
+            search_term=args.search_term,
+            search_in=args.search_in,
+            limit=args.limit,
+            after=args.after,
+            show_content=args.full,
+            mode=args.mode,
+            top=args.top
+        )
+    if args.command == 'delete':
+        return 'delete_note', (args.note_id,), {}
+    if args.command == 'archive':
+        return 'archive_note', (args.note_id,), {}
+    if args.command == 'edit':
+        return 'edit_note', (), dict(
+            note_id=args.note_id,
+            title=args.title,
+            content=args.content,
+            category=args.category,
+            priority=args.priority,
+            tags=args.tags
+        )
+    if args.command == 'tags':
+        return 'list_tags', (), {}
+    if args.command == 'import':
+        return 'import_notes', (), dict(
+            path=args.path,
+            fmt=args.format,
+            chunk_size=args.chunk_size,
+            defer_indexes=not args.keep_indexes
+        )
+    if args.command == 'export':
+        return 'export_notes', (), dict(
+            path=args.path,
+            fmt=args.format,
+            compress=args.gzip
+        )
+    if args.command == 'migrate':
+        trigram = None if args.trigram is None else args.trigram == 'on'
+        return 'migrate', (), dict(dry_run=args.dry_run, batch_size=args.batch_size,
+                                   trigram=trigram)
+    return None
+
+
+def forward(args) -> bool:
+    """Выполняет команду в запущенном демоне; False, если демона нет"""
+    call = command_call(args)
+    if call is None:
+        return False
+    method, positional, kwargs = call
+
+    from notebook import client
+    if method not in client.READ_COMMANDS and method not in client.WRITE_COMMANDS:
+        return False
+    try:
+        response = client.request(client.socket_path(), method, positional, kwargs)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: нет ответа от демона: {e}")
+        sys.exit(1)
+    if response is None:
+        return False
+
+    sys.stdout.write(response['output'])
+    if not response['ok']:
+        print(f"Ошибка: {response['error']}")
+        sys.exit(1)
+    print(response['result'])
+    return True
+
+
+def serve(args):
+    """Команда daemon: держит хранилище открытым и обслуживает клиентов до SIGINT/SIGTERM"""
+    import signal
+    from notebook.client import socket_path
+    from notebook.daemon import Daemon
+
+    def terminate(signum, frame):
+        raise SystemExit(0)
+
+    storage = _module().Storage(cache_size=args.cache_size)
+    server = Daemon(storage, socket_path(), workers=args.workers)
+    try:
+        server.bind()
+    except (RuntimeError, OSError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, terminate)
+    print(f"Демон слушает {server.path} (Ctrl+C - остановить)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        storage.close()
+
+
+@functools.lru_cache(maxsize=None)
+def _command_parser(command):
+    """Парсер для подкоманды, общий для всех строк пакета с ней"""
+    return build_parser([command] if command else [])
+
+
+def parse_command_line(line):
+    """Строка пакета в синтаксисе CLI -> вызов Commands; ValueError при ошибке разбора"""
+    import contextlib
+    import io
+    import shlex
+
+    argv = shlex.split(line)
+    # Построение парсера дороже разбора строки, поэтому он строится раз на команду
+    parser = _command_parser(_requested_command(argv))
+    errors = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(errors):
+            args = parser.parse_args(argv)
+    except SystemExit:
+        message = errors.getvalue().strip().splitlines()
+        raise ValueError(message[-1].split("error: ", 1)[-1] if message else "неверные аргументы")
+    call = command_call(args)
+    if call is None:
+        raise ValueError(f"неизвестная команда: {line}")
+    return call
+
+
+def batch(args, commands):
+    """Команда batch: команды из файла или stdin через один Storage и Commands"""
+    from notebook.batch import BatchRunner
+
+    runner = BatchRunner(commands, parse_command_line, group_size=args.group,
+                         stop_on_error=args.stop_on_error)
+    if args.path == '-':
+        runner.run(sys.stdin)
+    else:
+        with open(args.path, encoding='utf-8') as source:
+            runner.run(source)
+    print(runner.report(), file=sys.stderr)
+    if runner.stats['failed']:
+        sys.exit(1)
+
+
+def run(args, parser, timings=None):
+    """Выполняет разобранную команду в этом процессе"""
+    module = _module()
+    # Команда migrate сама управляет обновлением схемы
+    options = {'auto_migrate': False} if args.command == 'migrate' else {}
+    if timings is not None:
+        with timings.phase('storage.open'):
+            storage = module.Storage(timings=timings, **options)
+    else:
+        storage = module.Storage(**options)
+    commands = module.Commands(storage, timings=timings)
+
     if not args.command:
         # Если команда не указана, показываем справку и список заметок
         parser.print_help()
@@ -76,45 +419,21 @@ def main():
         return
 
     try:
-        if args.command == 'add':
-            result = commands.add_note(
-                title=args.title,
-                content=args.content,
-                category=args.category,
-                priority=args.priority,
-                tags=args.tags
-            )
-        elif args.command == 'list':
-            result = commands.list_notes(
-                category=args.category,
-                priority=args.priority,
-                status=args.status,
-                show_content=args.full
-            )
-        elif args.command == 'search':
-            result = commands.search_notes(
-                search_term=args.search_term,
-                search_in=args.search_in
-            )
-        elif args.command == 'delete':
-            result = commands.delete_note(args.note_id)
-        elif args.command == 'archive':
-            result = commands.archive_note(args.note_id)
-        elif args.command == 'edit':
-            result = commands.edit_note(
-                note_id=args.note_id,
-                title=args.title,
-                content=args.content,
-                category=args.category,
-                priority=args.priority,
-                tags=args.tags
-            )
-        elif args.command == 'tags':
-            result = commands.list_tags()
-        else:
+        if args.command == 'batch':
+            batch(args, commands)
+            return
+        call = command_call(args)
+        if call is None:
             result = "Неизвестная команда"
+        else:
+            method, positional, kwargs = call
+            result = getattr(commands, method)(*positional, **kwargs)
 
-        print(result)
+        if args.command == 'export' and args.path == '-':
+            # В stdout уже записаны сами записи; итог туда не добавляется
+            print(result, file=sys.stderr)
+        else:
+            print(result)
 
     except Exception as e:
         print(f"Ошибка: {e}")
@@ -0,0 +1,190 @@
+"""Асинхронный API поверх Storage и Commands для встраивания в asyncio-сервисы.
+
+Вся работа с базой идет вне цикла событий: записи - в одном выделенном
+потоке (у него свое долгоживущее соединение), чтения - в небольшом пуле
+потоков, каждый со своим соединением, поэтому чтения идут параллельно
+(WAL). Имена методов совпадают с синхронными.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from .commands import Commands
+from .storage import Storage
+
+# Сколько пачек строк поток чтения держит впереди потребителя
+STREAM_PREFETCH = 4
+# Сколько операций может ждать своей очереди в потоках; следующие вызовы
+# ждут в цикле событий, а не копятся в очереди исполнителя
+MAX_PENDING = 64
+
+
+class AsyncStorage:
+    """Асинхронная обертка над Storage.
+
+    Использование:
+        async with AsyncStorage("notes.db") as storage:
+            note_id = await storage.add_note(note)
+            async for row in storage.iter_rows():
+                ...
+    """
+
+    # Методы Storage, выполняемые в пуле чтения
+    READ_METHODS = ('load_notes', 'load_rows', 'find_notes', 'search_notes', 'scan_notes',
+                    'fuzzy_notes', 'has_notes', 'get_next_id', 'get_all_tags',
+                    'get_tag_counts', 'get_note_by_id', 'load_rendered', 'schema_version')
+    # Методы Storage, выполняемые в потоке записи (по одному, в порядке вызова)
+    WRITE_METHODS = ('save_notes', 'bulk_insert', 'add_note', 'update_note', 'delete_note',
+                     'update_status', 'save_rendered', 'migrate')
+
+    def __init__(self, db_path: str = "notes.db", readers: int = 4,
+                 max_pending: int = MAX_PENDING, storage: Optional[Storage] = None,
+                 **storage_options):
+        self.storage = storage if storage is not None else Storage(db_path, **storage_options)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notes-writer')
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='notes-reader')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Дожидается начатых операций и закрывает соединения"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.storage.close()
+
+    async def _run(self, executor, func, *args, **kwargs):
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def run_read(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в пуле чтения"""
+        return await self._run(self._readers, func, *args, **kwargs)
+
+    async def run_write(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в потоке записи (например, работу с session())"""
+        return await self._run(self._writer, func, *args, **kwargs)
+
+    async def iter_rows(self, batch_size: int = 1000,
+                        prefetch: int = STREAM_PREFETCH) -> AsyncIterator[tuple]:
+        """Потоково выдает строки (id + COLUMNS), как Storage.iter_rows.
+
+        Поток чтения опережает потребителя не больше чем на prefetch пачек:
+        очередь ограничена, и при ее заполнении поток ждет (обратное
+        давление). Если потребитель прекращает обход, чтение останавливается.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        stopped = threading.Event()
+        done = object()
+
+        def produce():
+            def put(item):
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+            rows = self.storage.iter_rows(batch_size)
+            try:
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        put(batch)
+                        batch = []
+                        if stopped.is_set():
+                            return
+                put(batch)
+            except BaseException as e:
+                put(e)
+            finally:
+                rows.close()
+                if not stopped.is_set():
+                    put(done)
+
+        producer = loop.run_in_executor(self._readers, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                for row in item:
+                    yield row
+        finally:
+            stopped.set()
+            # Освобождаем поток, если он ждет места в очереди
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0)
+            await producer
+
+
+def _delegate(name: str, write: bool):
+    method = getattr(Storage, name)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        run = self.run_write if write else self.run_read
+        return await run(getattr(self.storage, name), *args, **kwargs)
+    return wrapper
+
+
+for _name in AsyncStorage.READ_METHODS:
+    setattr(AsyncStorage, _name, _delegate(_name, write=False))
+for _name in AsyncStorage.WRITE_METHODS:
+    setattr(AsyncStorage, _name, _delegate(_name, write=True))
+
+
+class AsyncCommands:
+    """Асинхронная обертка над Commands с теми же именами методов.
+
+    Команды целиком (запросы и отрисовка) выполняются в потоках AsyncStorage;
+    у каждого потока свой экземпляр Commands, так как кэш отрисовки
+    не рассчитан на одновременный доступ из нескольких потоков.
+    """
+
+    READ_METHODS = ('list_notes', 'search_notes', 'list_tags', 'export_notes')
+    WRITE_METHODS = ('add_note', 'delete_note', 'archive_note', 'edit_note',
+                     'import_notes', 'migrate')
+
+    def __init__(self, storage: AsyncStorage):
+        self.storage = storage
+        self._local = threading.local()
+
+    def _commands(self):
+        commands = getattr(self._local, 'commands', None)
+        if commands is None:
+            commands = self._local.commands = Commands(self.storage.storage)
+        return commands
+
+    def _call(self, name: str, *args, **kwargs):
+        return getattr(self._commands(), name)(*args, **kwargs)
+
+
+def _delegate_command(name: str, write: bool):
+    method = getattr(Commands, name)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        run = self.storage.run_write if write else self.storage.run_read
+        return await run(self._call, name, *args, **kwargs)
+    return wrapper
+
+
+for _name in AsyncCommands.READ_METHODS:
+    setattr(AsyncCommands, _name, _delegate_command(_name, write=False))
+for _name in AsyncCommands.WRITE_METHODS:
+    setattr(AsyncCommands, _name, _delegate_command(_name, write=True))
+del _name
@@ -0,0 +1,121 @@
+"""Пакетный режим: много команд в одном процессе и общих транзакциях.
+
+Каждая строка входа - одна команда: в синтаксисе CLI
+(add "Заголовок" "Текст" -t идея) или JSON-объект в формате запроса
+к демону ({"command": "add_note", "args": [], "kwargs": {...}}).
+Пустые строки и строки, начинающиеся с #, пропускаются.
+
+Команды выполняются группами по group_size в одной транзакции записи:
+фиксация и перенос в словарь нечеткого поиска - раз на группу, а не
+на каждую команду. Каждая команда - точка сохранения внутри группы,
+поэтому упавшая команда откатывает только свои изменения.
+"""
+import json
+import sys
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+# Методы Commands, доступные в пакете: migrate и daemon управляют
+# процессом и схемой, а не заметками
+BATCH_COMMANDS = frozenset({
+    'add_note', 'list_notes', 'search_notes', 'delete_note', 'archive_note',
+    'edit_note', 'list_tags', 'import_notes', 'export_notes',
+})
+# Команд в одной транзакции по умолчанию
+GROUP_SIZE = 500
+
+# (метод Commands, позиционные аргументы, именованные аргументы)
+Call = Tuple[str, tuple, dict]
+
+
+def parse_json(line: str) -> Call:
+    """Команда из JSON-строки в формате запроса к демону; ValueError при ошибке"""
+    try:
+        payload = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"некорректный JSON: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("JSON-команда должна быть объектом")
+    args = payload.get('args', [])
+    kwargs = payload.get('kwargs', {})
+    if not isinstance(args, list) or not isinstance(kwargs, dict):
+        raise ValueError("args должен быть списком, а kwargs - объектом")
+    return payload.get('command'), tuple(args), kwargs
+
+
+def commands_from(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Непустые строки-команды с номерами строк (с 1)"""
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield lineno, line
+
+
+class BatchRunner:
+    """Выполняет команды пакета через один экземпляр Commands.
+
+    parse_cli разбирает строку в синтаксисе CLI в Call (его дает main.py,
+    где описан парсер аргументов). Результат каждой команды печатается
+    в out строкой "<номер строки>: <результат>".
+    """
+
+    def __init__(self, commands, parse_cli: Callable[[str], Call],
+                 group_size: int = GROUP_SIZE, stop_on_error: bool = False,
+                 out: Optional[TextIO] = None):
+        if group_size <= 0:
+            raise ValueError("Размер группы должен быть положительным числом")
+        self.commands = commands
+        self.parse_cli = parse_cli
+        self.group_size = group_size
+        self.stop_on_error = stop_on_error
+        self.out = out
+        self.stats: Dict[str, float] = {'commands': 0, 'failed': 0, 'transactions': 0, 'seconds': 0.0}
+
+    def run(self, lines: Iterable[str]) -> Dict[str, float]:
+        """Выполняет все команды; возвращает статистику (см. report)"""
+        storage = self.commands.storage
+        source = commands_from(lines)
+        started = time.perf_counter()
+        stopped = False
+        try:
+            while not stopped:
+                group = list(islice(source, self.group_size))
+                if not group:
+                    break
+                with storage.write_transaction():
+                    self.stats['transactions'] += 1
+                    for lineno, line in group:
+                        ok = self.execute(lineno, line)
+                        if not ok and self.stop_on_error:
+                            # Выполненные до ошибки команды группы фиксируются
+                            stopped = True
+                            break
+        finally:
+            self.stats['seconds'] = time.perf_counter() - started
+        return self.stats
+
+    def execute(self, lineno: int, line: str) -> bool:
+        """Выполняет одну команду и печатает результат; False при ошибке"""
+        self.stats['commands'] += 1
+        try:
+            method, positional, kwargs = parse_json(line) if line.startswith('{') else self.parse_cli(line)
+            if method not in BATCH_COMMANDS:
+                raise ValueError(f"команда {method} недоступна в пакетном режиме")
+            with self.commands.storage.write_transaction():
+                result = getattr(self.commands, method)(*positional, **kwargs)
+            ok = not str(result).startswith("Ошибка")
+        except Exception as e:
+            result, ok = f"Ошибка: {e}", False
+        if not ok:
+            self.stats['failed'] += 1
+        print(f"{lineno}: {result}", file=self.out or sys.stdout)
+        return ok
+
+    def report(self) -> str:
+        """Сводка: число команд, ошибок, транзакций и команд в секунду"""
+        stats = self.stats
+        rate = stats['commands'] / stats['seconds'] if stats['seconds'] else 0.0
+        return (f"Команд: {stats['commands']}, ошибок: {stats['failed']}, "
+                f"транзакций: {stats['transactions']}, "
+                f"время: {stats['seconds']:.3f} с, {rate:.0f} команд/с")
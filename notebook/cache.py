@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class QueryCache:
+    """Ограниченный по размеру и времени жизни кэш результатов запросов.
+
+    Каждое обращение передает отметку версии данных (stamp). Если она
+    отличается от отметки, с которой кэш заполнялся, все записи устарели
+    и кэш очищается целиком.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stamp = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, stamp: Hashable):
+        """Возвращает сохраненный результат или None при промахе"""
+        if stamp != self._stamp:
+            self._entries.clear()
+            self._stamp = stamp
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value, stamp: Hashable):
+        if self.maxsize <= 0:
+            return
+        if stamp != self._stamp:
+            self._entries.clear()
+            self._stamp = stamp
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._stamp = None
@@ -0,0 +1,59 @@
+"""Клиент резидентного режима: передает команду CLI запущенному демону.
+
+Запрос - имя метода Commands и его аргументы одной строкой JSON, ответ -
+тоже одна строка JSON. Модуль нарочно импортирует только json и os:
+клиент запускается на каждый вызов CLI и должен оставаться легким.
+"""
+import json
+import os
+
+# Команды, которые клиент передает демону. import, export и migrate работают
+# с файлами и каталогом клиента и всегда выполняются на месте
+READ_COMMANDS = frozenset({'list_notes', 'search_notes', 'list_tags'})
+WRITE_COMMANDS = frozenset({'add_note', 'delete_note', 'archive_note', 'edit_note'})
+
+# Клиент не ждет дольше, если демон не отвечает на подключение
+CONNECT_TIMEOUT = 0.5
+REQUEST_TIMEOUT = 60.0
+
+
+def socket_path(db_path: str = "notes.db") -> str:
+    """Путь к сокету демона рядом с файлом базы.
+
+    Путь строится от абсолютного пути к базе, поэтому клиент из другого
+    каталога (с другой notes.db) демона не найдет и выполнит команду сам.
+    """
+    return os.path.abspath(db_path) + '.sock'
+
+
+def request(path: str, command: str, args=(), kwargs: dict = None) -> dict:
+    """Выполняет команду в демоне; None, если демон не запущен.
+
+    Ответ: {'ok': True, 'output': ..., 'result': ...} или
+    {'ok': False, 'output': ..., 'error': ...}. Если запрос уже отправлен,
+    ошибки не подавляются: повторять команду на месте небезопасно.
+    """
+    # Обычный случай без демона: хватает проверки файла, socket не импортируется
+    if not os.path.exists(path):
+        return None
+
+    import socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(path)
+        except OSError:
+            # Нет сокета, устаревший файл сокета или слишком длинный путь
+            return None
+
+        client.settimeout(REQUEST_TIMEOUT)
+        payload = {'command': command, 'args': list(args), 'kwargs': kwargs or {}}
+        client.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+        with client.makefile('rb') as reader:
+            line = reader.readline()
+        if not line:
+            raise ConnectionError("демон закрыл соединение без ответа")
+        return json.loads(line)
+    finally:
+        client.close()
@@ -1,19 +1,34 @@
-import argparse
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 from datetime import datetime
 from .models import Note, Status, NotePriority, NoteCategory
 from .storage import Storage
+from .render import RenderCache
+
+if TYPE_CHECKING:
+    from .timings import Timings
 
 
 class Commands:
-    def __init__(self, storage: Storage):
+    # Команды, время которых учитывается при включенных таймингах
+    TIMED_METHODS = ('add_note', 'list_notes', 'search_notes', 'delete_note', 'archive_note',
+                     'edit_note', 'list_tags', 'import_notes', 'export_notes', 'migrate')
+    # Режимы поиска: подстрока (триграммный индекс и точная проверка),
+    # по словам (индекс FTS5), регулярное выражение (перебор) и нечеткий
+    # с опечатками (словарь симметричного удаления)
+    SEARCH_MODES = ('substring', 'words', 'regex', 'fuzzy')
+
+    def __init__(self, storage: Storage, render_cache: RenderCache = None,
+                 timings: 'Timings' = None):
         self.storage = storage
+        # Отрисованные заметки переиспользуются между вызовами list/search
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self.timings = timings
+        if timings is not None:
+            timings.instrument(self, 'commands', self.TIMED_METHODS)
 
     def add_note(self, title: str, content: str, category: str = "other",
                  priority: str = "medium", tags: List[str] = None) -> str:
         """Добавляет новую заметку"""
-        notes = self.storage.load_notes()
-
         # Валидация категории
         try:
             note_category = NoteCategory(category.lower())
@@ -28,7 +43,7 @@ class Commands:
             return f"Ошибка: Неверный приоритет '{priority}'. Допустимые значения: low, medium, high"
 
         new_note = Note(
-            id=self.storage.get_next_id(),
+            id=None,
             title=title,
             content=content,
             category=note_category,
@@ -36,172 +51,333 @@ class Commands:
             tags=tags or []
         )
 
-        notes.append(new_note)
-        self.storage.save_notes(notes)
+        new_note.id = self.storage.add_note(new_note)
         return f"Заметка добавлена (ID: {new_note.id}): {title}"
 
     def list_notes(self, category: str = None, priority: str = None,
-                   status: str = "active", show_content: bool = False) -> str:
-        """Показывает список заметок с фильтрацией"""
-        notes = self.storage.load_notes()
-
-        if not notes:
-            return "Нет заметок"
-
-        # Фильтрация
-        filtered_notes = notes
-
+                   status: str = "active", show_content: bool = False,
+                   limit: int = None, after: str = None) -> str:
+        """Показывает список заметок с фильтрацией и постраничным выводом"""
+        if limit is not None and limit <= 0:
+            return "Ошибка: --limit должен быть положительным числом"
+        category_filter = None
         if category:
             try:
                 category_filter = NoteCategory(category.lower())
-                filtered_notes = [n for n in filtered_notes if n.category == category_filter]
             except ValueError:
                 valid_categories = [cat.value for cat in NoteCategory]
                 return f"Ошибка: Неверная категория '{category}'. Допустимые значения: {', '.join(valid_categories)}"
 
+        priority_filter = None
         if priority:
             try:
                 priority_filter = NotePriority(priority.lower())
-                filtered_notes = [n for n in filtered_notes if n.priority == priority_filter]
             except ValueError:
                 return f"Ошибка: Неверный приоритет '{priority}'. Допустимые значения: low, medium, high"
 
+        status_filter = None
         if status:
             try:
                 status_filter = Status(status.lower())
-                filtered_notes = [n for n in filtered_notes if n.status == status_filter]
             except ValueError:
                 return f"Ошибка: Неверный статус '{status}'. Допустимые значения: active, archived"
 
+        try:
+            after_key = self.storage.decode_cursor(after) if after else None
+        except ValueError as e:
+            return f"Ошибка: {e}"
+
+        # Фильтрация, сортировка (новые сначала) и пагинация выполняются в БД по индексу;
+        # одна лишняя строка показывает, есть ли следующая страница
+        filtered_notes = self.storage.find_notes(
+            category=category_filter,
+            priority=priority_filter,
+            status=status_filter,
+            limit=limit + 1 if limit else None,
+            after=after_key,
+            full=show_content
+        )
+        filtered_notes, next_token = self._paginate(filtered_notes, limit)
+
         if not filtered_notes:
+            if not self.storage.has_notes():
+                return "Нет заметок"
             return "Заметки не найдены по заданным критериям"
 
-        # Сортировка по дате создания (новые сначала)
-        filtered_notes.sort(key=lambda x: x.created_at, reverse=True)
-
         result = []
-        result.append(f"=== Найдено заметок: {len(filtered_notes)} ===")
+        if limit or after:
+            result.append(f"=== Показано заметок: {len(filtered_notes)} ===")
+        else:
+            result.append(f"=== Найдено заметок: {len(filtered_notes)} ===")
 
-        for note in filtered_notes:
+        for note, block in zip(filtered_notes, self._render(filtered_notes)):
             result.append("─" * 50)
-            result.append(str(note))
+            result.append(block)
             if show_content and len(note.content) > 100:
                 result.append(f"   Полный текст: {note.content}")
 
+        self._append_next_page(result, next_token)
         return "\n".join(result)
 
-    def search_notes(self, search_term: str, search_in: str = "all") -> str:
-        """Поиск заметок по ключевым словам"""
-        notes = self.storage.load_notes()
-
-        if not notes:
-            return "Нет заметок"
-
+    def search_notes(self, search_term: str, search_in: str = "all",
+                     limit: int = None, after: str = None, show_content: bool = False,
+                     mode: str = "substring", top: int = None) -> str:
+        """Поиск заметок: по произвольной подстроке (mode='substring'), по началу
+        слов ('words'), по регулярному выражению ('regex') или нечеткий ('fuzzy').
+        С top - одна страница из top самых релевантных заметок"""
+        if mode not in self.SEARCH_MODES:
+            return f"Ошибка: неизвестный режим поиска '{mode}'"
+        if top is not None and top <= 0:
+            return "Ошибка: --top должен быть положительным числом"
+        if limit is not None and limit <= 0:
+            return "Ошибка: --limit должен быть положительным числом"
+        if top and after:
+            return "Ошибка: --top выводит одну страницу лучших совпадений и не сочетается с --after"
+        if mode == 'fuzzy' and after:
+            # Порядок по релевантности не продолжается ключом (created_at, id)
+            return "Ошибка: нечеткий поиск не поддерживает --after, используйте --limit"
+        try:
+            after_key = self.storage.decode_cursor(after) if after else None
+        except ValueError as e:
+            return f"Ошибка: {e}"
+
+        if top:
+            # Лучшие по релевантности отбираются в хранилище, отрисовываются только они
+            options = dict(top=top, full=show_content)
+        else:
+            options = dict(limit=limit + 1 if limit else None, after=after_key,
+                           full=show_content)
+        if mode == 'words':
+            # Поиск по словам выполняется по полнотекстовому индексу FTS5
+            found_notes = self.storage.search_notes(search_term, search_in, **options)
+        elif mode == 'fuzzy':
+            # Самые похожие сначала; следующей страницы нет
+            found_notes = self.storage.fuzzy_notes(search_term, search_in,
+                                                   limit=top or limit, full=show_content)
+        else:
+            # Подстрока - кандидаты из триграммного индекса, выражение - перебор
+            try:
+                found_notes = self.storage.scan_notes(search_term, search_in,
+                                                      regex=mode == 'regex', **options)
+            except ValueError as e:
+                return f"Ошибка: {e}"
+        found_notes, next_token = self._paginate(found_notes, None if top else limit)
         search_term = search_term.lower()
-        found_notes = []
-
-        for note in notes:
-            matches = False
-
-            if search_in in ["all", "title"] and search_term in note.title.lower():
-                matches = True
-            elif search_in in ["all", "content"] and search_term in note.content.lower():
-                matches = True
-            elif search_in in ["all", "tags"] and any(search_term in tag.lower() for tag in note.tags):
-                matches = True
-
-            if matches:
-                found_notes.append(note)
+        # Нечеткий поиск не видит заметки, еще не перенесенные в словарь
+        hint = self._fuzzy_backlog_hint() if mode == 'fuzzy' else None
 
         if not found_notes:
-            return f"Заметки по запросу '{search_term}' не найдены"
-
-        # Сортировка по релевантности (можно улучшить)
-        found_notes.sort(key=lambda x: x.created_at, reverse=True)
-
-        result = [f"=== Результаты поиска: '{search_term}' ({len(found_notes)} найдено) ==="]
-        for note in found_notes:
+            if not self.storage.has_notes():
+                return "Нет заметок"
+            result = [f"Заметки по запросу '{search_term}' не найдены"]
+            if hint:
+                result.append(hint)
+            return "\n".join(result)
+
+        # С top и в нечетком режиме - по релевантности, иначе новые сначала
+        if top:
+            result = [f"=== Результаты поиска: '{search_term}' (лучшие {len(found_notes)}) ==="]
+        elif limit or after:
+            result = [f"=== Результаты поиска: '{search_term}' (показано {len(found_notes)}) ==="]
+        else:
+            result = [f"=== Результаты поиска: '{search_term}' ({len(found_notes)} найдено) ==="]
+        for note, block in zip(found_notes, self._render(found_notes)):
             result.append("─" * 50)
-            result.append(str(note))
+            result.append(block)
+            if show_content and len(note.content) > 100:
+                result.append(f"   Полный текст: {note.content}")
 
+        self._append_next_page(result, next_token)
+        if hint:
+            result.append(hint)
         return "\n".join(result)
 
+    def _render(self, notes) -> List[str]:
+        if self.timings is None:
+            return self.render_cache.render_many(notes)
+        with self.timings.phase('commands.render'):
+            return self.render_cache.render_many(notes)
+
+    def _paginate(self, notes: List[Note], limit: int = None):
+        """Обрезает выборку до страницы и возвращает токен следующей страницы"""
+        if limit and len(notes) > limit:
+            notes = notes[:limit]
+            return notes, self.storage.encode_cursor(notes[-1])
+        return notes, None
+
+    @staticmethod
+    def _append_next_page(result: List[str], next_token: str = None):
+        if next_token:
+            result.append("─" * 50)
+            result.append(f"Следующая страница: --after {next_token}")
+
     def delete_note(self, note_id: int) -> str:
         """Удаляет заметку"""
-        notes = self.storage.load_notes()
+        note = self.storage.get_note_by_id(note_id)
 
-        for i, note in enumerate(notes):
-            if note.id == note_id:
-                deleted_title = note.title
-                del notes[i]
-                self.storage.save_notes(notes)
-                return f"Заметка удалена: #{note_id} - {deleted_title}"
+        if note is None:
+            return f"Ошибка: Заметка с ID #{note_id} не найдена"
+        deleted = self.storage.delete_note(note_id)
+        if deleted is None:
+            return f"Ошибка: не удалось удалить заметку #{note_id}"
+        if not deleted:
+            return f"Ошибка: Заметка с ID #{note_id} не найдена"
 
-        return f"Ошибка: Заметка с ID #{note_id} не найдена"
+        return f"Заметка удалена: #{note_id} - {note.title}"
 
     def archive_note(self, note_id: int) -> str:
         """Архивирует заметку"""
-        notes = self.storage.load_notes()
+        note = self.storage.get_note_by_id(note_id)
 
-        for note in notes:
-            if note.id == note_id:
-                if note.status == Status.ARCHIVED:
-                    return f"Заметка #{note_id} уже в архиве"
-                note.status = Status.ARCHIVED
-                note.updated_at = datetime.now().isoformat()
-                self.storage.save_notes(notes)
-                return f"Заметка архивирована: #{note_id} - {note.title}"
+        if note is None:
+            return f"Ошибка: Заметка с ID #{note_id} не найдена"
 
-        return f"Ошибка: Заметка с ID #{note_id} не найдена"
+        # Условный UPDATE не трогает строку, если она уже в архиве
+        archived = note.status != Status.ARCHIVED and self.storage.update_status(
+            note_id, Status.ARCHIVED, datetime.now().isoformat())
+        if archived is None:
+            return f"Ошибка: не удалось архивировать заметку #{note_id}"
+        if not archived:
+            return f"Заметка #{note_id} уже в архиве"
+
+        return f"Заметка архивирована: #{note_id} - {note.title}"
 
     def edit_note(self, note_id: int, title: str = None, content: str = None,
                   category: str = None, priority: str = None, tags: List[str] = None) -> str:
         """Редактирует существующую заметку"""
-        notes = self.storage.load_notes()
-
-        for note in notes:
-            if note.id == note_id:
-                # Валидация категории
-                note_category = None
-                if category:
-                    try:
-                        note_category = NoteCategory(category.lower())
-                    except ValueError:
-                        valid_categories = [cat.value for cat in NoteCategory]
-                        return f"Ошибка: Неверная категория '{category}'. Допустимые значения: {', '.join(valid_categories)}"
-
-                # Валидация приоритета
-                note_priority = None
-                if priority:
-                    try:
-                        note_priority = NotePriority(priority.lower())
-                    except ValueError:
-                        return f"Ошибка: Неверный приоритет '{priority}'. Допустимые значения: low, medium, high"
-
-                note.update(
-                    title=title,
-                    content=content,
-                    category=note_category,
-                    priority=note_priority,
-                    tags=tags
-                )
-
-                self.storage.save_notes(notes)
-                return f"Заметка обновлена: #{note_id} - {note.title}"
-
-        return f"Ошибка: Заметка с ID #{note_id} не найдена"
+        # Валидация категории
+        note_category = None
+        if category:
+            try:
+                note_category = NoteCategory(category.lower())
+            except ValueError:
+                valid_categories = [cat.value for cat in NoteCategory]
+                return f"Ошибка: Неверная категория '{category}'. Допустимые значения: {', '.join(valid_categories)}"
+
+        # Валидация приоритета
+        note_priority = None
+        if priority:
+            try:
+                note_priority = NotePriority(priority.lower())
+            except ValueError:
+                return f"Ошибка: Неверный приоритет '{priority}'. Допустимые значения: low, medium, high"
+
+        # Чтение и перезапись всех колонок - в одной транзакции записи, иначе
+        # параллельное изменение (например, архивирование) было бы потеряно
+        with self.storage.write_transaction():
+            note = self.storage.get_note_by_id(note_id)
+            if note is None:
+                return f"Ошибка: Заметка с ID #{note_id} не найдена"
+
+            note.update(
+                title=title,
+                content=content,
+                category=note_category,
+                priority=note_priority,
+                tags=tags
+            )
+            # Строка прочитана в этой же транзакции - отказ означает ошибку БД
+            if not self.storage.update_note(note):
+                return f"Ошибка: не удалось обновить заметку #{note_id}"
+        return f"Заметка обновлена: #{note_id} - {note.title}"
 
     def list_tags(self) -> str:
         """Показывает все используемые теги"""
-        tags = self.storage.get_all_tags()
+        tag_counts = self.storage.get_tag_counts()
 
-        if not tags:
+        if not tag_counts:
             return "Теги не найдены"
 
         result = ["=== Все теги ==="]
-        for tag in tags:
-            # Находим заметки с этим тегом
-            notes_with_tag = [note for note in self.storage.load_notes() if tag in note.tags]
-            result.append(f"#{tag} ({len(notes_with_tag)} заметок)")
+        for tag, count in tag_counts:
+            result.append(f"#{tag} ({count} заметок)")
+
+        return "\n".join(result)
 
-        return "\n".join(result)
\ No newline at end of file
+    def import_notes(self, path: str, fmt: str = None, chunk_size: int = 10000,
+                     defer_indexes: bool = True) -> str:
+        """Импортирует заметки из файла JSON, JSONL или CSV"""
+        # Импорт нужен только этой команде - не загружаем его при каждом запуске CLI
+        from .importer import detect_format, read_notes
+        try:
+            fmt = fmt or detect_format(path)
+        except ValueError as e:
+            return f"Ошибка: {e}"
+
+        errors = []
+        with open(path, encoding='utf-8', newline='') as fp:
+            imported = self.storage.bulk_insert(read_notes(fp, fmt, errors),
+                                                chunk_size=chunk_size,
+                                                defer_indexes=defer_indexes)
+        # Словарь нечеткого поиска - отдельными короткими транзакциями
+        self.storage.sync_fuzzy_backlog()
+
+        result = [f"Импортировано заметок: {imported}"]
+        if errors:
+            result.append(f"Пропущено записей: {len(errors)}")
+            result.extend(f"   {error}" for error in errors[:10])
+        hint = self._fuzzy_backlog_hint()
+        if hint:
+            result.append(hint)
+        return "\n".join(result)
+
+    def _fuzzy_backlog_hint(self) -> Optional[str]:
+        """Подсказка, если часть заметок еще не в словаре нечеткого поиска"""
+        pending = self.storage.fuzzy_backlog()
+        if not pending:
+            return None
+        return (f"Заметок не в словаре нечеткого поиска: {pending} "
+                f"(перенести - команда migrate)")
+
+    def export_notes(self, path: str, fmt: str = "jsonl", compress: bool = False,
+                     batch_size: int = 1000) -> str:
+        """Экспортирует все заметки потоково, без загрузки их в память"""
+        from .exporter import export_rows
+        try:
+            count = export_rows(self.storage.iter_rows(batch_size), path, fmt, compress)
+        except ValueError as e:
+            return f"Ошибка: {e}"
+
+        return f"Экспортировано заметок: {count}"
+
+    def migrate(self, dry_run: bool = False, batch_size: int = None,
+                trigram: bool = None) -> str:
+        """Обновляет схему базы; с dry_run показывает, что будет сделано.
+        trigram=True/False включает или удаляет триграммный индекс"""
+        kwargs = {'batch_size': batch_size} if batch_size else {}
+        before = self.storage.schema_version()
+        plan = self.storage.migrate(dry_run=dry_run, progress=None if dry_run else print,
+                                    **kwargs)
+        if not dry_run:
+            # Очередь словаря нечеткого поиска после импорта и миграции 6
+            indexed = self.storage.sync_fuzzy_backlog(progress=print)
+            result = [f"Схема обновлена с версии {before} до {plan[-1]['version']}" if plan
+                      else f"Схема актуальна (версия {before})"]
+            if indexed:
+                result.append(f"В словарь нечеткого поиска перенесено заметок: {indexed}")
+            if trigram is not None:
+                changed = self.storage.set_trigram_index(trigram)
+                state = "построен" if trigram else "удален"
+                result.append(f"Триграммный индекс {state}" if changed
+                              else f"Триграммный индекс уже {'включен' if trigram else 'выключен'}")
+            return "\n".join(result)
+
+        hint = self._fuzzy_backlog_hint()
+        if trigram is not None:
+            hint = "\n".join(filter(None, [
+                hint, f"Триграммный индекс будет {'построен' if trigram else 'удален'}"]))
+        if not plan:
+            return "\n".join(filter(None, [f"Схема актуальна (версия {before})", hint]))
+
+        result = [f"Версия схемы: {before}, будет: {plan[-1]['version']}",
+                  "Будут применены миграции:"]
+        for step in plan:
+            line = f"{step['version']}. {step['description']}"
+            if step['backfill_ids']:
+                line += (f" (дозаполнение заметок с id до {step['backfill_ids']}: "
+                         f"пачек - {step['batches']})")
+            result.append(line)
+            result.extend(f"   {statement}" for statement in step['statements'])
+        if hint:
+            result.append(hint)
+        return "\n".join(result)
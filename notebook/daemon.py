@@ -0,0 +1,180 @@
+"""Резидентный режим: Storage и Commands остаются загруженными между вызовами CLI.
+
+Демон принимает запросы клиента (notebook/client.py) на Unix-сокете
+рядом с файлом базы и выполняет их в пуле потоков.
+"""
+import io
+import json
+import os
+import socket
+import sys
+import threading
+from typing import Optional
+
+from .client import READ_COMMANDS, REQUEST_TIMEOUT, WRITE_COMMANDS
+
+# Как часто цикл приема проверяет флаг остановки
+ACCEPT_POLL = 0.5
+
+
+class _ThreadStdout:
+    """sys.stdout демона: вывод обработчика запроса уходит в ответ клиенту.
+
+    Хранилище печатает ошибки через print; перенаправление через
+    contextlib.redirect_stdout действует на весь процесс, поэтому
+    буфер выбирается по текущему потоку.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def capture(self, buffer: Optional[io.StringIO]):
+        self._local.buffer = buffer
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        return (self._stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class Daemon:
+    """Сервер команд на Unix-сокете.
+
+    Запросы обслуживает пул из workers потоков; у каждого потока свое
+    соединение с базой и свой экземпляр Commands (с кэшем отрисовки),
+    которые живут, пока работает демон. Чтения идут параллельно (WAL),
+    записи выполняются по одной под общей блокировкой.
+    """
+
+    def __init__(self, storage, path: str, workers: int = 4):
+        self.storage = storage
+        self.path = path
+        self.workers = workers
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener = None
+        self._stdout = None
+
+    def _commands(self):
+        commands = getattr(self._local, 'commands', None)
+        if commands is None:
+            from .commands import Commands
+            commands = self._local.commands = Commands(self.storage)
+        return commands
+
+    def bind(self):
+        """Создает сокет; ошибка, если на нем уже отвечает другой демон"""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except FileNotFoundError:
+            pass
+        except ConnectionRefusedError:
+            # Файл остался от демона, завершившегося аварийно
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"Демон уже запущен: {self.path}")
+        finally:
+            probe.close()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Заметки доступны только владельцу: сокет создается с правами 0600
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        listener.listen(64)
+        listener.settimeout(ACCEPT_POLL)
+        self._listener = listener
+
+    def serve_forever(self):
+        """Принимает подключения до вызова shutdown()"""
+        if self._listener is None:
+            self.bind()
+        from concurrent.futures import ThreadPoolExecutor
+        self._stdout = _ThreadStdout(sys.stdout)
+        sys.stdout = self._stdout
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers,
+                                    thread_name_prefix='notes-daemon') as pool:
+                while not self._stop.is_set():
+                    try:
+                        conn, _ = self._listener.accept()
+                    except socket.timeout:
+                        continue
+                    except OSError:
+                        if self._stop.is_set():
+                            break
+                        raise
+                    if self._stop.is_set():
+                        conn.close()
+                        break
+                    pool.submit(self._handle, conn)
+        finally:
+            sys.stdout = self._stdout._stream
+            self._listener.close()
+            self._listener = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self):
+        """Останавливает цикл приема; текущие запросы дорабатывают"""
+        self._stop.set()
+        # Подключение будит accept(), не дожидаясь ACCEPT_POLL
+        wake = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            wake.connect(self.path)
+        except OSError:
+            pass
+        finally:
+            wake.close()
+
+    def _handle(self, conn: socket.socket):
+        """Обслуживает одно подключение: одна строка запроса, одна строка ответа"""
+        try:
+            conn.settimeout(REQUEST_TIMEOUT)
+            with conn.makefile('rb') as reader:
+                line = reader.readline()
+            try:
+                response = self.execute(json.loads(line))
+            except ValueError as e:
+                response = {'ok': False, 'output': '', 'error': f"Некорректный запрос: {e}"}
+            conn.sendall(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        except OSError:
+            # Клиент отключился, не дождавшись ответа
+            pass
+        finally:
+            conn.close()
+
+    def execute(self, payload: dict) -> dict:
+        """Выполняет метод Commands из запроса и собирает его вывод"""
+        command = payload.get('command')
+        if command not in READ_COMMANDS and command not in WRITE_COMMANDS:
+            return {'ok': False, 'output': '', 'error': f"Неизвестная команда: {command}"}
+
+        method = getattr(self._commands(), command)
+        output = io.StringIO()
+        if self._stdout is not None:
+            self._stdout.capture(output)
+        try:
+            if command in WRITE_COMMANDS:
+                with self._write_lock:
+                    result = method(*payload.get('args', ()), **payload.get('kwargs', {}))
+            else:
+                result = method(*payload.get('args', ()), **payload.get('kwargs', {}))
+        except Exception as e:
+            return {'ok': False, 'output': output.getvalue(), 'error': str(e)}
+        finally:
+            if self._stdout is not None:
+                self._stdout.capture(None)
+        return {'ok': True, 'output': output.getvalue(), 'result': result}
@@ -0,0 +1,123 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from typing import Iterable, TextIO
+
+FORMATS = ('json', 'jsonl', 'csv', 'markdown')
+
+# Поля записи экспорта (совпадают с Note.to_dict и читаются импортом)
+FIELDS = ('id', 'title', 'content', 'category', 'priority', 'tags',
+          'status', 'created_at', 'updated_at')
+
+
+def row_to_record(row: tuple) -> dict:
+    """Преобразует строку БД (id + Storage.COLUMNS) в запись экспорта без создания Note"""
+    record = dict(zip(FIELDS, row))
+    try:
+        tags = json.loads(record['tags']) if record['tags'] else []
+    except json.JSONDecodeError:
+        tags = []
+    record['tags'] = tags if isinstance(tags, list) else []
+    return record
+
+
+def write_json(rows: Iterable[tuple], out: TextIO) -> int:
+    """Пишет JSON-массив по одной записи, не собирая его в памяти"""
+    count = 0
+    out.write('[')
+    for row in rows:
+        out.write(',\n  ' if count else '\n  ')
+        out.write(json.dumps(row_to_record(row), ensure_ascii=False))
+        count += 1
+    out.write('\n]\n' if count else ']\n')
+    return count
+
+
+def write_jsonl(rows: Iterable[tuple], out: TextIO) -> int:
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row_to_record(row), ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(rows: Iterable[tuple], out: TextIO) -> int:
+    """Пишет CSV с заголовком; теги - JSON-массив в одной ячейке"""
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    count = 0
+    for row in rows:
+        record = row_to_record(row)
+        record['tags'] = json.dumps(record['tags'], ensure_ascii=False)
+        writer.writerow([record[field] for field in FIELDS])
+        count += 1
+    return count
+
+
+def render_markdown(record: dict) -> str:
+    lines = [
+        f"# {record['title']}",
+        "",
+        f"- ID: {record['id']}",
+        f"- Категория: {record['category']}",
+        f"- Приоритет: {record['priority']}",
+        f"- Статус: {record['status']}",
+        f"- Теги: {', '.join(record['tags'])}",
+        f"- Создана: {record['created_at']}",
+        f"- Обновлена: {record['updated_at']}",
+        "",
+        record['content'] or "",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def write_markdown(rows: Iterable[tuple], directory: str, compress: bool = False) -> int:
+    """Пишет каждую заметку в отдельный файл <id>.md (или .md.gz) в каталоге"""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for row in rows:
+        record = row_to_record(row)
+        path = os.path.join(directory, f"{record['id']:06d}.md")
+        with open_output(path, compress) as out:
+            out.write(render_markdown(record))
+        count += 1
+    return count
+
+
+def open_output(path: str, compress: bool = False) -> TextIO:
+    """Открывает файл (или stdout для '-') на запись, при необходимости со сжатием gzip"""
+    if path == '-':
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'),
+                                    encoding='utf-8', newline='')
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='',
+                                write_through=True)
+    if compress:
+        if not path.endswith('.gz'):
+            path += '.gz'
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export_rows(rows: Iterable[tuple], path: str, fmt: str, compress: bool = False) -> int:
+    """Экспортирует строки БД в файл или каталог и возвращает число записей"""
+    if fmt == 'markdown':
+        return write_markdown(rows, path, compress)
+
+    writers = {'json': write_json, 'jsonl': write_jsonl, 'csv': write_csv}
+    if fmt not in writers:
+        raise ValueError(f"Неизвестный формат '{fmt}'. Допустимые форматы: {', '.join(FORMATS)}")
+
+    out = open_output(path, compress)
+    try:
+        return writers[fmt](rows, out)
+    finally:
+        if path == '-' and not compress:
+            out.detach()
+        else:
+            out.close()
@@ -0,0 +1,116 @@
+"""Нечеткий поиск по словарю симметричного удаления (symmetric delete).
+
+Для каждого слова словаря хранятся варианты с удалением до MAX_DELETES
+символов. У слова на расстоянии редактирования не больше k от слова
+запроса есть общий с ним вариант, поэтому кандидаты находятся поиском
+вариантов запроса в индексе, без перебора словаря; расстояние затем
+проверяется точно.
+"""
+import heapq
+import json
+import re
+from typing import Dict, List, Optional, Set
+
+# Глубина удалений для слов словаря - наибольшее допустимое расстояние
+MAX_DELETES = 2
+# Слова короче не ищутся нечетко, длиннее (хэши, ссылки) - не индексируются
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 24
+
+# Биты поля, в котором встретилось слово (колонка fields в fuzzy_postings)
+FIELD_MASKS = {'title': 1, 'content': 2, 'tags': 4}
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре без повторов, в порядке появления"""
+    words = (word for word in _WORD.findall(text.lower())
+             if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH)
+    return list(dict.fromkeys(words))
+
+
+def note_terms(title: str, content: str, tags: str) -> Dict[str, int]:
+    """Слова заметки (строки БД) с маской полей, где они встречаются"""
+    terms: Dict[str, int] = {}
+    tag_text = ""
+    if tags and tags != "[]":
+        try:
+            tag_text = " ".join(json.loads(tags))
+        except (ValueError, TypeError):
+            # Теги старых БД, не разобранные миграцией 3, в словарь не идут
+            pass
+    for field, text in (('title', title), ('content', content), ('tags', tag_text)):
+        if text:
+            for term in tokenize(text):
+                terms[term] = terms.get(term, 0) | FIELD_MASKS[field]
+    return terms
+
+
+def max_distance(word: str) -> int:
+    """Допустимое число опечаток в слове запроса: в коротких словах меньше"""
+    if len(word) <= MIN_TERM_LENGTH:
+        return 0
+    return 1 if len(word) <= 5 else MAX_DELETES
+
+
+def deletes(word: str, depth: int = MAX_DELETES) -> Set[str]:
+    """Слово и все его варианты с удалением от 1 до depth символов"""
+    variants = frontier = {word}
+    # Удаления по одному символу от вариантов предыдущего шага: повторы
+    # схлопываются в множестве, не порождая лишних веток
+    for _ in range(min(depth, len(word) - 1)):
+        frontier = {variant[:i] + variant[i + 1:]
+                    for variant in frontier for i in range(len(variant))}
+        variants = variants | frontier
+    return variants
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (перестановка соседних букв - одна
+    правка); если оно больше limit, возвращает limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return min(row[-1], limit + 1)
+
+
+def similarity(word: str, term: str, dist: int) -> float:
+    """Близость слова словаря к слову запроса: 1.0 - точное совпадение"""
+    return 1.0 - dist / max(len(word), len(term))
+
+
+def rank(matches: List[Dict[int, float]], limit: Optional[int] = None) -> List[int]:
+    """ID заметок по убыванию релевантности; при limit - только первые limit.
+
+    matches - для каждого слова запроса лучшая близость по заметкам.
+    Выше заметки, где нашлось больше слов запроса, затем - с большей
+    суммарной близостью; при равенстве - более новые (больший ID).
+    """
+    found: Dict[int, List[float]] = {}
+    for per_word in matches:
+        for note_id, score in per_word.items():
+            entry = found.get(note_id)
+            if entry is None:
+                found[note_id] = [1, score]
+            else:
+                entry[0] += 1
+                entry[1] += score
+
+    def key(note_id):
+        count, score = found[note_id]
+        return count, score, note_id
+
+    if limit is None:
+        return sorted(found, key=key, reverse=True)
+    return heapq.nlargest(limit, found, key=key)
@@ -0,0 +1,201 @@
+import csv
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, TextIO, Union
+from .models import Note, Status, NotePriority, NoteCategory
+
+# Размер блока чтения для потокового разбора JSON-массива
+READ_CHUNK = 1 << 16
+# Ошибка разбора ближе стольких символов к концу буфера считается
+# недочитанным объектом: обрезанные литерал, число или \uXXXX
+TRUNCATED_TAIL = 8
+
+FORMATS = ('json', 'jsonl', 'csv')
+
+
+def detect_format(path: str) -> str:
+    """Определяет формат файла по расширению"""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext == 'ndjson':
+        return 'jsonl'
+    if ext in FORMATS:
+        return ext
+    raise ValueError(f"Не удалось определить формат файла '{path}'. "
+                     f"Допустимые форматы: {', '.join(FORMATS)}")
+
+
+def _truncated(error: json.JSONDecodeError, buffer: str) -> bool:
+    """Ошибка разбора из-за конца буфера (объект не дочитан), а не из-за
+    испорченного JSON: позиция у самого конца или строка без закрывающей
+    кавычки (ее ошибка указывает на начало строки)"""
+    return (len(buffer) - error.pos <= TRUNCATED_TAIL
+            or error.msg.startswith('Unterminated string'))
+
+
+def _skip_element(text: str, pos: int, state: tuple):
+    """Ищет конец испорченного элемента массива: ',' или ']' вне строк
+    и вложенных скобок. state - (глубина, внутри строки, после '\\')
+    на начало text[pos:]. Возвращает (позиция разделителя или None, state)"""
+    depth, in_string, escaped = state
+    for i in range(pos, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif depth == 0 and char in ',]':
+            return i, (depth, in_string, escaped)
+        elif char in ']}':
+            depth = max(depth - 1, 0)
+    return None, (depth, in_string, escaped)
+
+
+def iter_json_array(fp: TextIO, chunk_size: int = READ_CHUNK) -> Iterator[Union[dict, ValueError]]:
+    """Потоково разбирает JSON-массив объектов, не читая файл целиком.
+    Вместо испорченного элемента выдает ValueError и продолжает со
+    следующего; ошибки в самой структуре массива прерывают разбор"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    state = 'start'  # start -> first -> sep -> item -> sep ...
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Неожиданный конец JSON-массива")
+            buffer = fp.read(chunk_size)
+            pos = 0
+            eof = not buffer
+            continue
+
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise ValueError("Ожидался JSON-массив")
+            pos += 1
+            state = 'first'
+        elif state == 'sep' or (state == 'first' and char == ']'):
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Ожидалась ',' или ']', получено '{char}'")
+            pos += 1
+            state = 'item'
+        else:
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+                # Число или литерал в конце буфера может продолжаться в следующем блоке
+                truncated = end >= len(buffer) and not eof
+            except json.JSONDecodeError as e:
+                truncated = not eof and _truncated(e, buffer)
+                if not truncated:
+                    yield ValueError(f"некорректный JSON: {e}")
+                    # Пропускаем элемент до разделителя, не накапливая его в буфере
+                    end, skip = _skip_element(buffer, pos, (0, False, False))
+                    while end is None:
+                        buffer = fp.read(chunk_size)
+                        if not buffer:
+                            raise ValueError("Неожиданный конец JSON-массива")
+                        end, skip = _skip_element(buffer, 0, skip)
+                    pos = end
+                    state = 'sep'
+                    continue
+            if truncated:
+                # Объект не поместился в буфер - дочитываем следующий блок
+                chunk = fp.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield obj
+            pos = end
+            state = 'sep'
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_jsonl(fp: TextIO) -> Iterator[Union[dict, ValueError]]:
+    """Читает по одному JSON-объекту на строку. Вместо испорченной строки
+    выдает ValueError: исключение остановило бы генератор и весь импорт"""
+    for line in fp:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"некорректный JSON: {e}")
+
+
+def iter_csv(fp: TextIO) -> Iterator[Union[dict, ValueError]]:
+    """Читает CSV с заголовком; теги - JSON-массив или список через запятую.
+    Строка с испорченным JSON тегов выдается как ValueError"""
+    for row in csv.DictReader(fp):
+        tags = (row.get('tags') or '').strip()
+        if tags.startswith('['):
+            try:
+                row['tags'] = json.loads(tags)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"некорректный JSON тегов: {e}")
+                continue
+        else:
+            row['tags'] = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        yield row
+
+
+def record_to_note(data: dict) -> Note:
+    """Проверяет запись через перечисления моделей и создает Note (ID назначит БД)"""
+    title = data.get('title')
+    if not title:
+        raise ValueError("нет заголовка")
+
+    tags = data.get('tags') or []
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("теги должны быть списком строк")
+
+    return Note(
+        id=None,
+        title=title,
+        content=data.get('content') or "",
+        category=NoteCategory((data.get('category') or 'other').lower()),
+        priority=NotePriority((data.get('priority') or 'medium').lower()),
+        tags=tags,
+        status=Status((data.get('status') or 'active').lower()),
+        created_at=data.get('created_at') or None,
+        updated_at=data.get('updated_at') or None
+    )
+
+
+def read_notes(fp: TextIO, fmt: str, errors: Optional[List[str]] = None) -> Iterable[Note]:
+    """Выдает проверенные заметки из файла; невалидные записи пропускаются
+    и описываются в списке errors"""
+    if fmt == 'json':
+        records = iter_json_array(fp)
+    elif fmt == 'jsonl':
+        records = iter_jsonl(fp)
+    elif fmt == 'csv':
+        records = iter_csv(fp)
+    else:
+        raise ValueError(f"Неизвестный формат '{fmt}'. Допустимые форматы: {', '.join(FORMATS)}")
+
+    for number, record in enumerate(records, start=1):
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("запись должна быть объектом")
+            yield record_to_note(record)
+        except ValueError as e:
+            if errors is not None:
+                errors.append(f"запись {number}: {e}")
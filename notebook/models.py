@@ -1,6 +1,8 @@
 import json
+from collections import namedtuple
 from datetime import datetime
 from enum import Enum
+from .render import render_note
 
 
 class Status(Enum):
@@ -24,18 +26,52 @@ class NoteCategory(Enum):
 
 
 class Note:
+    # Поля, изменения которых отслеживаются для записи в БД
+    TRACKED_FIELDS = frozenset(['title', 'content', 'category', 'priority',
+                                'tags', 'status', 'updated_at'])
+
+    # Без __dict__ у каждого экземпляра: заметно меньше памяти на массовых выборках
+    __slots__ = ('_dirty', 'id', 'title', 'content', 'category', 'priority',
+                 'tags', 'status', 'created_at', 'updated_at')
+
     def __init__(self, id, title, content, category=NoteCategory.OTHER,
                  priority=NotePriority.MEDIUM, tags=None, status=Status.ACTIVE,
                  created_at=None, updated_at=None):
-        self.id = id
-        self.title = title
-        self.content = content
-        self.category = category
-        self.priority = priority
-        self.tags = tags or []
-        self.status = status
-        self.created_at = created_at or datetime.now().isoformat()
-        self.updated_at = updated_at or datetime.now().isoformat()
+        set_field = object.__setattr__
+        # Множество изменений создается при первой правке: пустой set - ~200 байт на заметку
+        set_field(self, '_dirty', None)
+        set_field(self, 'id', id)
+        set_field(self, 'title', title)
+        set_field(self, 'content', content)
+        set_field(self, 'category', category)
+        set_field(self, 'priority', priority)
+        set_field(self, 'tags', tags or [])
+        set_field(self, 'status', status)
+        # Текущее время вычисляется один раз и только если метка не передана
+        now = None if created_at and updated_at else datetime.now().isoformat()
+        set_field(self, 'created_at', created_at or now)
+        set_field(self, 'updated_at', updated_at or now)
+
+    def __setattr__(self, name, value):
+        if name in self.TRACKED_FIELDS:
+            if self._dirty is None:
+                object.__setattr__(self, '_dirty', {name})
+            else:
+                self._dirty.add(name)
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty_fields(self):
+        """Поля, измененные с момента создания или последнего mark_clean()"""
+        return frozenset(self._dirty or ())
+
+    @property
+    def is_dirty(self):
+        return bool(self._dirty)
+
+    def mark_clean(self):
+        """Сбрасывает флаги изменений (после записи в БД)"""
+        object.__setattr__(self, '_dirty', None)
 
     def to_dict(self):
         return {
@@ -80,25 +116,48 @@ class Note:
         self.updated_at = datetime.now().isoformat()
 
     def __str__(self):
-        status_icon = "📁" if self.status == Status.ARCHIVED else "📝"
-        priority_icon = {
-            NotePriority.LOW: "⬇",
-            NotePriority.MEDIUM: "●",
-            NotePriority.HIGH: "⬆"
-        }.get(self.priority, "●")
-
-        category_icon = {
-            NoteCategory.WORK: "💼",
-            NoteCategory.PERSONAL: "👤",
-            NoteCategory.STUDY: "📚",
-            NoteCategory.SHOPPING: "🛒",
-            NoteCategory.IDEAS: "💡",
-            NoteCategory.OTHER: "📄"
-        }.get(self.category, "📄")
-
-        tags_str = f" | Tags: {', '.join(self.tags)}" if self.tags else ""
-        created = datetime.fromisoformat(self.created_at).strftime("%d.%m.%Y")
-
-        return (f"{status_icon} [{priority_icon}] {category_icon} #{self.id}: {self.title}\n"
-                f"   Created: {created}{tags_str}\n"
-                f"   {self.content[:100]}{'...' if len(self.content) > 100 else ''}")
\ No newline at end of file
+        return render_note(self)
+
+
+class NoteRow(namedtuple('NoteRow', ('id', 'title', 'content', 'category_value',
+                                     'priority_value', 'tags_json', 'status_value',
+                                     'created_at', 'updated_at', 'content_size'),
+                         defaults=(None,))):
+    """Представление строки БД только для чтения, без создания Note.
+
+    Хранит значения как есть; перечисления и теги разбираются при обращении.
+    content_size - размер полного текста в байтах UTF-8, если загружено
+    только его начало (краткая проекция Storage).
+    """
+    __slots__ = ()
+
+    @property
+    def category(self):
+        return NoteCategory(self.category_value) if self.category_value else NoteCategory.OTHER
+
+    @property
+    def priority(self):
+        return NotePriority(self.priority_value) if self.priority_value else NotePriority.MEDIUM
+
+    @property
+    def status(self):
+        return Status(self.status_value) if self.status_value else Status.ACTIVE
+
+    @property
+    def tags(self):
+        return json.loads(self.tags_json) if self.tags_json and self.tags_json != "[]" else []
+
+    @property
+    def is_preview(self):
+        """True, если content содержит только начало текста заметки"""
+        return self.content_size is not None and self.content_size > len(self.content.encode('utf-8'))
+
+    def to_note(self):
+        """Полноценная изменяемая заметка (для превью - с обрезанным текстом)"""
+        return Note(id=self.id, title=self.title, content=self.content,
+                    category=self.category, priority=self.priority, tags=self.tags,
+                    status=self.status, created_at=self.created_at,
+                    updated_at=self.updated_at)
+
+    to_dict = Note.to_dict
+    __str__ = Note.__str__
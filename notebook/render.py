@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+# Иконки по значениям перечислений моделей
+STATUS_ICONS = {'active': "📝", 'archived': "📁"}
+PRIORITY_ICONS = {'low': "⬇", 'medium': "●", 'high': "⬆"}
+CATEGORY_ICONS = {
+    'work': "💼",
+    'personal': "👤",
+    'study': "📚",
+    'shopping': "🛒",
+    'ideas': "💡",
+    'other': "📄",
+}
+
+# Длина превью текста в выводе заметки
+PREVIEW_LENGTH = 100
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, 'value') else value
+
+
+@lru_cache(maxsize=4096)
+def _format_day(day: str) -> str:
+    return datetime.fromisoformat(day).strftime("%d.%m.%Y")
+
+
+def format_date(value: str) -> str:
+    """Дата ISO-метки в формате ДД.ММ.ГГГГ; разбор кэшируется по дню"""
+    return _format_day(value[:10])
+
+
+def render_note(note) -> str:
+    """Отрисовывает заметку (Note или NoteRow) блоком из трех строк"""
+    status_icon = STATUS_ICONS['archived' if _enum_value(note.status) == 'archived' else 'active']
+    priority_icon = PRIORITY_ICONS.get(_enum_value(note.priority), "●")
+    category_icon = CATEGORY_ICONS.get(_enum_value(note.category), "📄")
+
+    tags = note.tags
+    tags_str = f" | Tags: {', '.join(tags)}" if tags else ""
+    created = format_date(note.created_at)
+    content = note.content
+
+    return (f"{status_icon} [{priority_icon}] {category_icon} #{note.id}: {note.title}\n"
+            f"   Created: {created}{tags_str}\n"
+            f"   {content[:PREVIEW_LENGTH]}{'...' if len(content) > PREVIEW_LENGTH else ''}")
+
+
+class RenderCache:
+    """Ограниченный LRU-кэш отрисованных заметок по ключу (id, updated_at).
+
+    Любое изменение заметки обновляет updated_at, поэтому устаревшие блоки
+    просто перестают находиться и со временем вытесняются. При переданном
+    storage промахи дополнительно ищутся в таблице render_cache, а новые
+    блоки записываются туда - кэш переживает перезапуск процесса.
+    """
+
+    def __init__(self, maxsize: int = 4096, storage=None):
+        self.maxsize = maxsize
+        self.storage = storage
+        self.hits = 0
+        self.misses = 0
+        self._blocks: "OrderedDict[Tuple[int, str], str]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def render(self, note) -> str:
+        return self.render_many([note])[0]
+
+    def render_many(self, notes: Iterable) -> List[str]:
+        """Отрисовывает заметки, формируя заново только отсутствующие в кэше"""
+        notes = list(notes)
+        blocks: List[str] = [None] * len(notes)
+        missing: Dict[Tuple[int, str], List[int]] = {}
+
+        for index, note in enumerate(notes):
+            key = (note.id, note.updated_at)
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                blocks[index] = block
+                self.hits += 1
+            elif note.id is None:
+                # Несохраненную заметку не к чему привязать
+                blocks[index] = render_note(note)
+            else:
+                missing.setdefault(key, []).append(index)
+
+        if not missing:
+            return blocks
+
+        stored = self.storage.load_rendered(list(missing)) if self.storage is not None else {}
+        rendered = []
+        for key, indexes in missing.items():
+            block = stored.get(key)
+            if block is None:
+                block = render_note(notes[indexes[0]])
+                rendered.append((key[0], key[1], block))
+                self.misses += 1
+            else:
+                self.hits += 1
+            for index in indexes:
+                blocks[index] = block
+            self._put(key, block)
+
+        if rendered and self.storage is not None:
+            self.storage.save_rendered(rendered)
+        return blocks
+
+    def clear(self):
+        """Очищает кэш в памяти (таблица render_cache не затрагивается)"""
+        self._blocks.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _put(self, key: Tuple[int, str], block: str):
+        self._blocks[key] = block
+        self._blocks.move_to_end(key)
+        while len(self._blocks) > self.maxsize:
+            self._blocks.popitem(last=False)
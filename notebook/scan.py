@@ -0,0 +1,73 @@
+"""Поиск перебором: произвольная подстрока или регулярное выражение.
+
+Проверка совпадения - и для кандидатов из триграммного индекса, и для
+запросов, которые индекс не обслуживает (выражения, короткие подстроки):
+тогда проверяется каждая заметка.
+На больших блокнотах диапазон ID делится на шарды, которые проверяются
+в пуле процессов: каждый процесс открывает базу только для чтения и
+возвращает лишь ID совпавших заметок, а не сами строки.
+"""
+import json
+import os
+import re
+import sqlite3
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+# С какого числа заметок перебор идет в пуле процессов
+PARALLEL_THRESHOLD = 50_000
+# Шардов на процесс: мелкие шарды выравнивают нагрузку, если заметки
+# в одной части диапазона длиннее, чем в другой
+SHARDS_PER_WORKER = 4
+
+
+def make_matcher(pattern: str, regex: bool = False) -> Callable[[str], bool]:
+    """Проверка текста без учета регистра: подстрока или re.search.
+    re.error при неверном выражении"""
+    if regex:
+        search = re.compile(pattern, re.IGNORECASE).search
+        return lambda text: search(text) is not None
+    needle = pattern.lower()
+    return lambda text: needle in text.lower()
+
+
+def scan_rows(rows: Iterable[tuple], pattern: str, regex: bool,
+              columns: Sequence[str]) -> List[int]:
+    """ID строк (id, *columns), в которых совпало хотя бы одно поле.
+    Теги проверяются по отдельности, как в прежнем поиске перебором"""
+    matches = make_matcher(pattern, regex)
+    found = []
+    for row in rows:
+        for column, value in zip(columns, row[1:]):
+            if not value:
+                continue
+            if column == 'tags':
+                hit = value != '[]' and any(matches(tag) for tag in json.loads(value))
+            else:
+                hit = matches(value)
+            if hit:
+                found.append(row[0])
+                break
+    return found
+
+
+def scan_shard(db_path: str, lo: int, hi: int, pattern: str, regex: bool,
+               columns: Sequence[str]) -> List[int]:
+    """Задача процесса пула: перебор заметок с lo < id <= hi"""
+    from pathlib import Path
+    uri = Path(os.path.abspath(db_path)).as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        rows = conn.execute(f"SELECT id, {', '.join(columns)} FROM notes "
+                            f"WHERE id > ? AND id <= ?", (lo, hi))
+        return scan_rows(rows, pattern, regex, columns)
+    finally:
+        conn.close()
+
+
+def shards(min_id: int, max_id: int, count: int) -> List[Tuple[int, int]]:
+    """Делит ID от min_id до max_id на count диапазонов (lo, hi]"""
+    lo = min_id - 1
+    span = max_id - lo
+    count = max(1, min(count, span))
+    bounds = [lo + span * n // count for n in range(count + 1)]
+    return list(zip(bounds, bounds[1:]))
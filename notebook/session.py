@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+from .models import Note
+
+
+class Session:
+    """Единица работы: накапливает изменения заметок и записывает только их.
+
+    Использование:
+        with storage.session() as s:
+            note = s.get(1)
+            note.title = "Новый заголовок"
+            s.add(Note(id=None, title="Новая", content="..."))
+            s.delete(2)
+
+    При выходе из блока без исключения изменения записываются одной
+    транзакцией, при исключении - отбрасываются.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._identity: Dict[int, Note] = {}
+        self._tags_snapshot: Dict[int, tuple] = {}
+        self._new: List[Note] = []
+        self._deleted: Dict[int, Note] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def get(self, note_id: int) -> Optional[Note]:
+        """Возвращает отслеживаемую заметку по ID"""
+        if note_id in self._deleted:
+            return None
+        if note_id in self._identity:
+            return self._identity[note_id]
+
+        note = self.storage.get_note_by_id(note_id)
+        if note is not None:
+            self._track(note)
+        return note
+
+    def add(self, note: Note) -> Note:
+        """Регистрирует новую заметку; ID будет назначен при commit()"""
+        self._new.append(note)
+        return note
+
+    def delete(self, note: Union[Note, int]):
+        """Помечает заметку на удаление"""
+        if isinstance(note, Note):
+            if note in self._new:
+                self._new.remove(note)
+                return
+            note_id = note.id
+        else:
+            note_id = note
+
+        self._deleted[note_id] = self._identity.pop(note_id, None)
+        self._tags_snapshot.pop(note_id, None)
+
+    @property
+    def dirty(self) -> List[Note]:
+        """Отслеживаемые заметки, измененные в этой сессии"""
+        return [note for note in self._identity.values() if self._is_modified(note)]
+
+    def commit(self):
+        """Записывает вставки, изменения и удаления одной транзакцией"""
+        dirty = self.dirty
+        if not (self._new or dirty or self._deleted):
+            return
+
+        now = datetime.now().isoformat()
+        for note in dirty:
+            if 'updated_at' not in note.dirty_fields:
+                note.updated_at = now
+
+        with self.storage.write_transaction() as conn:
+            cursor = conn.cursor()
+
+            if self._deleted:
+                cursor.executemany('DELETE FROM notes WHERE id = ?',
+                                   [(note_id,) for note_id in self._deleted])
+
+            if self._new:
+                self._assign_ids(cursor)
+                columns = ('id',) + self.storage.COLUMNS
+                cursor.executemany(
+                    f"INSERT INTO notes ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(self.storage.serialize_field(note, column) for column in columns)
+                     for note in self._new]
+                )
+
+            # Группируем изменения по набору колонок, чтобы обновлять только их
+            groups: Dict[tuple, List[Note]] = {}
+            for note in dirty:
+                fields = note.dirty_fields
+                if self._tags_changed(note):
+                    fields = fields | {'tags'}
+                groups.setdefault(tuple(sorted(fields)), []).append(note)
+
+            for fields, notes in groups.items():
+                assignments = ', '.join(f"{field} = ?" for field in fields)
+                cursor.executemany(
+                    f"UPDATE notes SET {assignments} WHERE id = ?",
+                    [tuple(self.storage.serialize_field(note, field) for field in fields) + (note.id,)
+                     for note in notes]
+                )
+
+        for note in self._new:
+            self._track(note)
+        for note in dirty:
+            self._track(note)
+        self._new = []
+        self._deleted = {}
+
+    def rollback(self):
+        """Отбрасывает незаписанные изменения и перестает отслеживать заметки"""
+        self._identity.clear()
+        self._tags_snapshot.clear()
+        self._new = []
+        self._deleted = {}
+
+    def _track(self, note: Note):
+        note.mark_clean()
+        self._identity[note.id] = note
+        self._tags_snapshot[note.id] = tuple(note.tags)
+
+    def _tags_changed(self, note: Note) -> bool:
+        # Теги - изменяемый список, поэтому правки "на месте" ловим по снимку
+        return tuple(note.tags) != self._tags_snapshot.get(note.id)
+
+    def _is_modified(self, note: Note) -> bool:
+        return note.is_dirty or self._tags_changed(note)
+
+    def _assign_ids(self, cursor):
+        """Выдает ID новым заметкам внутри уже захваченной транзакции записи"""
+        cursor.execute('''
+            SELECT MAX(COALESCE((SELECT MAX(id) FROM notes), 0),
+                       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'notes'), 0))
+        ''')
+        next_id = max([cursor.fetchone()[0]] + [note.id for note in self._new if note.id is not None]) + 1
+        for note in self._new:
+            if note.id is None:
+                note.id = next_id
+                next_id += 1
@@ -1,78 +1,762 @@
 import sqlite3
 import json
 import os
-from typing import List, Optional, Tuple
-from .models import Note, Status, NotePriority, NoteCategory
+import heapq
+import itertools
+import random
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .models import Note, NoteRow, Status, NotePriority, NoteCategory
+from .render import PREVIEW_LENGTH
+from . import fuzzy, scan
+
+if TYPE_CHECKING:
+    # Нужны только для аннотаций; при запуске импортируются по требованию
+    from .session import Session
+    from .timings import Timings
+
+
+# Теги заметки {note} как JSON-массив (невалидный JSON считается пустым списком)
+_TAGS_JSON = "CASE WHEN json_valid({note}.tags) THEN {note}.tags ELSE '[]' END"
+
+# Заполнение tags/note_tags для заметки {note} внутри триггера
+_TAGS_SYNC_SQL = (
+    "INSERT OR IGNORE INTO tags (name) "
+    f"SELECT j.value FROM json_each({_TAGS_JSON}) AS j WHERE j.type = 'text'; "
+    "INSERT OR IGNORE INTO note_tags (note_id, tag_id) "
+    f"SELECT {{note}}.id, tags.id FROM json_each({_TAGS_JSON}) AS j "
+    "JOIN tags ON tags.name = j.value WHERE j.type = 'text';"
+)
+
+# Заполнение tags/note_tags по JSON-колонке для заметок, отобранных условием {ids}
+_TAGS_BACKFILL = [
+    "INSERT OR IGNORE INTO tags (name) "
+    f"SELECT DISTINCT j.value FROM notes, json_each({_TAGS_JSON.format(note='notes')}) AS j "
+    "WHERE j.type = 'text' AND {ids}",
+    "INSERT OR IGNORE INTO note_tags (note_id, tag_id) "
+    f"SELECT notes.id, tags.id FROM notes, json_each({_TAGS_JSON.format(note='notes')}) AS j "
+    "JOIN tags ON tags.name = j.value WHERE j.type = 'text' AND {ids}",
+]
+
+
+class Migration(namedtuple('Migration', ('description', 'statements', 'backfill', 'if_exists'),
+                           defaults=((), ()))):
+    """Шаг схемы в реестре MIGRATIONS.
+
+    statements выполняются одной транзакцией; в ней же - запросы из пар
+    if_exists (таблица, запросы), если таблица есть (индексы, включаемые
+    по запросу). Затем backfill дозаполняет
+    существующие строки пачками по диапазону id, каждая пачка - отдельная
+    транзакция, чтобы не держать блокировку записи на всё время миграции.
+    Запросы backfill содержат {ids} - условие на notes.id - и должны быть
+    идемпотентны: прерванная миграция при следующем запуске повторяется.
+    """
+    __slots__ = ()
+
+
+# Условие {ids} для пачки дозаполнения миграции
+_BACKFILL_RANGE = "notes.id > :lo AND notes.id <= :hi"
+
+# Число заметок в одной пачке дозаполнения при миграции
+MIGRATION_BATCH_SIZE = 5000
+
+# Условие триггеров AFTER UPDATE производных индексов: пересохранение без
+# изменения текста (save_notes всех заметок) их не переписывает
+_TEXT_CHANGED = ("WHEN old.title IS NOT new.title OR old.content IS NOT new.content "
+                 "OR old.tags IS NOT new.tags")
+
+# Триггеры очереди fuzzy_dirty: заметки, слова которых нужно перенести в словарь
+_FUZZY_DIRTY_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS fuzzy_dirty_ai AFTER INSERT ON notes BEGIN "
+    "INSERT OR REPLACE INTO fuzzy_dirty (note_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS fuzzy_dirty_au AFTER UPDATE OF title, content, tags ON notes "
+    f"{_TEXT_CHANGED} BEGIN "
+    "INSERT OR REPLACE INTO fuzzy_dirty (note_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS fuzzy_notes_ad AFTER DELETE ON notes BEGIN "
+    "DELETE FROM fuzzy_dirty WHERE note_id = old.id; "
+    "DELETE FROM fuzzy_postings WHERE note_id = old.id; END",
+)
+
+# Триггеры AFTER UPDATE индексов FTS5 и note_tags с условием _TEXT_CHANGED
+# (миграция 8; в миграциях 2 и 3 - прежние, без условия)
+_NOTES_FTS_AU = (
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content, tags ON notes "
+    f"{_TEXT_CHANGED} BEGIN "
+    "INSERT INTO notes_fts (notes_fts, rowid, title, content, tags) "
+    "VALUES ('delete', old.id, old.title, old.content, old.tags); "
+    "INSERT INTO notes_fts (rowid, title, content, tags) "
+    "VALUES (new.id, new.title, new.content, new.tags); END"
+)
+_NOTE_TAGS_AU = (
+    "CREATE TRIGGER IF NOT EXISTS note_tags_au AFTER UPDATE OF tags ON notes "
+    "WHEN old.tags IS NOT new.tags BEGIN "
+    "DELETE FROM note_tags WHERE note_id = old.id; "
+    f"{_TAGS_SYNC_SQL.format(note='new')} END"
+)
+_NOTES_TRIGRAM_AU = (
+    "CREATE TRIGGER IF NOT EXISTS notes_trigram_au AFTER UPDATE OF title, content, tags ON notes "
+    f"{_TEXT_CHANGED} BEGIN "
+    "INSERT INTO notes_trigram (notes_trigram, rowid, title, content, tags) "
+    "VALUES ('delete', old.id, old.title, old.content, old.tags); "
+    "INSERT INTO notes_trigram (rowid, title, content, tags) "
+    "VALUES (new.id, new.title, new.content, new.tags); END"
+)
+
+# Триграммный индекс FTS5 для поиска по произвольной подстроке. Он вдвое
+# замедляет импорт, поэтому создается только по запросу (set_trigram_index,
+# migrate --trigram on); без него подстрока ищется перебором. Как и
+# notes_fts, перестраивается целиком в одной транзакции
+TRIGRAM_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notes_trigram USING fts5("
+    "title, content, tags, content='notes', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS notes_trigram_ai AFTER INSERT ON notes BEGIN "
+    "INSERT INTO notes_trigram (rowid, title, content, tags) "
+    "VALUES (new.id, new.title, new.content, new.tags); END",
+    "CREATE TRIGGER IF NOT EXISTS notes_trigram_ad AFTER DELETE ON notes BEGIN "
+    "INSERT INTO notes_trigram (notes_trigram, rowid, title, content, tags) "
+    "VALUES ('delete', old.id, old.title, old.content, old.tags); END",
+    _NOTES_TRIGRAM_AU,
+    "INSERT INTO notes_trigram (notes_trigram) VALUES ('rebuild')",
+)
+# Удаление индекса; триггеры принадлежат таблице notes и удаляются отдельно
+TRIGRAM_DROP = (
+    "DROP TRIGGER IF EXISTS notes_trigram_ai",
+    "DROP TRIGGER IF EXISTS notes_trigram_ad",
+    "DROP TRIGGER IF EXISTS notes_trigram_au",
+    "DROP TABLE IF EXISTS notes_trigram",
+)
+
+# Реестр миграций схемы. Миграция с индексом i переводит БД на версию i + 1
+# (версия хранится в PRAGMA user_version). Новые миграции добавляются только в конец
+MIGRATIONS = [
+    Migration('Таблица заметок и составные индексы под фильтры команды list', (
+        'CREATE TABLE IF NOT EXISTS notes ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, content TEXT, '
+        'category TEXT, priority TEXT, tags TEXT, status TEXT, '
+        'created_at TEXT, updated_at TEXT)',
+        'CREATE INDEX IF NOT EXISTS idx_notes_status_category_priority_created '
+        'ON notes (status, category, priority, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_notes_status_category_created '
+        'ON notes (status, category, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_notes_status_priority_created '
+        'ON notes (status, priority, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_notes_status_created '
+        'ON notes (status, created_at)',
+    )),
+    # Индекс FTS5 с внешним содержимым нельзя заполнять пачками при живых
+    # триггерах (удаление еще не проиндексированной строки портит индекс),
+    # поэтому он перестраивается целиком в транзакции миграции
+    Migration('Полнотекстовый индекс FTS5 по заголовку, тексту и тегам', (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5("
+        "title, content, tags, content='notes', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN "
+        "INSERT INTO notes_fts (rowid, title, content, tags) "
+        "VALUES (new.id, new.title, new.content, new.tags); END",
+        "CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN "
+        "INSERT INTO notes_fts (notes_fts, rowid, title, content, tags) "
+        "VALUES ('delete', old.id, old.title, old.content, old.tags); END",
+        "CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content, tags ON notes BEGIN "
+        "INSERT INTO notes_fts (notes_fts, rowid, title, content, tags) "
+        "VALUES ('delete', old.id, old.title, old.content, old.tags); "
+        "INSERT INTO notes_fts (rowid, title, content, tags) "
+        "VALUES (new.id, new.title, new.content, new.tags); END",
+        "INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')",
+    )),
+    # note_tags поддерживается триггерами по JSON-колонке notes.tags, поэтому
+    # строки, измененные во время дозаполнения, остаются согласованными
+    Migration('Нормализованные теги: таблицы tags и note_tags', (
+        'CREATE TABLE IF NOT EXISTS tags ('
+        'id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+        'CREATE TABLE IF NOT EXISTS note_tags ('
+        'note_id INTEGER NOT NULL, tag_id INTEGER NOT NULL, '
+        'PRIMARY KEY (note_id, tag_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS idx_note_tags_tag ON note_tags (tag_id, note_id)',
+        "CREATE TRIGGER IF NOT EXISTS note_tags_ai AFTER INSERT ON notes BEGIN "
+        f"{_TAGS_SYNC_SQL.format(note='new')} END",
+        "CREATE TRIGGER IF NOT EXISTS note_tags_au AFTER UPDATE OF tags ON notes BEGIN "
+        "DELETE FROM note_tags WHERE note_id = old.id; "
+        f"{_TAGS_SYNC_SQL.format(note='new')} END",
+        "CREATE TRIGGER IF NOT EXISTS note_tags_ad AFTER DELETE ON notes BEGIN "
+        "DELETE FROM note_tags WHERE note_id = old.id; END",
+    ), backfill=tuple(_TAGS_BACKFILL)),
+    # Блоки действительны, пока совпадает updated_at
+    Migration('Сохраненные отрисованные блоки заметок (render_cache)', (
+        'CREATE TABLE IF NOT EXISTS render_cache ('
+        'note_id INTEGER PRIMARY KEY, updated_at TEXT NOT NULL, block TEXT NOT NULL)',
+        "CREATE TRIGGER IF NOT EXISTS render_cache_ad AFTER DELETE ON notes BEGIN "
+        "DELETE FROM render_cache WHERE note_id = old.id; END",
+    )),
+    # Триграммный индекс строится только по запросу (TRIGRAM_INDEX)
+    Migration('Триграммный индекс FTS5 по запросу (migrate --trigram on)', ()),
+    # Разбор текста на слова есть только в Python, поэтому триггеры лишь
+    # отмечают измененные заметки в fuzzy_dirty, а словарь по ним обновляет
+    # Storage (_sync_fuzzy). Удаление обрабатывается целиком триггерами:
+    # слово без заметок и его варианты удаляются вместе с последней связью
+    Migration('Словарь нечеткого поиска: слова, связи с заметками и варианты с удалениями', (
+        'CREATE TABLE IF NOT EXISTS fuzzy_terms ('
+        'id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE)',
+        'CREATE TABLE IF NOT EXISTS fuzzy_postings ('
+        'note_id INTEGER NOT NULL, term_id INTEGER NOT NULL, fields INTEGER NOT NULL, '
+        'PRIMARY KEY (note_id, term_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS idx_fuzzy_postings_term '
+        'ON fuzzy_postings (term_id, note_id, fields)',
+        'CREATE TABLE IF NOT EXISTS fuzzy_deletes ('
+        'variant TEXT NOT NULL, term_id INTEGER NOT NULL, '
+        'PRIMARY KEY (variant, term_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS idx_fuzzy_deletes_term ON fuzzy_deletes (term_id)',
+        'CREATE TABLE IF NOT EXISTS fuzzy_dirty ('
+        'seq INTEGER PRIMARY KEY, note_id INTEGER NOT NULL UNIQUE)',
+        "CREATE TRIGGER IF NOT EXISTS fuzzy_dirty_ai AFTER INSERT ON notes BEGIN "
+        "INSERT OR REPLACE INTO fuzzy_dirty (note_id) VALUES (new.id); END",
+        "CREATE TRIGGER IF NOT EXISTS fuzzy_dirty_au AFTER UPDATE OF title, content, tags ON notes BEGIN "
+        "INSERT OR REPLACE INTO fuzzy_dirty (note_id) VALUES (new.id); END",
+        "CREATE TRIGGER IF NOT EXISTS fuzzy_notes_ad AFTER DELETE ON notes BEGIN "
+        "DELETE FROM fuzzy_dirty WHERE note_id = old.id; "
+        "DELETE FROM fuzzy_postings WHERE note_id = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS fuzzy_postings_ad AFTER DELETE ON fuzzy_postings BEGIN "
+        "DELETE FROM fuzzy_terms WHERE id = old.term_id AND NOT EXISTS "
+        "(SELECT 1 FROM fuzzy_postings WHERE term_id = old.term_id); END",
+        "CREATE TRIGGER IF NOT EXISTS fuzzy_terms_ad AFTER DELETE ON fuzzy_terms BEGIN "
+        "DELETE FROM fuzzy_deletes WHERE term_id = old.id; END",
+    ), backfill=("INSERT OR REPLACE INTO fuzzy_dirty (note_id) SELECT id FROM notes WHERE {ids}",)),
+    # Транзакция записи переносит в словарь только заметки, отмеченные ею
+    # самой (seq больше, чем был в начале), поэтому seq не должен
+    # переиспользоваться после удаления последней строки очереди
+    Migration('Очередь словаря нечеткого поиска с возрастающими номерами', (
+        *(f"DROP TRIGGER IF EXISTS {name}"
+          for name in ('fuzzy_dirty_ai', 'fuzzy_dirty_au', 'fuzzy_notes_ad')),
+        'CREATE TABLE fuzzy_dirty_new ('
+        'seq INTEGER PRIMARY KEY AUTOINCREMENT, note_id INTEGER NOT NULL UNIQUE)',
+        'INSERT INTO fuzzy_dirty_new (note_id) SELECT note_id FROM fuzzy_dirty ORDER BY seq',
+        'DROP TABLE fuzzy_dirty',
+        'ALTER TABLE fuzzy_dirty_new RENAME TO fuzzy_dirty',
+        *_FUZZY_DIRTY_TRIGGERS,
+    )),
+    # Пересохранение 5000 неизмененных заметок переписывало индексы каждой
+    # из них и шло в ~20 раз дольше
+    Migration('Триггеры индексов срабатывают только при изменении текста заметки', (
+        'DROP TRIGGER IF EXISTS notes_fts_au',
+        _NOTES_FTS_AU,
+        'DROP TRIGGER IF EXISTS note_tags_au',
+        _NOTE_TAGS_AU,
+    ), if_exists=(
+        ('notes_trigram', ('DROP TRIGGER IF EXISTS notes_trigram_au', _NOTES_TRIGRAM_AU)),
+    )),
+]
+
+# Версия схемы, с которой есть словарь нечеткого поиска
+FUZZY_SCHEMA_VERSION = 6
+# Заметок очереди fuzzy_dirty в одном запросе переноса в словарь
+FUZZY_SYNC_BATCH = 500
+# Заметок в одной транзакции sync_fuzzy_backlog: фиксация каждых 500
+# заметок после импорта занимала больше трети времени построения словаря,
+# а 5000 заметок держат блокировку записи около секунды
+FUZZY_BACKLOG_BATCH = 5000
+
+# Дозаполнение производных таблиц после bulk_insert с отложенными триггерами
+# для заметок, отобранных условием {ids}
+DEFERRED_BACKFILLS = [
+    "INSERT INTO notes_fts (rowid, title, content, tags) "
+    "SELECT id, title, content, tags FROM notes WHERE {ids}",
+    "INSERT OR REPLACE INTO fuzzy_dirty (note_id) SELECT id FROM notes WHERE {ids}",
+    *_TAGS_BACKFILL,
+]
+# То же для триграммного индекса, если он включен
+TRIGRAM_BACKFILL = ("INSERT INTO notes_trigram (rowid, title, content, tags) "
+                    "SELECT id, title, content, tags FROM notes WHERE {ids}")
+
+# Ожидание блокировки записи (PRAGMA busy_timeout, мс). Если оно истекло,
+# BEGIN IMMEDIATE повторяется до WRITE_RETRIES раз с экспоненциальной
+# задержкой от WRITE_BACKOFF секунд и случайным разбросом
+BUSY_TIMEOUT_MS = 5000
+WRITE_RETRIES = 5
+WRITE_BACKOFF = 0.05
+
+# Профили настроек соединения (PRAGMA).
+# durable - запись переживает сбой питания, fast - быстрее, но последние
+# транзакции могут потеряться при сбое ОС (целостность БД сохраняется)
+PRAGMA_PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,  # ~16 МБ
+        'temp_store': 'MEMORY',
+        'mmap_size': 64 * 1024 * 1024,
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,  # ~64 МБ
+        'temp_store': 'MEMORY',
+        'mmap_size': 256 * 1024 * 1024,
+    },
+}
+
+# Колонки FTS-индекса для значений параметра --in
+SEARCH_COLUMNS = {
+    'title': ['title'],
+    'content': ['content'],
+    'tags': ['tags'],
+    'all': ['title', 'content', 'tags'],
+}
+
+# Веса полей при ранжировании BM25 (search --top): совпадение в заголовке
+# важнее, чем в тегах, а в тегах - чем в тексте
+RANK_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'content': 1.0}
+# Аргументы bm25() в порядке колонок индексов FTS5 (title, content, tags)
+_BM25_WEIGHTS = ', '.join(str(RANK_WEIGHTS[column]) for column in SEARCH_COLUMNS['all'])
+
+# Краткая проекция для списков: начало текста (на символ длиннее превью,
+# чтобы было видно, что он обрезан) и размер в байтах вместо всего content.
+# Размер берется от BLOB: length() от текста пересчитывал бы символы всей строки
+SUMMARY_COLUMNS = (
+    "notes.id, notes.title, substr(notes.content, 1, {length}), notes.category, "
+    "notes.priority, notes.tags, notes.status, notes.created_at, notes.updated_at, "
+    "length(CAST(notes.content AS BLOB))"
+).format(length=PREVIEW_LENGTH + 1)
 
 
 class Storage:
-    def __init__(self, db_path: str = "notes.db"):
+    # Колонки таблицы notes, кроме id
+    COLUMNS = ('title', 'content', 'category', 'priority', 'tags',
+               'status', 'created_at', 'updated_at')
+
+    # Методы, время которых учитывается при включенных таймингах
+    TIMED_METHODS = ('_init_db', 'load_notes', 'load_rows', 'save_notes', 'find_notes',
+                     'search_notes', 'scan_notes', 'fuzzy_notes', 'has_notes', 'get_tag_counts', 'bulk_insert',
+                     'add_note', 'update_note', 'delete_note', 'get_note_by_id',
+                     'update_status', 'migrate')
+
+    def __init__(self, db_path: str = "notes.db", profile: str = "durable",
+                 cache_size: int = 0, cache_ttl: Optional[float] = None,
+                 timings: Optional['Timings'] = None, auto_migrate: bool = True,
+                 busy_timeout: int = BUSY_TIMEOUT_MS, write_retries: int = WRITE_RETRIES,
+                 scan_threshold: int = scan.PARALLEL_THRESHOLD, scan_workers: Optional[int] = None):
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Неизвестный профиль '{profile}'. "
+                             f"Допустимые значения: {', '.join(PRAGMA_PROFILES)}")
         self.db_path = db_path
-        self._init_db()
+        self.profile = profile
+        self.busy_timeout = busy_timeout
+        self.write_retries = write_retries
+        # Поиск перебором (scan_notes) идет в пуле процессов, начиная
+        # с scan_threshold заметок; scan_workers=None - по числу ядер
+        self.scan_threshold = scan_threshold
+        self.scan_workers = scan_workers
+        self._scan_pool = None
+        # Одно долгоживущее соединение на поток
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Кэш результатов чтения (выключен при cache_size=0); у каждого потока свой,
+        # так как PRAGMA data_version сравнима только в пределах одного соединения
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.write_generation = 0
+        self._caches = []
+        self.timings = timings
+        if timings is not None:
+            timings.instrument(self, 'storage', self.TIMED_METHODS)
+        # БД открывается и проверяется при первом обращении к connection,
+        # поэтому создание Storage (и, например, --help) не трогает файл
+        # Без auto_migrate схема не трогается (команда migrate применяет её сама)
+        self._schema_ready = not auto_migrate
+        self._schema_lock = threading.Lock()
 
-    def _init_db(self):
-        """Инициализация базы данных и создание таблицы, если её нет"""
-        try:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока; создается при первом обращении"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            started = time.perf_counter()
             # Создаем директорию для базы данных, если её нет
             db_dir = os.path.dirname(self.db_path)
             if db_dir and not os.path.exists(db_dir):
                 os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+            for pragma, value in PRAGMA_PROFILES[self.profile].items():
+                conn.execute(f'PRAGMA {pragma} = {value}')
+            if self.timings is not None:
+                self.timings.record('storage.connect', time.perf_counter() - started)
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            if not self._schema_ready:
+                with self._schema_lock:
+                    if not self._schema_ready:
+                        try:
+                            self._init_db(conn)
+                        except sqlite3.Error:
+                            conn.close()
+                            raise
+                        self._schema_ready = True
 
-                # Простая таблица
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS notes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        content TEXT,
-                        category TEXT,
-                        priority TEXT,
-                        tags TEXT,
-                        status TEXT,
-                        created_at TEXT,
-                        updated_at TEXT
-                    )
-                ''')
-                conn.commit()
-                print(f"База данных инициализирована: {self.db_path}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Закрывает все соединения; следующий вызов откроет новое"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._caches = []
+            pool, self._scan_pool = self._scan_pool, None
+        self._local = threading.local()
+        if pool is not None:
+            pool.shutdown()
+
+    def bump_generation(self):
+        """Отмечает запись через это хранилище - кэш запросов становится недействительным"""
+        with self._connections_lock:
+            self.write_generation += 1
+
+    @contextmanager
+    def write_transaction(self, sync_fuzzy: bool = True) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи BEGIN IMMEDIATE на соединении текущего потока.
+
+        Блокировка записи берется в начале, поэтому внутри транзакции нет
+        SQLITE_BUSY при переходе от чтения к записи, а чтение-изменение-запись
+        атомарно относительно других процессов. Фиксируется при выходе из
+        блока, откатывается при исключении. Перед фиксацией заметки,
+        измененные этой транзакцией, переносятся в словарь нечеткого поиска;
+        очередь после bulk_insert и миграций разбирает sync_fuzzy_backlog.
+
+        Вложенный блок (пакетный режим) - точка сохранения внутри внешней
+        транзакции: при исключении откатываются только его изменения,
+        фиксирует все внешний блок.
+        """
+        conn = self.connection
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            yield from self._savepoint(conn, depth)
+            return
+        self._begin_immediate(conn)
+        self._local.depth = 1
+        try:
+            # Отметки этой транзакции в очереди - с seq больше текущего
+            queued = (self._fuzzy_queue_end(conn)
+                      if sync_fuzzy and self._schema_version(conn) >= FUZZY_SCHEMA_VERSION
+                      else None)
+            yield conn
+            if queued is not None:
+                self._sync_fuzzy(conn, after=queued)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            # Кэш мог запомнить чтения незафиксированных вложенных записей
+            self.bump_generation()
+            raise
+        finally:
+            self._local.depth = 0
+        self.bump_generation()
+
+    def _savepoint(self, conn: sqlite3.Connection, depth: int) -> Iterator[sqlite3.Connection]:
+        """Тело вложенной write_transaction: SAVEPOINT ... RELEASE"""
+        name = f"write_{depth}"
+        conn.execute(f"SAVEPOINT {name}")
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+        finally:
+            # Чтения внутри пакета не должны брать из кэша результат до этой записи
+            self._local.depth = depth
+            self.bump_generation()
+
+    def _begin_immediate(self, conn: sqlite3.Connection):
+        """BEGIN IMMEDIATE с повтором, если за busy_timeout блокировку не получили.
+
+        Повторять безопасно: до BEGIN в транзакции ничего не выполнено.
+        """
+        for attempt in range(self.write_retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e) or attempt == self.write_retries:
+                    raise
+            # Разброс, чтобы ожидающие писатели не просыпались одновременно
+            time.sleep(WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    def _is_busy(error: sqlite3.Error) -> bool:
+        message = str(error)
+        return 'locked' in message or 'busy' in message
+
+    def cache_stats(self) -> dict:
+        """Счетчики кэша запросов по всем потокам"""
+        with self._connections_lock:
+            caches = list(self._caches)
+        return {
+            'hits': sum(cache.hits for cache in caches),
+            'misses': sum(cache.misses for cache in caches),
+            'size': sum(len(cache) for cache in caches),
+        }
+
+    def _fetch_all(self, sql: str, params=()) -> list:
+        """Выполняет запрос на чтение; при включенном кэше повторы берутся из него.
+
+        Кэш действителен, пока не изменились PRAGMA data_version (запись из
+        другого соединения или процесса) и счетчик записей этого хранилища.
+        Кэшируются строки БД, а не объекты, поэтому изменение возвращенных
+        заметок кэш не портит.
+        """
+        conn = self.connection
+        if self.cache_size <= 0:
+            return self._execute_all(conn, sql, params)
+
+        cache = getattr(self._local, 'cache', None)
+        if cache is None:
+            from .cache import QueryCache
+            cache = QueryCache(self.cache_size, self.cache_ttl)
+            self._local.cache = cache
+            with self._connections_lock:
+                self._caches.append(cache)
+
+        stamp = (conn.execute('PRAGMA data_version').fetchone()[0], self.write_generation)
+        key = (sql, tuple(params))
+        rows = cache.get(key, stamp)
+        if rows is None:
+            rows = self._execute_all(conn, sql, params)
+            cache.put(key, rows, stamp)
+        return rows
+
+    def _execute_all(self, conn: sqlite3.Connection, sql: str, params=()) -> list:
+        rows = conn.execute(sql, params).fetchall()
+        if self.timings is not None:
+            self.timings.count_rows(rows)
+        return rows
+
+    def _decode(self, rows: list, make) -> list:
+        """Преобразует строки БД в объекты (отдельная фаза в таймингах)"""
+        if self.timings is None:
+            return [make(row) for row in rows]
+        with self.timings.phase('storage.decode'):
+            return [make(row) for row in rows]
+
+    def _init_db(self, conn: sqlite3.Connection):
+        """Применяет миграции, если схема не последней версии"""
+        try:
+            # Актуальная схема - обычный случай: только чтение заголовка БД, без DDL
+            version = self._schema_version(conn)
+            if version >= len(MIGRATIONS):
+                return
+
+            # Новая база создается молча; об обновлении существующей
+            # сообщаем в stderr, так как дозаполнение может идти долго
+            upgrading = version > 0 or self._max_note_id(conn) is not None
+            self._migrate(conn, progress=self._report_progress if upgrading else None)
 
         except sqlite3.Error as e:
             print(f"Ошибка при инициализации базы данных: {e}")
             raise
 
-    def save_notes(self, notes: List[Note]):
-        """Сохраняет список заметок в БД"""
+    @staticmethod
+    def _report_progress(message: str):
+        print(message, file=sys.stderr, flush=True)
+
+    @staticmethod
+    def _schema_version(conn: sqlite3.Connection) -> int:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    @staticmethod
+    def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (name,)).fetchone() is not None
+
+    @classmethod
+    def _max_note_id(cls, conn: sqlite3.Connection) -> Optional[int]:
+        """Наибольший id заметки: 0 для пустой таблицы, None, если таблицы еще нет"""
+        if not cls._table_exists(conn, 'notes'):
+            return None
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM notes').fetchone()[0]
+
+    @classmethod
+    def _migration_plan(cls, conn: sqlite3.Connection,
+                        batch_size: int = MIGRATION_BATCH_SIZE) -> List[dict]:
+        """Описание миграций, которые еще не применены"""
+        version = cls._schema_version(conn)
+        max_id = cls._max_note_id(conn) or 0
+        plan = []
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            backfill_ids = max_id if migration.backfill else 0
+            statements = list(migration.statements)
+            statements += [f"-- если есть {table}: {sql}"
+                           for table, optional in migration.if_exists for sql in optional]
+            statements += [sql.format(ids=_BACKFILL_RANGE) for sql in migration.backfill]
+            plan.append({
+                'version': target,
+                'description': migration.description,
+                'statements': statements,
+                'backfill_ids': backfill_ids,
+                'batches': -(-backfill_ids // batch_size),
+            })
+        return plan
+
+    @classmethod
+    def _migrate(cls, conn: sqlite3.Connection, batch_size: int = MIGRATION_BATCH_SIZE,
+                 progress=None):
+        """Применяет миграции схемы, которые еще не были применены.
+
+        Каждая миграция - своя транзакция BEGIN IMMEDIATE (версия
+        перепроверяется внутри нее, если миграцию параллельно применяет
+        другой процесс); дозаполнение идет отдельными транзакциями пачками
+        по batch_size id. user_version повышается только после дозаполнения.
+        """
+        report = progress or (lambda message: None)
+        version = cls._schema_version(conn)
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            started = time.perf_counter()
+            report(f"Миграция {target}/{len(MIGRATIONS)}: {migration.description}")
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                if cls._schema_version(conn) >= target:
+                    continue
+                for statement in migration.statements:
+                    conn.execute(statement)
+                for table, statements in migration.if_exists:
+                    if cls._table_exists(conn, table):
+                        for statement in statements:
+                            conn.execute(statement)
+                if not migration.backfill:
+                    conn.execute(f'PRAGMA user_version = {target}')
+
+            if migration.backfill:
+                cls._backfill(conn, migration.backfill, batch_size, report)
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    if cls._schema_version(conn) < target:
+                        conn.execute(f'PRAGMA user_version = {target}')
+            report(f"   готово за {time.perf_counter() - started:.2f} с")
+
+        # Дозаполнение миграции 6 ставит все заметки в очередь словаря -
+        # строим его сразу, пачками, иначе нечеткий поиск ничего не найдет
+        if version < FUZZY_SCHEMA_VERSION <= cls._schema_version(conn):
+            started = time.perf_counter()
+            report("Словарь нечеткого поиска")
+            cls._drain_fuzzy(lambda: cls._immediate(conn), FUZZY_BACKLOG_BATCH, report)
+            report(f"   готово за {time.perf_counter() - started:.2f} с")
+
+    @staticmethod
+    def _backfill(conn: sqlite3.Connection, statements: Iterable[str], batch_size: int,
+                  report):
+        """Выполняет запросы дозаполнения пачками по диапазонам id.
+
+        Граница берется один раз в начале: строки, вставленные позже,
+        уже обработаны триггерами, созданными миграцией.
+        """
+        max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM notes').fetchone()[0]
+        queries = [sql.format(ids=_BACKFILL_RANGE) for sql in statements]
+        reported = time.perf_counter()
+        for lo in range(0, max_id, batch_size):
+            hi = min(lo + batch_size, max_id)
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for query in queries:
+                    conn.execute(query, {'lo': lo, 'hi': hi})
+            # Не чаще раза в секунду, плюс последняя пачка
+            if hi == max_id or time.perf_counter() - reported >= 1.0:
+                report(f"   дозаполнение: id {hi} из {max_id}")
+                reported = time.perf_counter()
+
+    def schema_version(self) -> int:
+        """Текущая версия схемы (PRAGMA user_version)"""
+        return self._schema_version(self.connection)
+
+    def migrate(self, dry_run: bool = False, batch_size: int = MIGRATION_BATCH_SIZE,
+                progress=None) -> List[dict]:
+        """Применяет недостающие миграции и возвращает их план.
+
+        С dry_run только возвращает план: версии, запросы и объем дозаполнения.
+        Для миграции вручную Storage создается с auto_migrate=False.
+        """
+        conn = self.connection
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            plan = self._migration_plan(conn, batch_size)
+            if not dry_run and plan:
+                self._migrate(conn, batch_size, progress)
+                self.bump_generation()
+            return plan
+        except sqlite3.Error as e:
+            print(f"Ошибка при миграции базы данных: {e}")
+            raise
 
-                # Очищаем таблицу и вставляем все заметки заново
-                cursor.execute('DELETE FROM notes')
+    def session(self) -> 'Session':
+        """Создает сессию для пакетных изменений с записью только измененных строк"""
+        from .session import Session
+        return Session(self)
 
-                for note in notes:
-                    # Проверяем, что даты - это строки
-                    created_at = str(note.created_at) if note.created_at else ""
-                    updated_at = str(note.updated_at) if note.updated_at else ""
+    @staticmethod
+    def serialize_field(note: Note, field: str):
+        """Преобразует поле заметки в значение для колонки БД"""
+        value = getattr(note, field)
+        if field == 'tags':
+            return json.dumps(value, ensure_ascii=False) if value else "[]"
+        if field == 'content':
+            return value or ""
+        if field in ('created_at', 'updated_at'):
+            return str(value) if value else ""
+        return value.value if hasattr(value, 'value') else value
 
-                    cursor.execute('''
-                        INSERT INTO notes 
-                        (id, title, content, category, priority, tags, status, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        note.id,
-                        note.title,
-                        note.content or "",
-                        note.category.value if hasattr(note.category, 'value') else str(note.category),
-                        note.priority.value if hasattr(note.priority, 'value') else str(note.priority),
-                        json.dumps(note.tags, ensure_ascii=False) if note.tags else "[]",
-                        note.status.value if hasattr(note.status, 'value') else str(note.status),
-                        created_at,
-                        updated_at
-                    ))
-
-                conn.commit()
+    @staticmethod
+    def note_to_row(note: Note) -> tuple:
+        """Значения колонок COLUMNS для заметки (быстрый путь для пакетной вставки)"""
+        return (
+            note.title,
+            note.content or "",
+            getattr(note.category, 'value', note.category),
+            getattr(note.priority, 'value', note.priority),
+            json.dumps(note.tags, ensure_ascii=False) if note.tags else "[]",
+            getattr(note.status, 'value', note.status),
+            str(note.created_at) if note.created_at else "",
+            str(note.updated_at) if note.updated_at else ""
+        )
+
+    def save_notes(self, notes: List[Note]):
+        """Сохраняет заметки одной транзакцией: существующие по ID обновляются,
+        новые (id=None) вставляются и получают ID. Остальные заметки в БД
+        не затрагиваются - записи других процессов не теряются."""
+        columns = ('id',) + self.COLUMNS
+        # Не INSERT ... ON CONFLICT DO UPDATE: ветка вставки запускает триггеры
+        # AFTER INSERT (note_tags), и на заметке с тегами upsert падает
+        update_sql = (f"UPDATE notes SET {', '.join(f'{column} = ?' for column in self.COLUMNS)} "
+                      f"WHERE id = ?")
+        insert_with_id_sql = (f"INSERT INTO notes ({', '.join(columns)}) "
+                              f"VALUES ({', '.join('?' * len(columns))})")
+        insert_sql = (f"INSERT INTO notes ({', '.join(self.COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(self.COLUMNS))}) RETURNING id")
+        try:
+            with self.write_transaction() as conn:
+                given = [note for note in notes if note.id is not None]
+                existing = {row[0] for row in conn.execute(
+                    "SELECT id FROM notes WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([note.id for note in given]),))}
+                conn.executemany(update_sql, [self.note_to_row(note) + (note.id,)
+                                              for note in given if note.id in existing])
+                conn.executemany(insert_with_id_sql, [(note.id,) + self.note_to_row(note)
+                                                      for note in given if note.id not in existing])
+                for note in notes:
+                    if note.id is None:
+                        note.id = conn.execute(insert_sql, self.note_to_row(note)).fetchall()[0][0]
 
         except sqlite3.Error as e:
             print(f"Ошибка при сохранении заметок: {e}")
@@ -80,96 +764,610 @@ class Storage:
     def load_notes(self) -> List[Note]:
         """Загружает все заметки из БД"""
         try:
-            notes = []
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            rows = self._execute_all(self.connection, 'SELECT * FROM notes ORDER BY created_at DESC')
+            return self._decode(rows, self._row_to_note)
 
-                cursor.execute('SELECT * FROM notes ORDER BY created_at DESC')
-                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при загрузке заметок: {e}")
+            return []
 
-                for row in rows:
-                    # Создаем Note из строки БД
-                    note = Note(
-                        id=row[0],
-                        title=row[1],
-                        content=row[2],
-                        category=NoteCategory(row[3]) if row[3] else NoteCategory.other,
-                        priority=NotePriority(row[4]) if row[4] else NotePriority.medium,
-                        tags=json.loads(row[5]) if row[5] and row[5] != "[]" else [],
-                        status=Status(row[6]) if row[6] else Status.active,
-                        created_at=row[7],  # Это строка
-                        updated_at=row[8]  # Это строка
-                    )
-                    notes.append(note)
+    def load_rows(self) -> List[NoteRow]:
+        """Загружает все заметки как NoteRow - для массового чтения без создания Note"""
+        try:
+            rows = self._execute_all(self.connection, f"SELECT id, {', '.join(self.COLUMNS)} FROM notes "
+                                                      f"ORDER BY created_at DESC")
+            return self._decode(rows, self._row_to_view)
+        except sqlite3.Error as e:
+            print(f"Ошибка при загрузке заметок: {e}")
+            return []
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[tuple]:
+        """Потоково выдает строки (id + COLUMNS) по порядку ID, читая их пачками
+        через fetchmany - память не зависит от числа заметок"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"SELECT id, {', '.join(self.COLUMNS)} FROM notes ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
 
-            return notes
+    @staticmethod
+    def build_where(category: Optional[NoteCategory] = None,
+                    priority: Optional[NotePriority] = None,
+                    status: Optional[Status] = None,
+                    after: Optional[Tuple[str, int]] = None) -> Tuple[str, list]:
+        """Строит параметризованное условие WHERE по фильтрам и ключу страницы"""
+        conditions = []
+        params = []
+        # Порядок совпадает с колонками индекса (status, category, priority, created_at)
+        for column, value in (('status', status), ('category', category), ('priority', priority)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value.value)
 
+        # Keyset-пагинация: строки строго после последней показанной
+        # в порядке (created_at DESC, id DESC)
+        if after is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    @staticmethod
+    def encode_cursor(note: Note) -> str:
+        """Токен продолжения для страницы, которая закончилась заметкой note"""
+        import base64
+        raw = json.dumps([note.created_at, note.id], ensure_ascii=False)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(token: str) -> Tuple[str, int]:
+        """Разбирает токен продолжения; ValueError, если он поврежден"""
+        import base64
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            created_at, note_id = json.loads(raw.decode('utf-8'))
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise ValueError(f"Неверный токен продолжения '{token}'")
+        if not isinstance(created_at, str) or not isinstance(note_id, int):
+            raise ValueError(f"Неверный токен продолжения '{token}'")
+        return created_at, note_id
+
+    def find_notes(self, category: Optional[NoteCategory] = None,
+                   priority: Optional[NotePriority] = None,
+                   status: Optional[Status] = None,
+                   limit: Optional[int] = None,
+                   after: Optional[Tuple[str, int]] = None,
+                   full: bool = True) -> List[Union[Note, NoteRow]]:
+        """Возвращает заметки, подходящие под фильтры, новые сначала.
+        При full=False - превью NoteRow только с началом текста"""
+        where, params = self.build_where(category, priority, status, after)
+        columns = '*' if full else SUMMARY_COLUMNS
+        sql = f'SELECT {columns} FROM notes {where} ORDER BY created_at DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        try:
+            make = self._row_to_note if full else self._row_to_view
+            return self._decode(self._fetch_all(sql, params), make)
         except sqlite3.Error as e:
             print(f"Ошибка при загрузке заметок: {e}")
             return []
 
+    @staticmethod
+    def build_fts_query(search_term: str, search_in: str = "all") -> Optional[str]:
+        """Строит запрос FTS5: фраза из слов запроса, последнее слово - префикс"""
+        words = re.findall(r'\w+', search_term.lower())
+        if not words:
+            return None
+
+        columns = SEARCH_COLUMNS[search_in]
+        phrase = '"' + ' '.join(words) + '"*'
+        return f"{{{' '.join(columns)}}} : {phrase}"
+
+    def search_notes(self, search_term: str, search_in: str = "all",
+                     limit: Optional[int] = None,
+                     after: Optional[Tuple[str, int]] = None,
+                     full: bool = True,
+                     top: Optional[int] = None) -> List[Union[Note, NoteRow]]:
+        """Ищет заметки по полнотекстовому индексу, новые сначала; с top -
+        top самых релевантных по BM25 с весами полей RANK_WEIGHTS.
+        При full=False - превью NoteRow только с началом текста"""
+        query = self.build_fts_query(search_term, search_in)
+        if query is None:
+            return []
+
+        where, params = self.build_where(after=after)
+        where = f"{where} AND notes_fts MATCH ?" if where else "WHERE notes_fts MATCH ?"
+        params.append(query)
+        columns = 'notes.*' if full else SUMMARY_COLUMNS
+        # Статистика BM25 (частоты слов, число и длины документов) хранится
+        # в самом индексе FTS5 и обновляется триггерами вместе с ним; сортировка
+        # с LIMIT держит в памяти только top строк
+        order = (f'bm25(notes_fts, {_BM25_WEIGHTS}), notes.id DESC' if top
+                 else 'notes.created_at DESC, notes.id DESC')
+        sql = f'''
+            SELECT {columns} FROM notes_fts
+            JOIN notes ON notes.id = notes_fts.rowid
+            {where}
+            ORDER BY {order}
+        '''
+        if top:
+            limit = top
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        try:
+            make = self._row_to_note if full else self._row_to_view
+            return self._decode(self._fetch_all(sql, params), make)
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске заметок: {e}")
+            return []
+
+    @staticmethod
+    def build_trigram_query(search_term: str, search_in: str = "all") -> Optional[str]:
+        """Запрос к триграммному индексу: подстрока целиком как фраза.
+
+        None, если индекс не сузит поиск: в подстроке меньше трех символов
+        (меньше одной триграммы) или, при поиске по тегам, есть символы,
+        которые JSON-колонка tags хранит экранированными.
+        """
+        if len(search_term) < 3:
+            return None
+        columns = SEARCH_COLUMNS[search_in]
+        if 'tags' in columns and any(char in '"\\' or char < ' ' for char in search_term):
+            return None
+        phrase = '"' + search_term.replace('"', '""') + '"'
+        return f"{{{' '.join(columns)}}} : {phrase}"
+
+    def scan_notes(self, pattern: str, search_in: str = "all", regex: bool = False,
+                   limit: Optional[int] = None,
+                   after: Optional[Tuple[str, int]] = None,
+                   full: bool = True,
+                   top: Optional[int] = None) -> List[Union[Note, NoteRow]]:
+        """Ищет произвольную подстроку (без учета регистра) или регулярное
+        выражение, новые сначала. Подстрока сначала сужается до кандидатов
+        по триграммному индексу, затем каждый кандидат проверяется точно;
+        выражения, короткие подстроки и поиск без индекса (он включается
+        set_trigram_index) - перебором всех заметок.
+        С top - top самых релевантных по BM25 триграммного индекса; без
+        индекса (выражения, короткие подстроки) - top самых новых.
+        ValueError при неверном выражении"""
+        if regex:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Неверное регулярное выражение '{pattern}': {e}")
+
+        try:
+            ranked = None if regex or not top else self._ranked_scan_ids(pattern, search_in, top)
+            if ranked is not None:
+                return self._load_ranked(ranked, full)
+            if top:
+                limit = top
+            ids = self._scan_ids(pattern, search_in, regex)
+            if not ids:
+                return []
+            where, params = self.build_where(after=after)
+            condition = "notes.id IN (SELECT value FROM json_each(?))"
+            where = f"{where} AND {condition}" if where else f"WHERE {condition}"
+            params.append(json.dumps(ids))
+            columns = 'notes.*' if full else SUMMARY_COLUMNS
+            sql = f'SELECT {columns} FROM notes {where} ORDER BY created_at DESC, id DESC'
+            if limit is not None:
+                sql += ' LIMIT ?'
+                params.append(limit)
+
+            make = self._row_to_note if full else self._row_to_view
+            return self._decode(self._execute_all(self.connection, sql, params), make)
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске заметок: {e}")
+            return []
+
+    def _ranked_scan_ids(self, pattern: str, search_in: str, top: int) -> Optional[List[int]]:
+        """top лучших по BM25 заметок с подстрокой; None, если триграммный
+        индекс запрос не обслуживает. Кандидаты проверяются точно по мере
+        чтения, из проверенных куча оставляет top лучших"""
+        query = self.build_trigram_query(pattern, search_in)
+        if query is None or not self._has_trigram(self.connection):
+            return None
+        columns = SEARCH_COLUMNS[search_in]
+        cursor = self.connection.execute(
+            f"SELECT notes.id, {', '.join('notes.' + c for c in columns)}, "
+            f"bm25(notes_trigram, {_BM25_WEIGHTS}) "
+            f"FROM notes_trigram JOIN notes ON notes.id = notes_trigram.rowid "
+            f"WHERE notes_trigram MATCH ?", (query,))
+        scores = {}
+
+        def candidates():
+            for row in cursor:
+                scores[row[0]] = row[-1]
+                yield row
+
+        ids = scan.scan_rows(candidates(), pattern, False, columns)
+        # У bm25() лучшим совпадениям соответствуют меньшие значения
+        return heapq.nsmallest(top, ids, key=lambda note_id: (scores[note_id], -note_id))
+
+    def _load_ranked(self, ids: List[int], full: bool) -> List[Union[Note, NoteRow]]:
+        """Заметки по списку ID в том же порядке"""
+        if not ids:
+            return []
+        columns = 'notes.*' if full else SUMMARY_COLUMNS
+        rows = self._execute_all(
+            self.connection,
+            f'SELECT {columns} FROM notes WHERE id IN (SELECT value FROM json_each(?))',
+            (json.dumps(ids),))
+        order = {note_id: position for position, note_id in enumerate(ids)}
+        rows.sort(key=lambda row: order[row[0]])
+        make = self._row_to_note if full else self._row_to_view
+        return self._decode(rows, make)
+
+    def _scan_ids(self, pattern: str, search_in: str, regex: bool) -> List[int]:
+        """ID совпавших заметок; без индекса на больших базах - по шардам
+        в пуле процессов. Процессы читают последнее зафиксированное состояние базы.
+        """
+        columns = SEARCH_COLUMNS[search_in]
+        conn = self.connection
+        query = None if regex else self.build_trigram_query(pattern, search_in)
+        if query is not None and self._has_trigram(conn):
+            rows = conn.execute(f"SELECT notes.id, {', '.join('notes.' + c for c in columns)} "
+                                f"FROM notes_trigram JOIN notes ON notes.id = notes_trigram.rowid "
+                                f"WHERE notes_trigram MATCH ?", (query,))
+            return scan.scan_rows(rows, pattern, regex, columns)
+
+        min_id, max_id, count = conn.execute(
+            'SELECT min(id), max(id), count(*) FROM notes').fetchone()
+        if not count:
+            return []
+
+        workers = self.scan_workers or os.cpu_count() or 1
+        if count < self.scan_threshold or workers < 2 or self.db_path == ':memory:':
+            rows = conn.execute(f"SELECT id, {', '.join(columns)} FROM notes")
+            return scan.scan_rows(rows, pattern, regex, columns)
+
+        pool = self._scan_executor(workers)
+        futures = [pool.submit(scan.scan_shard, self.db_path, lo, hi, pattern, regex, columns)
+                   for lo, hi in scan.shards(min_id, max_id, workers * scan.SHARDS_PER_WORKER)]
+        ids = []
+        for future in futures:
+            ids.extend(future.result())
+        return ids
+
+    @classmethod
+    def _has_trigram(cls, conn: sqlite3.Connection) -> bool:
+        """Есть ли триграммный индекс (он создается только по запросу)"""
+        return cls._table_exists(conn, 'notes_trigram')
+
+    def has_trigram_index(self) -> bool:
+        """Включен ли триграммный индекс поиска по подстроке"""
+        return self._has_trigram(self.connection)
+
+    def set_trigram_index(self, enabled: bool) -> bool:
+        """Строит (enabled=True) или удаляет триграммный индекс одной
+        транзакцией. Возвращает True, если состояние изменилось"""
+        try:
+            with self.write_transaction(sync_fuzzy=False) as conn:
+                if self._has_trigram(conn) == enabled:
+                    return False
+                for statement in TRIGRAM_INDEX if enabled else TRIGRAM_DROP:
+                    conn.execute(statement)
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при изменении триграммного индекса: {e}")
+            raise
+
+    def _scan_executor(self, workers: int):
+        """Пул процессов перебора; создается один раз и живет до close().
+
+        Процессы запускаются через spawn: fork процесса с потоками (демон,
+        AsyncStorage) может унаследовать захваченные блокировки.
+        """
+        with self._connections_lock:
+            if self._scan_pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._scan_pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._scan_pool
+
+    @staticmethod
+    def _fuzzy_queue_end(conn: sqlite3.Connection) -> int:
+        """Наибольший seq очереди fuzzy_dirty (0, если она пуста)"""
+        return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM fuzzy_dirty').fetchone()[0]
+
+    @classmethod
+    def _sync_fuzzy(cls, conn: sqlite3.Connection, after: int = 0,
+                    limit: Optional[int] = None) -> int:
+        """Переносит в словарь нечеткого поиска заметки из fuzzy_dirty с seq
+        больше after (не больше limit), в порядке отметки. Вызывается внутри
+        транзакции записи. Возвращает число обработанных заметок"""
+        done = 0
+        while limit is None or done < limit:
+            size = FUZZY_SYNC_BATCH if limit is None else min(FUZZY_SYNC_BATCH, limit - done)
+            rows = conn.execute(
+                'SELECT fuzzy_dirty.note_id, notes.title, notes.content, notes.tags '
+                'FROM fuzzy_dirty JOIN notes ON notes.id = fuzzy_dirty.note_id '
+                'WHERE fuzzy_dirty.seq > ? ORDER BY fuzzy_dirty.seq LIMIT ?',
+                (after, size)).fetchall()
+            if not rows:
+                break
+            cls._index_fuzzy(conn, rows)
+            done += len(rows)
+        return done
+
+    def fuzzy_backlog(self) -> int:
+        """Сколько заметок ждут переноса в словарь нечеткого поиска"""
+        try:
+            if self._schema_version(self.connection) < FUZZY_SCHEMA_VERSION:
+                return 0
+            return self.connection.execute('SELECT COUNT(*) FROM fuzzy_dirty').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def sync_fuzzy_backlog(self, batch_size: int = FUZZY_BACKLOG_BATCH, progress=None) -> int:
+        """Разбирает очередь словаря нечеткого поиска (после bulk_insert и
+        миграции) транзакциями по batch_size заметок: между ними блокировка
+        записи освобождается для других писателей. Возвращает число заметок"""
+        return self._drain_fuzzy(lambda: self.write_transaction(sync_fuzzy=False),
+                                 batch_size, progress)
+
+    @classmethod
+    def _drain_fuzzy(cls, transaction, batch_size: int, progress=None) -> int:
+        """Тело sync_fuzzy_backlog; transaction() открывает транзакцию записи
+        и отдает соединение (при миграции Storage еще не готов)"""
+        report = progress or (lambda message: None)
+        total = None
+        done = 0
+        reported = time.perf_counter()
+        while True:
+            with transaction() as conn:
+                if total is None:
+                    total = conn.execute('SELECT COUNT(*) FROM fuzzy_dirty').fetchone()[0]
+                count = cls._sync_fuzzy(conn, limit=batch_size)
+            done += count
+            if not count:
+                return done
+            # Не чаще раза в секунду, плюс последняя пачка
+            if done >= total or time.perf_counter() - reported >= 1.0:
+                report(f"   словарь нечеткого поиска: {min(done, total)} из {total}")
+                reported = time.perf_counter()
+
+    @staticmethod
+    @contextmanager
+    def _immediate(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+        """Транзакция BEGIN IMMEDIATE на соединении без Storage (для миграций)"""
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+
+    @staticmethod
+    def _index_fuzzy(conn: sqlite3.Connection, rows: List[tuple]):
+        """Переносит слова заметок (id, title, content, tags) в словарь"""
+        notes = {row[0]: fuzzy.note_terms(*row[1:]) for row in rows}
+        note_ids = json.dumps(list(notes))
+
+        # ID слов: известные - одним запросом, новые - вставкой вместе с вариантами удалений
+        vocabulary = set().union(*notes.values())
+        term_ids = dict(conn.execute(
+            'SELECT term, id FROM fuzzy_terms WHERE term IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(vocabulary), ensure_ascii=False),)))
+        variants = []
+        for term in vocabulary - term_ids.keys():
+            term_id = conn.execute('INSERT INTO fuzzy_terms (term) VALUES (?) RETURNING id',
+                                   (term,)).fetchall()[0][0]
+            term_ids[term] = term_id
+            variants.extend((variant, term_id) for variant in fuzzy.deletes(term))
+        conn.executemany('INSERT OR IGNORE INTO fuzzy_deletes (variant, term_id) VALUES (?, ?)',
+                         variants)
+
+        old: Dict[int, Dict[int, int]] = {}
+        for note_id, term_id, fields in conn.execute(
+                'SELECT note_id, term_id, fields FROM fuzzy_postings '
+                'WHERE note_id IN (SELECT value FROM json_each(?))', (note_ids,)):
+            old.setdefault(note_id, {})[term_id] = fields
+
+        changed, removed = [], []
+        for note_id, terms in notes.items():
+            current = {term_ids[term]: fields for term, fields in terms.items()}
+            previous = old.get(note_id, {})
+            changed.extend((note_id, term_id, fields) for term_id, fields in current.items()
+                           if previous.get(term_id) != fields)
+            removed.extend((note_id, term_id) for term_id in previous.keys() - current.keys())
+
+        # Сначала новые связи, затем удаление старых: слово, перешедшее
+        # из одной заметки в другую, не удаляется триггером и не создается заново
+        conn.executemany(
+            'INSERT INTO fuzzy_postings (note_id, term_id, fields) VALUES (?, ?, ?) '
+            'ON CONFLICT (note_id, term_id) DO UPDATE SET fields = excluded.fields', changed)
+        conn.executemany('DELETE FROM fuzzy_postings WHERE note_id = ? AND term_id = ?', removed)
+        conn.execute('DELETE FROM fuzzy_dirty WHERE note_id IN (SELECT value FROM json_each(?))',
+                     (note_ids,))
+
+    def fuzzy_notes(self, search_term: str, search_in: str = "all",
+                    limit: Optional[int] = None,
+                    full: bool = True) -> List[Union[Note, NoteRow]]:
+        """Ищет заметки со словами, похожими на слова запроса (опечатки до
+        fuzzy.max_distance правок), по убыванию релевантности.
+        При full=False - превью NoteRow только с началом текста.
+        Только чтение: заметки из очереди после bulk_insert находятся
+        после sync_fuzzy_backlog (его вызывают импорт и миграция)"""
+        words = fuzzy.tokenize(search_term)
+        if not words:
+            return []
+        mask = sum(fuzzy.FIELD_MASKS[column] for column in SEARCH_COLUMNS[search_in])
+
+        try:
+            conn = self.connection
+            # Для каждого слова запроса - лучшая близость его слов-кандидатов
+            # (по вариантам удалений) среди слов заметки
+            matches = []
+            for word in words:
+                max_distance = fuzzy.max_distance(word)
+                terms = conn.execute(
+                    'SELECT DISTINCT fuzzy_terms.id, fuzzy_terms.term FROM fuzzy_deletes '
+                    'JOIN fuzzy_terms ON fuzzy_terms.id = fuzzy_deletes.term_id '
+                    'WHERE fuzzy_deletes.variant IN (SELECT value FROM json_each(?))',
+                    (json.dumps(list(fuzzy.deletes(word, max_distance)), ensure_ascii=False),))
+                scores = {}
+                for term_id, term in terms:
+                    distance = fuzzy.distance(word, term, max_distance)
+                    if distance <= max_distance:
+                        scores[term_id] = fuzzy.similarity(word, term, distance)
+                best: Dict[int, float] = {}
+                if scores:
+                    postings = conn.execute(
+                        'SELECT note_id, term_id FROM fuzzy_postings '
+                        'WHERE term_id IN (SELECT value FROM json_each(?)) AND fields & ?',
+                        (json.dumps(list(scores)), mask))
+                    for note_id, term_id in postings:
+                        if scores[term_id] > best.get(note_id, 0.0):
+                            best[note_id] = scores[term_id]
+                matches.append(best)
+
+            return self._load_ranked(fuzzy.rank(matches, limit), full)
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске заметок: {e}")
+            return []
+
+    def has_notes(self) -> bool:
+        """Проверяет, есть ли в БД хотя бы одна заметка"""
+        try:
+            return bool(self._fetch_all('SELECT EXISTS (SELECT 1 FROM notes)')[0][0])
+        except sqlite3.Error:
+            return False
+
     def get_next_id(self) -> int:
-        """Генерирует следующий ID для новой заметки"""
+        """Ожидаемый ID следующей заметки - только для отображения.
+
+        Между этим запросом и вставкой другой процесс может занять этот ID,
+        поэтому при записи ID выдает база (add_note, save_notes)."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT MAX(id) FROM notes')
-                result = cursor.fetchone()
-                max_id = result[0] if result[0] else 0
-                return max_id + 1
+            result = self.connection.execute('SELECT MAX(id) FROM notes').fetchone()
+            max_id = result[0] if result[0] else 0
+            return max_id + 1
         except sqlite3.Error:
             return 1
 
     def get_all_tags(self) -> List[str]:
         """Возвращает список всех уникальных тегов"""
-        all_tags = set()
+        return [tag for tag, _ in self.get_tag_counts()]
 
+    def get_tag_counts(self) -> List[Tuple[str, int]]:
+        """Возвращает теги с количеством заметок одним запросом, по алфавиту"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT tags FROM notes')
-                rows = cursor.fetchall()
+            return self._fetch_all('''
+                SELECT tags.name, COUNT(*) FROM note_tags
+                JOIN tags ON tags.id = note_tags.tag_id
+                GROUP BY note_tags.tag_id
+                ORDER BY tags.name
+            ''')
+        except sqlite3.Error:
+            return []
 
-                for row in rows:
-                    if row[0] and row[0] != "[]":
-                        try:
-                            tags = json.loads(row[0])
-                            if isinstance(tags, list):
-                                all_tags.update(tags)
-                        except json.JSONDecodeError:
-                            continue
+    def load_rendered(self, keys: List[Tuple[int, str]]) -> Dict[Tuple[int, str], str]:
+        """Читает сохраненные блоки RenderCache по ключам (id, updated_at)"""
+        wanted = dict(keys)
+        found = {}
+        try:
+            cursor = self.connection.cursor()
+            ids = list(wanted)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor.execute(
+                    f"SELECT note_id, updated_at, block FROM render_cache "
+                    f"WHERE note_id IN ({', '.join('?' * len(chunk))})", chunk)
+                for note_id, updated_at, block in cursor:
+                    # Блок устарел, если заметку меняли после отрисовки
+                    if wanted[note_id] == updated_at:
+                        found[(note_id, updated_at)] = block
+        except sqlite3.Error:
+            # Кэш необязателен: при ошибке заметки просто отрисуются заново
+            pass
+        return found
 
-            return sorted(list(all_tags))
+    def save_rendered(self, blocks: Iterable[Tuple[int, str, str]]):
+        """Сохраняет блоки RenderCache (id, updated_at, block)"""
+        try:
+            with self.write_transaction() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO render_cache (note_id, updated_at, block) '
+                    'VALUES (?, ?, ?)', blocks)
         except sqlite3.Error:
-            return []
+            pass
+
+    def bulk_insert(self, notes: Iterable[Note], chunk_size: int = 10000,
+                    defer_indexes: bool = True) -> int:
+        """Вставляет заметки пачками в одной транзакции и возвращает их количество.
+
+        ID назначаются базой. При defer_indexes индексы и триггеры таблицы notes
+        снимаются на время загрузки и восстанавливаются в конце той же транзакции.
+        """
+        iterator = iter(notes)
+        inserted = 0
+        insert_sql = (f"INSERT INTO notes ({', '.join(self.COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(self.COLUMNS))})")
 
-    def add_note(self, note: Note) -> int:
-        """Добавляет одну заметку и возвращает её ID"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # Словарь нечеткого поиска для загруженных заметок строится после
+            # загрузки пачками (sync_fuzzy_backlog), а не в этой транзакции
+            with self.write_transaction(sync_fuzzy=False) as conn:
                 cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT MAX(COALESCE((SELECT MAX(id) FROM notes), 0),
+                               COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'notes'), 0))
+                ''')
+                min_id = cursor.fetchone()[0]
 
-                created_at = str(note.created_at) if note.created_at else ""
-                updated_at = str(note.updated_at) if note.updated_at else ""
+                deferred = []
+                if defer_indexes:
+                    cursor.execute('''
+                        SELECT type, name, sql FROM sqlite_master
+                        WHERE tbl_name = 'notes' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+                    ''')
+                    deferred = cursor.fetchall()
+                    for obj_type, name, _ in deferred:
+                        cursor.execute(f'DROP {obj_type.upper()} "{name}"')
 
-                cursor.execute('''
-                    INSERT INTO notes 
-                    (title, content, category, priority, tags, status, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    note.title,
-                    note.content or "",
-                    note.category.value if hasattr(note.category, 'value') else str(note.category),
-                    note.priority.value if hasattr(note.priority, 'value') else str(note.priority),
-                    json.dumps(note.tags, ensure_ascii=False) if note.tags else "[]",
-                    note.status.value if hasattr(note.status, 'value') else str(note.status),
-                    created_at,
-                    updated_at
-                ))
+                while True:
+                    chunk = [self.note_to_row(note) for note in itertools.islice(iterator, chunk_size)]
+                    if not chunk:
+                        break
+                    cursor.executemany(insert_sql, chunk)
+                    inserted += len(chunk)
 
-                note_id = cursor.lastrowid
-                conn.commit()
-                return note_id
+                if deferred:
+                    for _, _, sql in deferred:
+                        cursor.execute(sql)
+                    backfills = list(DEFERRED_BACKFILLS)
+                    if any(name == 'notes_trigram_ai' for _, name, _ in deferred):
+                        backfills.append(TRIGRAM_BACKFILL)
+                    for sql in backfills:
+                        cursor.execute(sql.format(ids=f'notes.id > {int(min_id)}'))
+
+            return inserted
+
+        except sqlite3.Error as e:
+            print(f"Ошибка при массовой вставке заметок: {e}")
+            return 0
+
+    def add_note(self, note: Note) -> int:
+        """Добавляет одну заметку и возвращает её ID, выданный базой"""
+        try:
+            with self.write_transaction() as conn:
+                # ID назначает AUTOINCREMENT внутри транзакции записи, поэтому
+                # параллельные процессы не получат одинаковых ID
+                rows = conn.execute(
+                    f"INSERT INTO notes ({', '.join(self.COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(self.COLUMNS))}) RETURNING id",
+                    self.note_to_row(note)
+                ).fetchall()
+            return rows[0][0]
 
         except sqlite3.Error as e:
             print(f"Ошибка при добавлении заметки: {e}")
@@ -177,13 +1375,13 @@ class Storage:
 
     def update_note(self, note: Note) -> bool:
         """Обновляет существующую заметку"""
+        if isinstance(note, NoteRow):
+            # Иначе обрезанный текст превью перезаписал бы полный
+            print(f"Ошибка при обновлении заметки: заметка #{note.id} загружена только для чтения")
+            return False
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-
-                updated_at = str(note.updated_at) if note.updated_at else ""
-
-                cursor.execute('''
+            with self.write_transaction() as conn:
+                cursor = conn.execute('''
                     UPDATE notes 
                     SET title = ?, content = ?, category = ?, priority = ?, 
                         tags = ?, status = ?, updated_at = ?
@@ -195,50 +1393,67 @@ class Storage:
                     note.priority.value if hasattr(note.priority, 'value') else str(note.priority),
                     json.dumps(note.tags, ensure_ascii=False) if note.tags else "[]",
                     note.status.value if hasattr(note.status, 'value') else str(note.status),
-                    updated_at,
+                    str(note.updated_at) if note.updated_at else "",
                     note.id
                 ))
-
-                conn.commit()
-                return cursor.rowcount > 0
+            return cursor.rowcount > 0
 
         except sqlite3.Error as e:
             print(f"Ошибка при обновлении заметки: {e}")
             return False
 
-    def delete_note(self, note_id: int) -> bool:
-        """Удаляет заметку по ID"""
+    def delete_note(self, note_id: int) -> Optional[bool]:
+        """Удаляет заметку по ID. False - заметки нет, None - ошибка БД"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM notes WHERE id = ?', (note_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+            with self.write_transaction() as conn:
+                cursor = conn.execute('DELETE FROM notes WHERE id = ?', (note_id,))
+            return cursor.rowcount > 0
         except sqlite3.Error as e:
             print(f"Ошибка при удалении заметки: {e}")
-            return False
+            return None
 
     def get_note_by_id(self, note_id: int) -> Optional[Note]:
         """Получает заметку по ID"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM notes WHERE id = ?', (note_id,))
-                row = cursor.fetchone()
-
-                if row:
-                    return Note(
-                        id=row[0],
-                        title=row[1],
-                        content=row[2],
-                        category=NoteCategory(row[3]) if row[3] else NoteCategory.other,
-                        priority=NotePriority(row[4]) if row[4] else NotePriority.medium,
-                        tags=json.loads(row[5]) if row[5] and row[5] != "[]" else [],
-                        status=Status(row[6]) if row[6] else Status.active,
-                        created_at=row[7],
-                        updated_at=row[8]
-                    )
-                return None
+            rows = self._fetch_all('SELECT * FROM notes WHERE id = ?', (note_id,))
+            if rows:
+                return self._row_to_note(rows[0])
+            return None
         except sqlite3.Error as e:
             print(f"Ошибка при получении заметки: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def update_status(self, note_id: int, status: Status, updated_at: str) -> Optional[bool]:
+        """Атомарно меняет статус заметки, если он отличается от текущего.
+        False - заметки нет или статус уже такой, None - ошибка БД"""
+        try:
+            with self.write_transaction() as conn:
+                cursor = conn.execute('''
+                    UPDATE notes
+                    SET status = ?, updated_at = ?
+                    WHERE id = ? AND status IS NOT ?
+                ''', (status.value, updated_at, note_id, status.value))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Ошибка при изменении статуса заметки: {e}")
+            return None
+
+    @staticmethod
+    def _row_to_note(row) -> Note:
+        """Создает Note из строки БД"""
+        return Note(
+            id=row[0],
+            title=row[1],
+            content=row[2],
+            category=NoteCategory(row[3]) if row[3] else NoteCategory.OTHER,
+            priority=NotePriority(row[4]) if row[4] else NotePriority.MEDIUM,
+            tags=json.loads(row[5]) if row[5] and row[5] != "[]" else [],
+            status=Status(row[6]) if row[6] else Status.ACTIVE,
+            created_at=row[7],  # Это строка
+            updated_at=row[8]  # Это строка
+        )
+
+    @staticmethod
+    def _row_to_view(row) -> NoteRow:
+        """Оборачивает строку БД (полную или SUMMARY_COLUMNS) в NoteRow без разбора полей"""
+        return NoteRow(*row)
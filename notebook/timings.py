@@ -0,0 +1,73 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+
+class Timings:
+    """Накопитель времени по фазам и счетчиков для флага --timings.
+
+    Хранилище и команды получают экземпляр через параметр timings; без него
+    они не делают никаких замеров, кроме проверки self.timings is None.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # имя -> [секунды, вызовы]
+        self.counters: Dict[str, int] = {}
+
+    def record(self, phase: str, seconds: float):
+        entry = self.phases.setdefault(phase, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def count(self, counter: str, value: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def count_rows(self, rows: list):
+        """Учитывает прочитанные строки и объем декодированных из БД данных"""
+        self.count('строк прочитано', len(rows))
+        self.count('байт декодировано', sum(
+            len(value.encode('utf-8')) if isinstance(value, str) else len(value)
+            for row in rows for value in row if isinstance(value, (str, bytes))))
+
+    def instrument(self, obj, prefix: str, names: Iterable[str]):
+        """Оборачивает методы экземпляра obj замером времени.
+
+        Обертки ставятся только на этот экземпляр, поэтому без --timings
+        методы вызываются напрямую, без накладных расходов.
+        """
+        for name in names:
+            method = getattr(obj, name)
+            setattr(obj, name, self._timed(f"{prefix}.{name.lstrip('_')}", method))
+
+    def _timed(self, phase: str, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(phase, time.perf_counter() - start)
+        return wrapper
+
+    def report(self) -> str:
+        """Таблица фаз в порядке первого появления; вложенные фазы входят во внешние"""
+        total = time.perf_counter() - self.started
+        lines = ["=== Тайминги ===",
+                 f"{'фаза':<28} {'вызовов':>8} {'мс':>10} {'%':>6}"]
+        for name, (seconds, calls) in self.phases.items():
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"{name:<28} {calls:>8} {seconds * 1000:>10.2f} {share:>6.1f}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<28} {value:>8}")
+        lines.append(f"{'всего':<28} {'':>8} {total * 1000:>10.2f}")
+        return "\n".join(lines)
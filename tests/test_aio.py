@@ -0,0 +1,105 @@
+# tests/test_aio.py
+import unittest
+import asyncio
+import tempfile
+import threading
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.aio import AsyncStorage, AsyncCommands
+from notebook.storage import Storage
+from notebook.commands import Commands
+from notebook.models import Note, NoteCategory
+
+
+class TestAsyncStorage(unittest.IsolatedAsyncioTestCase):
+    """Тесты для aio.py"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = AsyncStorage(os.path.join(self.tmp.name, "notes.db"), readers=2)
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+        self.tmp.cleanup()
+
+    def test_method_names_mirror_sync_api(self):
+        """Тест: асинхронные методы называются так же, как синхронные"""
+        for name in AsyncStorage.READ_METHODS + AsyncStorage.WRITE_METHODS:
+            self.assertTrue(hasattr(Storage, name), name)
+            self.assertTrue(asyncio.iscoroutinefunction(getattr(AsyncStorage, name)), name)
+        for name in AsyncCommands.READ_METHODS + AsyncCommands.WRITE_METHODS:
+            self.assertTrue(hasattr(Commands, name), name)
+
+    async def test_crud(self):
+        """Тест добавления, чтения и фильтрации через асинхронный API"""
+        note_id = await self.storage.add_note(Note(id=None, title="Async", content="текст",
+                                                   category=NoteCategory.WORK))
+        note = await self.storage.get_note_by_id(note_id)
+        self.assertEqual(note.title, "Async")
+        self.assertEqual(len(await self.storage.find_notes(category=NoteCategory.WORK)), 1)
+        self.assertTrue(await self.storage.delete_note(note_id))
+        self.assertFalse(await self.storage.has_notes())
+
+    async def test_writes_on_dedicated_thread(self):
+        """Тест: записи идут в одном потоке, чтения - в пуле чтения"""
+        writers = {await self.storage.run_write(lambda: threading.current_thread().name)
+                   for _ in range(5)}
+        reader = await self.storage.run_read(lambda: threading.current_thread().name)
+
+        self.assertEqual(len(writers), 1)
+        self.assertTrue(writers.pop().startswith('notes-writer'))
+        self.assertTrue(reader.startswith('notes-reader'))
+        self.assertNotEqual(reader, threading.current_thread().name)
+
+    async def test_concurrent_readers(self):
+        """Тест: два чтения выполняются одновременно"""
+        barrier = threading.Barrier(2, timeout=5)
+        await asyncio.gather(self.storage.run_read(barrier.wait),
+                             self.storage.run_read(barrier.wait))
+
+    async def test_iter_rows_streams_all_rows(self):
+        """Тест потоковой выдачи строк"""
+        await self.storage.bulk_insert(Note(id=None, title=f"N{i}", content="") for i in range(25))
+
+        ids = [row[0] async for row in self.storage.iter_rows(batch_size=4)]
+
+        self.assertEqual(ids, list(range(1, 26)))
+
+    async def test_iter_rows_backpressure_and_early_stop(self):
+        """Тест: чтение не уходит далеко вперед потребителя и прекращается при выходе из цикла"""
+        produced = []
+
+        def rows(batch_size):
+            for i in range(1000):
+                produced.append(i)
+                yield (i,)
+
+        self.storage.storage.iter_rows = rows
+        stream = self.storage.iter_rows(batch_size=10, prefetch=2)
+        self.assertEqual(await stream.__anext__(), (0,))
+        await asyncio.sleep(0.1)
+        # Пачка у потребителя, две в очереди и одна, ждущая места
+        self.assertLessEqual(len(produced), 40)
+
+        await stream.aclose()
+        self.assertLess(len(produced), 1000)
+        # Поток чтения освобожден
+        self.assertFalse(await self.storage.has_notes())
+
+    async def test_async_commands(self):
+        """Тест команд через AsyncCommands"""
+        commands = AsyncCommands(self.storage)
+
+        result = await commands.add_note("Асинхронная", "текст", "work", tags=["a"])
+        self.assertIn("Заметка добавлена (ID: 1)", result)
+
+        listings = await asyncio.gather(*(commands.list_notes() for _ in range(3)))
+        self.assertTrue(all("Асинхронная" in listing for listing in listings))
+        self.assertIn("#a (1 заметок)", await commands.list_tags())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_batch.py
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import parse_command_line
+from notebook.batch import BatchRunner, commands_from, parse_json
+from notebook.commands import Commands
+from notebook.storage import Storage
+
+
+class TestBatchParsing(unittest.TestCase):
+    """Тесты разбора строк пакета"""
+
+    def test_commands_from_skips_blank_and_comments(self):
+        """Тест: пустые строки и комментарии пропускаются, номера строк сохраняются"""
+        lines = ["# заголовок\n", "\n", "tags\n", "  list --full  \n"]
+        self.assertEqual(list(commands_from(lines)), [(3, "tags"), (4, "list --full")])
+
+    def test_parse_json(self):
+        """Тест: JSON-строка в формате запроса к демону"""
+        call = parse_json('{"command": "delete_note", "args": [3]}')
+        self.assertEqual(call, ("delete_note", (3,), {}))
+        with self.assertRaises(ValueError):
+            parse_json('{"command": "delete_note"')
+        with self.assertRaises(ValueError):
+            parse_json('{"command": "add_note", "kwargs": []}')
+
+    def test_parse_command_line(self):
+        """Тест: строка в синтаксисе CLI разбирается тем же парсером, что и argv"""
+        method, positional, kwargs = parse_command_line('add "Два слова" текст -t a b')
+        self.assertEqual(method, "add_note")
+        self.assertEqual(kwargs["title"], "Два слова")
+        self.assertEqual(kwargs["tags"], ["a", "b"])
+        self.assertEqual(parse_command_line("delete 7"), ("delete_note", (7,), {}))
+        with self.assertRaises(ValueError):
+            parse_command_line("delete не-число")
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Тесты выполнения пакета"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = Storage(db_path=os.path.join(self.tmp.name, "notes.db"))
+        self.commands = Commands(self.storage)
+        self.out = io.StringIO()
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def run_batch(self, lines, **options):
+        runner = BatchRunner(self.commands, parse_command_line, out=self.out, **options)
+        runner.run(lines)
+        return runner
+
+    def test_results_per_line(self):
+        """Тест: команды CLI и JSON выполняются, результат печатается с номером строки"""
+        payload = {"command": "add_note", "kwargs": {"title": "Из JSON", "content": "текст"}}
+        runner = self.run_batch([
+            'add "Первая" "текст" -t идея',
+            json.dumps(payload, ensure_ascii=False),
+            "delete 999",
+            "search текст --words",
+        ])
+
+        lines = self.out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("1: Заметка добавлена"))
+        self.assertTrue(lines[1].startswith("2: Заметка добавлена"))
+        self.assertTrue(lines[2].startswith("3: Ошибка"))
+        self.assertIn("(2 найдено)", self.out.getvalue())
+        self.assertEqual(runner.stats["commands"], 4)
+        self.assertEqual(runner.stats["failed"], 1)
+        self.assertEqual(runner.stats["transactions"], 1)
+        self.assertIn("команд/с", runner.report())
+
+    def test_groups(self):
+        """Тест: команды идут группами по group_size в отдельных транзакциях"""
+        runner = self.run_batch([f"add n{i} текст" for i in range(5)], group_size=2)
+        self.assertEqual(runner.stats["transactions"], 3)
+        self.assertEqual(len(self.storage.load_notes()), 5)
+
+    def test_stop_on_error(self):
+        """Тест: с stop_on_error пакет останавливается, выполненное до ошибки сохраняется"""
+        runner = self.run_batch(["add a текст", "add", "add b текст"], stop_on_error=True)
+        self.assertEqual(runner.stats["commands"], 2)
+        self.assertEqual([note.title for note in self.storage.load_notes()], ["a"])
+
+    def test_disallowed_command(self):
+        """Тест: migrate и daemon в пакете не выполняются"""
+        self.run_batch(["migrate", '{"command": "migrate"}'])
+        lines = self.out.getvalue().splitlines()
+        self.assertTrue(all(": Ошибка" in line for line in lines))
+        self.assertEqual(len(lines), 2)
+
+    def test_reads_see_earlier_writes(self):
+        """Тест: чтение внутри группы видит записи предыдущих команд, а не кэш"""
+        self.run_batch(["list", "add a текст", "list"])
+        self.assertIn("#1: a", self.out.getvalue().split("3: ")[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
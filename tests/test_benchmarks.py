@@ -0,0 +1,66 @@
+# tests/test_benchmarks.py
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.corpus import generate_notes
+from benchmarks.suite import compare, percentile
+from notebook.models import Status
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Тесты вспомогательного кода бенчмарков"""
+
+    def test_corpus_is_deterministic(self):
+        """Тест: одинаковое зерно дает одинаковый корпус"""
+        first = [note.to_dict() for note in generate_notes(200, seed=7)]
+        second = [note.to_dict() for note in generate_notes(200, seed=7)]
+        other = [note.to_dict() for note in generate_notes(200, seed=8)]
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_corpus_mix(self):
+        """Тест состава корпуса: оба статуса, оба языка, теги, порядок создания"""
+        notes = list(generate_notes(1000))
+        statuses = {note.status for note in notes}
+        text = " ".join(note.content for note in notes)
+
+        self.assertEqual(statuses, {Status.ACTIVE, Status.ARCHIVED})
+        self.assertRegex(text, "[а-я]")
+        self.assertRegex(text, "[a-z]")
+        self.assertTrue(any(note.tags for note in notes))
+        self.assertEqual([note.created_at for note in notes],
+                         sorted(note.created_at for note in notes))
+
+    def test_percentile(self):
+        """Тест перцентилей с интерполяцией"""
+        samples = [4.0, 1.0, 3.0, 2.0, 5.0]
+        self.assertEqual(percentile(samples, 50), 3.0)
+        self.assertEqual(percentile(samples, 100), 5.0)
+        self.assertAlmostEqual(percentile(samples, 90), 4.6)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_compare_flags_regressions(self):
+        """Тест сравнения с базовыми результатами"""
+        def result(case, p50, peak):
+            return {'case': case, 'size': 1000, 'p50_ms': p50, 'peak_mb': peak}
+
+        baseline = {'results': [result('list', 10.0, 5.0), result('tags', 0.01, 0.1),
+                                result('search', 10.0, 5.0)]}
+        current = {'results': [result('list', 20.0, 5.0), result('tags', 0.03, 0.1),
+                               result('search', 9.0, 12.0), result('new', 1.0, 1.0)]}
+
+        rows = {row['case']: row for row in compare(baseline, current, threshold=0.25)}
+
+        self.assertEqual(rows['list']['regressions'], ['latency'])
+        # Рост в разы, но меньше порога шума по абсолютной величине
+        self.assertEqual(rows['tags']['regressions'], [])
+        self.assertEqual(rows['search']['regressions'], ['memory'])
+        self.assertNotIn('new', rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
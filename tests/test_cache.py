@@ -0,0 +1,64 @@
+# tests/test_cache.py
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    """Тесты для cache.py"""
+
+    def test_hit_and_miss(self):
+        """Тест попадания при той же отметке версии"""
+        cache = QueryCache()
+        self.assertIsNone(cache.get('q', 1))
+        cache.put('q', [(1,)], 1)
+
+        self.assertEqual(cache.get('q', 1), [(1,)])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_new_stamp_clears_entries(self):
+        """Тест: смена отметки версии сбрасывает все записи"""
+        cache = QueryCache()
+        cache.put('a', [1], (1, 0))
+        cache.put('b', [2], (1, 0))
+
+        self.assertIsNone(cache.get('a', (1, 1)))
+        self.assertEqual(len(cache), 0)
+
+    def test_size_limit(self):
+        """Тест вытеснения давно не использованных записей"""
+        cache = QueryCache(maxsize=2)
+        cache.put('a', [1], 0)
+        cache.put('b', [2], 0)
+        cache.get('a', 0)
+        cache.put('c', [3], 0)
+
+        self.assertEqual(cache.get('a', 0), [1])
+        self.assertIsNone(cache.get('b', 0))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        """Тест истечения времени жизни записи"""
+        cache = QueryCache(ttl=10)
+        with patch('notebook.cache.time.monotonic', return_value=100.0):
+            cache.put('q', [1], 0)
+        with patch('notebook.cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get('q', 0), [1])
+        with patch('notebook.cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get('q', 0))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        """Тест: при maxsize=0 ничего не сохраняется"""
+        cache = QueryCache(maxsize=0)
+        cache.put('q', [1], 0)
+        self.assertIsNone(cache.get('q', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
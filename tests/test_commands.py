@@ -18,6 +18,8 @@ class TestCommands(unittest.TestCase):
         """Настройка перед каждым тестом"""
         # Создаем мок Storage
         self.mock_storage = MagicMock()
+        self.mock_storage.fuzzy_backlog.return_value = 0
+        self.mock_storage.sync_fuzzy_backlog.return_value = 0
         self.commands = Commands(self.mock_storage)
 
         # Создаем тестовые заметки
@@ -64,8 +66,7 @@ class TestCommands(unittest.TestCase):
     def test_add_note_success(self):
         """Тест успешного добавления заметки"""
         # Настраиваем моки
-        self.mock_storage.load_notes.return_value = []
-        self.mock_storage.get_next_id.return_value = 1
+        self.mock_storage.add_note.return_value = 1
 
         result = self.commands.add_note(
             title="Test Title",
@@ -75,18 +76,17 @@ class TestCommands(unittest.TestCase):
             tags=["tag1", "tag2"]
         )
 
-        # Проверяем вызовы
-        self.mock_storage.load_notes.assert_called_once()
-        self.mock_storage.get_next_id.assert_called_once()
-        self.mock_storage.save_notes.assert_called_once()
+        # Проверяем вызовы: только точечная вставка, без перезаписи таблицы
+        self.mock_storage.add_note.assert_called_once()
+        self.mock_storage.load_notes.assert_not_called()
+        self.mock_storage.save_notes.assert_not_called()
 
         # Проверяем результат
         self.assertIn("Заметка добавлена (ID: 1): Test Title", result)
 
     def test_add_note_default_values(self):
         """Тест добавления заметки со значениями по умолчанию"""
-        self.mock_storage.load_notes.return_value = []
-        self.mock_storage.get_next_id.return_value = 1
+        self.mock_storage.add_note.return_value = 1
 
         result = self.commands.add_note(
             title="Test Title",
@@ -98,12 +98,11 @@ class TestCommands(unittest.TestCase):
 
         self.assertIn("Заметка добавлена", result)
         # Проверяем, что сохранение вызвано с заметкой
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        self.assertEqual(len(saved_notes), 1)
-        self.assertEqual(saved_notes[0].title, "Test Title")
-        self.assertEqual(saved_notes[0].category, NoteCategory.OTHER)
-        self.assertEqual(saved_notes[0].priority, NotePriority.MEDIUM)
-        self.assertEqual(saved_notes[0].tags, [])
+        saved_note = self.mock_storage.add_note.call_args[0][0]
+        self.assertEqual(saved_note.title, "Test Title")
+        self.assertEqual(saved_note.category, NoteCategory.OTHER)
+        self.assertEqual(saved_note.priority, NotePriority.MEDIUM)
+        self.assertEqual(saved_note.tags, [])
 
     def test_add_note_invalid_category(self):
         """Тест добавления заметки с невалидной категорией"""
@@ -118,7 +117,7 @@ class TestCommands(unittest.TestCase):
         self.assertIn("Ошибка: Неверная категория 'invalid_category'", result)
         self.assertIn("Допустимые значения:", result)
         # Проверяем, что сохранение не вызывалось
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.add_note.assert_not_called()
 
     def test_add_note_invalid_priority(self):
         """Тест добавления заметки с невалидным приоритетом"""
@@ -131,12 +130,11 @@ class TestCommands(unittest.TestCase):
 
         self.assertIn("Ошибка: Неверный приоритет 'invalid_priority'", result)
         self.assertIn("Допустимые значения: low, medium, high", result)
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.add_note.assert_not_called()
 
     def test_add_note_case_insensitive(self):
         """Тест добавления заметки с разным регистром"""
-        self.mock_storage.load_notes.return_value = []
-        self.mock_storage.get_next_id.return_value = 1
+        self.mock_storage.add_note.return_value = 1
 
         result = self.commands.add_note(
             title="Test",
@@ -150,255 +148,376 @@ class TestCommands(unittest.TestCase):
 
     def test_list_notes_empty(self):
         """Тест вывода списка заметок, когда их нет"""
-        self.mock_storage.load_notes.return_value = []
+        self.mock_storage.find_notes.return_value = []
+        self.mock_storage.has_notes.return_value = False
 
         result = self.commands.list_notes()
 
         self.assertEqual(result, "Нет заметок")
-        self.mock_storage.load_notes.assert_called_once()
+        self.mock_storage.find_notes.assert_called_once()
+        self.mock_storage.load_notes.assert_not_called()
 
     def test_list_notes_no_filters(self):
         """Тест вывода списка заметок без фильтров"""
-        notes = [self.test_note1, self.test_note2, self.test_note3]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.find_notes.return_value = [self.test_note2, self.test_note1]
 
         result = self.commands.list_notes()
 
-        # Проверяем основные элементы вывода
-        # Внимание: архивные заметки НЕ показываются по умолчанию (status='active')
-        # Поэтому будет показано только 2 заметки (test_note1 и test_note2)
+        # По умолчанию запрашиваются только активные заметки (status='active')
+        self.mock_storage.find_notes.assert_called_once_with(
+            category=None, priority=None, status=Status.ACTIVE, limit=None, after=None, full=False
+        )
         self.assertIn("=== Найдено заметок: 2 ===", result)
         self.assertIn("Test Note 1", result)
         self.assertIn("Test Note 2", result)
-        self.assertNotIn("Archived Note", result)  # Архивная заметка не показывается
         self.assertIn("─" * 50, result)
+        # Порядок берется из БД (новые сначала)
+        self.assertLess(result.index("Test Note 2"), result.index("Test Note 1"))
 
     def test_list_notes_filter_by_category(self):
         """Тест фильтрации заметок по категории"""
-        notes = [self.test_note1, self.test_note2, self.test_note3]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.find_notes.return_value = [self.test_note1]
 
         # Фильтруем по категории work
         result = self.commands.list_notes(category="work")
 
+        self.mock_storage.find_notes.assert_called_once_with(
+            category=NoteCategory.WORK, priority=None, status=Status.ACTIVE, limit=None, after=None, full=False
+        )
         self.assertIn("=== Найдено заметок: 1 ===", result)
         self.assertIn("Test Note 1", result)
-        self.assertNotIn("Test Note 2", result)  # Другая категория
-        self.assertNotIn("Archived Note", result)  # Другая категория
 
     def test_list_notes_filter_by_priority(self):
         """Тест фильтрации заметок по приоритету"""
-        notes = [self.test_note1, self.test_note2, self.test_note3]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.find_notes.return_value = [self.test_note1]
 
         # Фильтруем по приоритету high
-        result = self.commands.list_notes(priority="high")
+        result = self.commands.list_notes(priority="HIGH")
 
+        self.mock_storage.find_notes.assert_called_once_with(
+            category=None, priority=NotePriority.HIGH, status=Status.ACTIVE, limit=None, after=None, full=False
+        )
         self.assertIn("=== Найдено заметок: 1 ===", result)
-        self.assertIn("Test Note 1", result)
-        self.assertNotIn("Test Note 2", result)  # Другой приоритет
-        self.assertNotIn("Archived Note", result)  # Другой приоритет
 
     def test_list_notes_filter_by_status(self):
         """Тест фильтрации заметок по статусу"""
-        notes = [self.test_note1, self.test_note2, self.test_note3]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.find_notes.return_value = [self.test_note3]
 
         # Фильтруем по статусу archived
         result = self.commands.list_notes(status="archived")
 
+        self.mock_storage.find_notes.assert_called_once_with(
+            category=None, priority=None, status=Status.ARCHIVED, limit=None, after=None, full=False
+        )
         self.assertIn("=== Найдено заметок: 1 ===", result)
         self.assertIn("Archived Note", result)
-        self.assertNotIn("Test Note 1", result)  # Другой статус
-        self.assertNotIn("Test Note 2", result)  # Другой статус
 
     def test_list_notes_with_show_content(self):
         """Тест вывода списка с полным содержимым"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        long_note = Note(id=4, title="Long", content="x" * 150)
+        self.mock_storage.find_notes.return_value = [long_note]
 
         result = self.commands.list_notes(show_content=True)
 
-        # Проверяем, что есть полный текст (когда контент длинный)
-        # В нашем случае контент короткий, но все равно проверяем структуру
-        self.assertIn("Test Note 1", result)
+        self.assertIn("Полный текст: " + "x" * 150, result)
+
+    def test_list_notes_full_loads_content(self):
+        """Тест: полный текст запрашивается у хранилища только с --full"""
+        self.mock_storage.find_notes.return_value = [self.test_note1]
+
+        self.commands.list_notes(show_content=True)
+
+        self.assertTrue(self.mock_storage.find_notes.call_args.kwargs['full'])
 
     def test_list_notes_invalid_category_filter(self):
         """Тест фильтрации с невалидной категорией"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
-
         result = self.commands.list_notes(category="invalid_category")
 
         self.assertIn("Ошибка: Неверная категория 'invalid_category'", result)
+        self.mock_storage.find_notes.assert_not_called()
 
     def test_list_notes_invalid_priority_filter(self):
         """Тест фильтрации с невалидным приоритетом"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
-
         result = self.commands.list_notes(priority="invalid_priority")
 
         self.assertIn("Ошибка: Неверный приоритет 'invalid_priority'", result)
+        self.mock_storage.find_notes.assert_not_called()
 
     def test_list_notes_invalid_status_filter(self):
         """Тест фильтрации с невалидным статусом"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
-
         result = self.commands.list_notes(status="invalid_status")
 
         self.assertIn("Ошибка: Неверный статус 'invalid_status'", result)
+        self.mock_storage.find_notes.assert_not_called()
 
     def test_list_notes_no_matches(self):
         """Тест фильтрации, когда нет совпадений"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.find_notes.return_value = []
+        self.mock_storage.has_notes.return_value = True
 
         # Фильтруем по категории, которой нет
         result = self.commands.list_notes(category="study")
 
         self.assertEqual(result, "Заметки не найдены по заданным критериям")
 
+    def test_list_notes_pagination(self):
+        """Тест постраничного вывода с токеном следующей страницы"""
+        self.mock_storage.find_notes.return_value = [self.test_note3, self.test_note2, self.test_note1]
+        self.mock_storage.encode_cursor.return_value = "TOKEN"
+        self.mock_storage.decode_cursor.return_value = ("2024-01-04T10:00:00", 4)
+
+        result = self.commands.list_notes(status=None, limit=2, after="PREV")
+
+        # Запрашивается на одну строку больше, чтобы узнать о следующей странице
+        self.mock_storage.find_notes.assert_called_once_with(
+            category=None, priority=None, status=None,
+            limit=3, after=("2024-01-04T10:00:00", 4), full=False
+        )
+        self.mock_storage.encode_cursor.assert_called_once_with(self.test_note2)
+        self.assertIn("=== Показано заметок: 2 ===", result)
+        self.assertNotIn("Test Note 1", result)
+        self.assertTrue(result.endswith("Следующая страница: --after TOKEN"))
+
+    def test_list_notes_last_page(self):
+        """Тест последней страницы без токена продолжения"""
+        self.mock_storage.find_notes.return_value = [self.test_note1]
+
+        result = self.commands.list_notes(limit=2)
+
+        self.assertNotIn("Следующая страница", result)
+        self.mock_storage.encode_cursor.assert_not_called()
+
+    def test_list_notes_invalid_cursor(self):
+        """Тест поврежденного токена продолжения"""
+        self.mock_storage.decode_cursor.side_effect = ValueError("Неверный токен продолжения 'bad'")
+
+        result = self.commands.list_notes(after="bad")
+
+        self.assertEqual(result, "Ошибка: Неверный токен продолжения 'bad'")
+        self.mock_storage.find_notes.assert_not_called()
+
+    def test_search_notes_pagination(self):
+        """Тест постраничного поиска"""
+        self.mock_storage.search_notes.return_value = [self.test_note2, self.test_note1]
+        self.mock_storage.encode_cursor.return_value = "TOKEN"
+
+        result = self.commands.search_notes("test", limit=1, mode="words")
+
+        self.mock_storage.search_notes.assert_called_once_with("test", "all", limit=2, after=None, full=False)
+        self.assertIn("=== Результаты поиска: 'test' (показано 1) ===", result)
+        self.assertIn("Следующая страница: --after TOKEN", result)
+
     def test_search_notes_empty(self):
         """Тест поиска, когда нет заметок"""
-        self.mock_storage.load_notes.return_value = []
+        self.mock_storage.search_notes.return_value = []
+        self.mock_storage.has_notes.return_value = False
 
-        result = self.commands.search_notes("test")
+        result = self.commands.search_notes("test", mode="words")
 
         self.assertEqual(result, "Нет заметок")
 
     def test_search_notes_in_title(self):
         """Тест поиска по заголовку"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = [self.test_note1]
 
-        result = self.commands.search_notes("Note 1", search_in="title")
+        result = self.commands.search_notes("Note 1", search_in="title", mode="words")
 
+        self.mock_storage.search_notes.assert_called_once_with("Note 1", "title", limit=None, after=None, full=False)
         self.assertIn("=== Результаты поиска: 'note 1' (1 найдено) ===", result)
         self.assertIn("Test Note 1", result)
         self.assertNotIn("Test Note 2", result)
 
     def test_search_notes_in_content(self):
         """Тест поиска по содержимому"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = [self.test_note2]
 
-        result = self.commands.search_notes("content 2", search_in="content")
+        result = self.commands.search_notes("content 2", search_in="content", mode="words")
 
+        self.mock_storage.search_notes.assert_called_once_with("content 2", "content", limit=None, after=None, full=False)
         self.assertIn("=== Результаты поиска: 'content 2' (1 найдено) ===", result)
         self.assertIn("Test Note 2", result)
-        self.assertNotIn("Test Note 1", result)
 
     def test_search_notes_in_tags(self):
         """Тест поиска по тегам"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = [self.test_note2]
 
-        result = self.commands.search_notes("tag3", search_in="tags")
+        result = self.commands.search_notes("tag3", search_in="tags", mode="words")
 
+        self.mock_storage.search_notes.assert_called_once_with("tag3", "tags", limit=None, after=None, full=False)
         self.assertIn("=== Результаты поиска: 'tag3' (1 найдено) ===", result)
-        self.assertIn("Test Note 2", result)
-        self.assertNotIn("Test Note 1", result)
 
     def test_search_notes_in_all(self):
         """Тест поиска по всем полям"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = [self.test_note2, self.test_note1]
 
-        result = self.commands.search_notes("test", search_in="all")
+        result = self.commands.search_notes("test", search_in="all", mode="words")
 
         self.assertIn("Результаты поиска", result)
-        # Обе заметки содержат "test" в названии
         self.assertIn("Test Note 1", result)
         self.assertIn("Test Note 2", result)
 
     def test_search_notes_case_insensitive(self):
         """Тест поиска с разным регистром"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = [self.test_note1]
 
         # Ищем в верхнем регистре
-        result = self.commands.search_notes("TEST", search_in="all")
+        result = self.commands.search_notes("TEST", search_in="all", mode="words")
 
-        self.assertIn("Результаты поиска", result)
+        self.assertIn("=== Результаты поиска: 'test' (1 найдено) ===", result)
+        self.assertIn("Test Note 1", result)
+
+    def test_search_notes_scan_modes(self):
+        """Тест: режимы substring и regex идут через перебор заметок"""
+        self.mock_storage.scan_notes.return_value = [self.test_note1]
+
+        result = self.commands.search_notes("ote", mode="substring")
+
+        self.mock_storage.scan_notes.assert_called_once_with("ote", "all", regex=False,
+                                                             limit=None, after=None, full=False)
+        self.mock_storage.search_notes.assert_not_called()
         self.assertIn("Test Note 1", result)
 
+        self.mock_storage.scan_notes.side_effect = ValueError("Неверное регулярное выражение '('")
+        self.assertEqual(self.commands.search_notes("(", mode="regex"),
+                         "Ошибка: Неверное регулярное выражение '('")
+        self.assertIn("неизвестный режим", self.commands.search_notes("x", mode="bad"))
+
+    def test_search_notes_fuzzy(self):
+        """Тест нечеткого режима: без следующей страницы и без --after"""
+        self.mock_storage.fuzzy_notes.return_value = [self.test_note1]
+
+        result = self.commands.search_notes("Nte", mode="fuzzy", limit=1)
+
+        self.mock_storage.fuzzy_notes.assert_called_once_with("Nte", "all", limit=1, full=False)
+        self.assertIn("Test Note 1", result)
+        self.assertNotIn("Следующая страница", result)
+        self.assertIn("не поддерживает --after",
+                      self.commands.search_notes("Nte", mode="fuzzy", after="TOKEN"))
+
+    def test_search_notes_top(self):
+        """Тест --top: лучшие совпадения одной страницей"""
+        self.mock_storage.scan_notes.return_value = [self.test_note2, self.test_note1]
+        self.mock_storage.search_notes.return_value = [self.test_note1]
+
+        result = self.commands.search_notes("test", top=2, limit=1)
+
+        self.mock_storage.scan_notes.assert_called_once_with("test", "all", regex=False,
+                                                             top=2, full=False)
+        self.assertIn("=== Результаты поиска: 'test' (лучшие 2) ===", result)
+        self.assertNotIn("Следующая страница", result)
+
+        self.commands.search_notes("test", mode="words", top=1)
+        self.mock_storage.search_notes.assert_called_once_with("test", "all", top=1, full=False)
+        self.commands.search_notes("test", mode="fuzzy", top=3)
+        self.mock_storage.fuzzy_notes.assert_called_once_with("test", "all", limit=3, full=False)
+
+        self.assertIn("не сочетается с --after",
+                      self.commands.search_notes("test", top=2, after="TOKEN"))
+        self.assertIn("положительным", self.commands.search_notes("test", top=0))
+
+    def test_non_positive_limit_rejected(self):
+        """Тест: --limit меньше 1 - ошибка, хранилище не вызывается"""
+        for limit in (0, -1):
+            self.assertIn("--limit должен быть положительным",
+                          self.commands.list_notes(limit=limit))
+            self.assertIn("--limit должен быть положительным",
+                          self.commands.search_notes("test", limit=limit))
+        self.mock_storage.list_notes.assert_not_called()
+        self.mock_storage.scan_notes.assert_not_called()
+
     def test_search_notes_no_results(self):
         """Тест поиска без результатов"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.search_notes.return_value = []
+        self.mock_storage.has_notes.return_value = True
 
-        result = self.commands.search_notes("nonexistent", search_in="all")
+        result = self.commands.search_notes("nonexistent", search_in="all", mode="words")
 
         self.assertEqual(result, "Заметки по запросу 'nonexistent' не найдены")
 
     def test_delete_note_success(self):
         """Тест успешного удаления заметки"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes.copy()
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.delete_note.return_value = True
 
         result = self.commands.delete_note(1)
 
         # Проверяем результат
         self.assertEqual(result, "Заметка удалена: #1 - Test Note 1")
 
-        # Проверяем, что save_notes вызван с обновленным списком
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        self.assertEqual(len(saved_notes), 1)
-        self.assertEqual(saved_notes[0].id, 2)  # Осталась только вторая заметка
+        # Проверяем, что удалена только одна строка, без перезаписи таблицы
+        self.mock_storage.delete_note.assert_called_once_with(1)
+        self.mock_storage.save_notes.assert_not_called()
 
     def test_delete_note_not_found(self):
         """Тест удаления несуществующей заметки"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = None
 
         result = self.commands.delete_note(999)
 
         self.assertEqual(result, "Ошибка: Заметка с ID #999 не найдена")
-        # Проверяем, что save_notes не вызывался
-        self.mock_storage.save_notes.assert_not_called()
+        # Проверяем, что удаление не вызывалось
+        self.mock_storage.delete_note.assert_not_called()
 
     def test_archive_note_success(self):
         """Тест успешного архивирования заметки"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_status.return_value = True
 
         result = self.commands.archive_note(1)
 
         # Проверяем результат
         self.assertEqual(result, "Заметка архивирована: #1 - Test Note 1")
 
-        # Проверяем, что заметка была обновлена
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        archived_note = next(n for n in saved_notes if n.id == 1)
-        self.assertEqual(archived_note.status, Status.ARCHIVED)
+        # Проверяем, что статус обновлен точечно
+        note_id, status, _ = self.mock_storage.update_status.call_args[0]
+        self.assertEqual(note_id, 1)
+        self.assertEqual(status, Status.ARCHIVED)
+        self.mock_storage.save_notes.assert_not_called()
 
     def test_archive_note_already_archived(self):
         """Тест архивирования уже архивированной заметки"""
-        notes = [self.test_note3]  # Уже архивирована
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note3  # Уже архивирована
 
         result = self.commands.archive_note(3)
 
         self.assertEqual(result, "Заметка #3 уже в архиве")
-        # Проверяем, что save_notes не вызывался (не было изменений)
-        self.mock_storage.save_notes.assert_not_called()
+        # Проверяем, что обновление не вызывалось (не было изменений)
+        self.mock_storage.update_status.assert_not_called()
+
+    def test_archive_note_concurrently_archived(self):
+        """Тест архивирования заметки, которую успели архивировать между чтением и записью"""
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_status.return_value = False
+
+        result = self.commands.archive_note(1)
+
+        self.assertEqual(result, "Заметка #1 уже в архиве")
+
+    def test_archive_and_delete_storage_error(self):
+        """Тест: при ошибке БД (None от хранилища) команды сообщают об ошибке, а не об архиве"""
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_status.return_value = None
+        self.mock_storage.delete_note.return_value = None
+
+        self.assertEqual(self.commands.archive_note(1), "Ошибка: не удалось архивировать заметку #1")
+        self.assertEqual(self.commands.delete_note(1), "Ошибка: не удалось удалить заметку #1")
+
+        self.mock_storage.delete_note.return_value = False
+        self.assertEqual(self.commands.delete_note(1), "Ошибка: Заметка с ID #1 не найдена")
 
     def test_archive_note_not_found(self):
         """Тест архивирования несуществующей заметки"""
-        notes = [self.test_note1, self.test_note2]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = None
 
         result = self.commands.archive_note(999)
 
         self.assertEqual(result, "Ошибка: Заметка с ID #999 не найдена")
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.update_status.assert_not_called()
 
     def test_edit_note_success_partial(self):
         """Тест успешного частичного редактирования заметки"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_note.return_value = True
 
         result = self.commands.edit_note(
             note_id=1,
@@ -409,19 +528,19 @@ class TestCommands(unittest.TestCase):
         self.assertEqual(result, "Заметка обновлена: #1 - Updated Title")
 
         # Проверяем изменения
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        updated_note = saved_notes[0]
+        updated_note = self.mock_storage.update_note.call_args[0][0]
         self.assertEqual(updated_note.title, "Updated Title")
         self.assertEqual(updated_note.content, "Updated Content")
         # Остальные поля не изменились
         self.assertEqual(updated_note.category, NoteCategory.WORK)
         self.assertEqual(updated_note.priority, NotePriority.HIGH)
         self.assertEqual(updated_note.tags, ["tag1", "tag2"])
+        self.mock_storage.save_notes.assert_not_called()
 
     def test_edit_note_success_full(self):
         """Тест успешного полного редактирования заметки"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_note.return_value = True
 
         result = self.commands.edit_note(
             note_id=1,
@@ -434,8 +553,7 @@ class TestCommands(unittest.TestCase):
 
         self.assertEqual(result, "Заметка обновлена: #1 - New Title")
 
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        updated_note = saved_notes[0]
+        updated_note = self.mock_storage.update_note.call_args[0][0]
         self.assertEqual(updated_note.title, "New Title")
         self.assertEqual(updated_note.content, "New Content")
         self.assertEqual(updated_note.category, NoteCategory.PERSONAL)
@@ -444,18 +562,16 @@ class TestCommands(unittest.TestCase):
 
     def test_edit_note_not_found(self):
         """Тест редактирования несуществующей заметки"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = None
 
         result = self.commands.edit_note(note_id=999, title="New Title")
 
         self.assertEqual(result, "Ошибка: Заметка с ID #999 не найдена")
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.update_note.assert_not_called()
 
     def test_edit_note_invalid_category(self):
         """Тест редактирования с невалидной категорией"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
 
         result = self.commands.edit_note(
             note_id=1,
@@ -463,12 +579,11 @@ class TestCommands(unittest.TestCase):
         )
 
         self.assertIn("Ошибка: Неверная категория 'invalid_category'", result)
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.update_note.assert_not_called()
 
     def test_edit_note_invalid_priority(self):
         """Тест редактирования с невалидным приоритетом"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
 
         result = self.commands.edit_note(
             note_id=1,
@@ -476,12 +591,12 @@ class TestCommands(unittest.TestCase):
         )
 
         self.assertIn("Ошибка: Неверный приоритет 'invalid_priority'", result)
-        self.mock_storage.save_notes.assert_not_called()
+        self.mock_storage.update_note.assert_not_called()
 
     def test_edit_note_with_none_values(self):
         """Тест редактирования с None значениями (должно игнорироваться)"""
-        notes = [self.test_note1]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_note_by_id.return_value = self.test_note1
+        self.mock_storage.update_note.return_value = True
         original_title = self.test_note1.title
 
         # Пытаемся обновить с None
@@ -496,13 +611,12 @@ class TestCommands(unittest.TestCase):
 
         # Должно успешно завершиться без изменений (кроме updated_at)
         self.assertEqual(result, "Заметка обновлена: #1 - Test Note 1")
-        saved_notes = self.mock_storage.save_notes.call_args[0][0]
-        self.assertEqual(saved_notes[0].title, original_title)  # Не изменилось
+        updated_note = self.mock_storage.update_note.call_args[0][0]
+        self.assertEqual(updated_note.title, original_title)  # Не изменилось
 
     def test_list_tags_empty(self):
         """Тест вывода тегов, когда их нет"""
-        self.mock_storage.get_all_tags.return_value = []
-        self.mock_storage.load_notes.return_value = []
+        self.mock_storage.get_tag_counts.return_value = []
 
         result = self.commands.list_tags()
 
@@ -510,15 +624,7 @@ class TestCommands(unittest.TestCase):
 
     def test_list_tags_with_data(self):
         """Тест вывода тегов с данными"""
-        self.mock_storage.get_all_tags.return_value = ["tag1", "tag2", "tag3"]
-
-        # Настраиваем load_notes для подсчета заметок по тегам
-        notes = [
-            Note(id=1, title="Note 1", content="", tags=["tag1", "tag2"]),
-            Note(id=2, title="Note 2", content="", tags=["tag2", "tag3"]),
-            Note(id=3, title="Note 3", content="", tags=["tag1"])
-        ]
-        self.mock_storage.load_notes.return_value = notes
+        self.mock_storage.get_tag_counts.return_value = [("tag1", 2), ("tag2", 2), ("tag3", 1)]
 
         result = self.commands.list_tags()
 
@@ -527,12 +633,14 @@ class TestCommands(unittest.TestCase):
         self.assertIn("#tag1 (2 заметок)", result)
         self.assertIn("#tag2 (2 заметок)", result)
         self.assertIn("#tag3 (1 заметок)", result)
+        # Количество берется одним запросом, без загрузки заметок
+        self.mock_storage.get_tag_counts.assert_called_once()
+        self.mock_storage.load_notes.assert_not_called()
 
     def test_list_tags_sorted(self):
         """Тест вывода тегов в отсортированном порядке"""
-        # Storage.get_all_tags() возвращает уже отсортированный список
-        self.mock_storage.get_all_tags.return_value = ["apple", "banana", "zebra"]
-        self.mock_storage.load_notes.return_value = []
+        # Storage.get_tag_counts() возвращает уже отсортированный список
+        self.mock_storage.get_tag_counts.return_value = [("apple", 1), ("banana", 3), ("zebra", 1)]
 
         result = self.commands.list_tags()
 
@@ -541,9 +649,93 @@ class TestCommands(unittest.TestCase):
         # Первая строка - заголовок
         self.assertEqual(lines[0], "=== Все теги ===")
         # Далее теги в алфавитном порядке
-        self.assertIn("#apple (0 заметок)", lines[1])
-        self.assertIn("#banana (0 заметок)", lines[2])
-        self.assertIn("#zebra (0 заметок)", lines[3])
+        self.assertIn("#apple (1 заметок)", lines[1])
+        self.assertIn("#banana (3 заметок)", lines[2])
+        self.assertIn("#zebra (1 заметок)", lines[3])
+
+    def test_migrate_dry_run(self):
+        """Тест плана миграций без их применения"""
+        self.mock_storage.schema_version.return_value = 2
+        self.mock_storage.migrate.return_value = [
+            {'version': 3, 'description': "Теги", 'statements': ["CREATE TABLE tags"],
+             'backfill_ids': 12000, 'batches': 3},
+            {'version': 4, 'description': "Кэш", 'statements': ["CREATE TABLE render_cache"],
+             'backfill_ids': 0, 'batches': 0},
+        ]
+
+        result = self.commands.migrate(dry_run=True)
+
+        self.mock_storage.migrate.assert_called_once_with(dry_run=True, progress=None)
+        self.assertIn("Версия схемы: 2, будет: 4", result)
+        self.assertIn("3. Теги (дозаполнение заметок с id до 12000: пачек - 3)", result)
+        self.assertIn("   CREATE TABLE render_cache", result)
+
+    def test_migrate_up_to_date(self):
+        """Тест миграции актуальной схемы"""
+        self.mock_storage.schema_version.return_value = 4
+        self.mock_storage.migrate.return_value = []
+
+        self.assertEqual(self.commands.migrate(), "Схема актуальна (версия 4)")
+
+    def test_migrate_syncs_fuzzy_backlog(self):
+        """Тест: migrate переносит очередь словаря нечеткого поиска"""
+        self.mock_storage.schema_version.return_value = 7
+        self.mock_storage.migrate.return_value = []
+        self.mock_storage.sync_fuzzy_backlog.return_value = 1200
+
+        result = self.commands.migrate()
+
+        self.mock_storage.sync_fuzzy_backlog.assert_called_once_with(progress=print)
+        self.assertIn("В словарь нечеткого поиска перенесено заметок: 1200", result)
+
+    def test_migrate_trigram_option(self):
+        """Тест: migrate --trigram включает и удаляет триграммный индекс"""
+        self.mock_storage.schema_version.return_value = 7
+        self.mock_storage.migrate.return_value = []
+        self.mock_storage.set_trigram_index.return_value = True
+
+        self.assertIn("Триграммный индекс построен", self.commands.migrate(trigram=True))
+        self.mock_storage.set_trigram_index.assert_called_once_with(True)
+        self.assertIn("Триграммный индекс удален", self.commands.migrate(trigram=False))
+
+        self.mock_storage.set_trigram_index.reset_mock()
+        self.assertIn("будет построен", self.commands.migrate(dry_run=True, trigram=True))
+        self.mock_storage.set_trigram_index.assert_not_called()
+        self.assertNotIn("Триграммный", self.commands.migrate())
+
+    def test_fuzzy_search_backlog_hint(self):
+        """Тест: нечеткий поиск сообщает о заметках вне словаря"""
+        self.mock_storage.fuzzy_notes.return_value = [self.test_note1]
+        self.mock_storage.fuzzy_backlog.return_value = 30
+
+        result = self.commands.search_notes("tset", mode="fuzzy")
+
+        self.assertIn("Test Note 1", result)
+        self.assertIn("Заметок не в словаре нечеткого поиска: 30", result)
+
+    def test_import_notes(self):
+        """Тест импорта заметок из файла с пропуском невалидных записей"""
+        import tempfile
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            f.write('{"title": "A"}\n{"title": "B", "category": "bad"}\n{"title": "C"}\n')
+
+        self.mock_storage.bulk_insert.side_effect = lambda notes, **kwargs: len(list(notes))
+        try:
+            result = self.commands.import_notes(f.name)
+        finally:
+            os.unlink(f.name)
+
+        self.assertIn("Импортировано заметок: 2", result)
+        self.assertIn("Пропущено записей: 1", result)
+        self.assertIn("запись 2", result)
+
+    def test_import_notes_unknown_format(self):
+        """Тест импорта файла неизвестного формата"""
+        result = self.commands.import_notes("notes.txt")
+
+        self.assertIn("Ошибка: Не удалось определить формат", result)
+        self.mock_storage.bulk_insert.assert_not_called()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,106 @@
+# tests/test_daemon.py
+import unittest
+import tempfile
+import threading
+import socket
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+from notebook.daemon import Daemon
+from notebook import client
+
+
+class TestDaemon(unittest.TestCase):
+    """Тесты для daemon.py и client.py"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "notes.db")
+        self.path = client.socket_path(self.db_path)
+        self.storage = Storage(db_path=self.db_path)
+        self.daemon = Daemon(self.storage, self.path, workers=4)
+        self.daemon.bind()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_socket_path_next_to_database(self):
+        """Тест: сокет лежит рядом с базой и доступен только владельцу"""
+        self.assertEqual(self.path, os.path.join(self.tmp.name, "notes.db.sock"))
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_commands_executed_in_daemon(self):
+        """Тест выполнения команд записи и чтения через демон"""
+        response = client.request(self.path, 'add_note', (),
+                                  {'title': "Из демона", 'content': "текст", 'tags': ["d"]})
+        self.assertTrue(response['ok'])
+        self.assertIn("Заметка добавлена (ID: 1)", response['result'])
+
+        response = client.request(self.path, 'archive_note', (1,))
+        self.assertIn("архивирована", response['result'])
+
+        response = client.request(self.path, 'list_notes', (), {'status': 'archived'})
+        self.assertIn("Из демона", response['result'])
+
+    def test_errors_returned_to_client(self):
+        """Тест: неизвестная команда и неверные аргументы возвращаются как ошибка"""
+        response = client.request(self.path, 'import_notes', (), {'path': 'x.json'})
+        self.assertFalse(response['ok'])
+        self.assertIn("Неизвестная команда", response['error'])
+
+        response = client.request(self.path, 'list_notes', (), {'unknown': 1})
+        self.assertFalse(response['ok'])
+
+    def test_concurrent_clients(self):
+        """Тест параллельных клиентов: все записи выполнены, ID не повторяются"""
+        results = []
+
+        def worker(n):
+            for i in range(10):
+                results.append(client.request(
+                    self.path, 'add_note', (), {'title': f"Заметка {n}-{i}", 'content': ""}))
+                client.request(self.path, 'list_tags')
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(all(response['ok'] for response in results))
+        ids = {response['result'].split("ID: ")[1].split(")")[0] for response in results}
+        self.assertEqual(len(ids), 80)
+        self.assertEqual(len(self.storage.load_notes()), 80)
+
+    def test_second_daemon_refused(self):
+        """Тест: второй демон на том же сокете не запускается"""
+        with self.assertRaises(RuntimeError):
+            Daemon(self.storage, self.path).bind()
+
+    def test_stale_socket_replaced(self):
+        """Тест: файл сокета, оставшийся после аварийного завершения, заменяется"""
+        stale_path = os.path.join(self.tmp.name, "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(stale_path)
+        stale.close()
+
+        daemon = Daemon(self.storage, stale_path)
+        daemon.bind()
+        daemon._listener.close()
+
+    def test_request_without_daemon(self):
+        """Тест: без демона клиент возвращает None"""
+        missing = os.path.join(self.tmp.name, "missing.sock")
+        self.assertIsNone(client.request(missing, 'list_tags'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# tests/test_exporter.py
+import unittest
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.exporter import (row_to_record, write_json, write_jsonl, write_csv,
+                               write_markdown, export_rows)
+from notebook.importer import iter_csv, iter_json_array
+from notebook.storage import Storage
+from notebook.models import Note
+
+
+ROWS = [
+    (1, "Первая", "Текст", "work", "high", '["a", "b"]', "active", "2024-01-01", "2024-01-01"),
+    (2, "Вторая", "", "other", "low", "[]", "archived", "2024-01-02", "2024-01-03"),
+]
+
+
+class TestExporter(unittest.TestCase):
+    """Тесты для exporter.py"""
+
+    def test_row_to_record(self):
+        """Тест преобразования строки БД в запись"""
+        record = row_to_record(ROWS[0])
+        self.assertEqual(record["id"], 1)
+        self.assertEqual(record["tags"], ["a", "b"])
+
+        broken = row_to_record((3, "T", "", "other", "low", "not json", "active", "", ""))
+        self.assertEqual(broken["tags"], [])
+
+    def test_write_json_is_valid_array(self):
+        """Тест записи JSON-массива"""
+        out = io.StringIO()
+        self.assertEqual(write_json(iter(ROWS), out), 2)
+        data = json.loads(out.getvalue())
+        self.assertEqual([r["title"] for r in data], ["Первая", "Вторая"])
+
+        empty = io.StringIO()
+        write_json(iter([]), empty)
+        self.assertEqual(json.loads(empty.getvalue()), [])
+
+    def test_write_json_can_be_imported(self):
+        """Тест, что экспорт читается потоковым импортом"""
+        out = io.StringIO()
+        write_json(iter(ROWS), out)
+        out.seek(0)
+        self.assertEqual(len(list(iter_json_array(out))), 2)
+
+    def test_write_jsonl(self):
+        """Тест записи JSONL"""
+        out = io.StringIO()
+        write_jsonl(iter(ROWS), out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])["status"], "archived")
+
+    def test_write_csv_roundtrip(self):
+        """Тест записи CSV и чтения его импортом"""
+        out = io.StringIO()
+        write_csv(iter(ROWS), out)
+        out.seek(0)
+        records = list(iter_csv(out))
+        self.assertEqual(records[0]["tags"], ["a", "b"])
+        self.assertEqual(records[1]["title"], "Вторая")
+
+    def test_write_markdown_directory(self):
+        """Тест записи заметок в отдельные markdown-файлы"""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(write_markdown(iter(ROWS), tmp), 2)
+            self.assertEqual(sorted(os.listdir(tmp)), ["000001.md", "000002.md"])
+            with open(os.path.join(tmp, "000001.md"), encoding="utf-8") as f:
+                text = f.read()
+            self.assertTrue(text.startswith("# Первая"))
+            self.assertIn("- Теги: a, b", text)
+
+    def test_export_rows_gzip(self):
+        """Тест экспорта со сжатием gzip"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "notes.jsonl")
+            self.assertEqual(export_rows(iter(ROWS), path, "jsonl", compress=True), 2)
+            with gzip.open(path + ".gz", "rt", encoding="utf-8") as f:
+                self.assertEqual(len(f.read().splitlines()), 2)
+
+    def test_export_rows_unknown_format(self):
+        """Тест неизвестного формата"""
+        with self.assertRaises(ValueError):
+            export_rows(iter(ROWS), "out.xml", "xml")
+
+    def test_storage_iter_rows(self):
+        """Тест потокового чтения строк из Storage пачками"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with Storage(db_path=os.path.join(tmp, "notes.db")) as storage:
+                for i in range(5):
+                    storage.add_note(Note(id=None, title=f"Note {i}", content="", tags=["t"]))
+
+                rows = list(storage.iter_rows(batch_size=2))
+                self.assertEqual([row[0] for row in rows], [1, 2, 3, 4, 5])
+                self.assertEqual(row_to_record(rows[0])["tags"], ["t"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# tests/test_fuzzy.py
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook import fuzzy
+
+
+class TestFuzzy(unittest.TestCase):
+    """Тесты для fuzzy.py"""
+
+    def test_tokenize(self):
+        """Тест разбиения на слова: нижний регистр, без повторов и коротких слов"""
+        self.assertEqual(fuzzy.tokenize("Проект, проект и snake_case 42"),
+                         ["проект", "snake", "case", "42"])
+        self.assertEqual(fuzzy.tokenize("a " + "x" * 30), [])
+
+    def test_note_terms_field_masks(self):
+        """Тест маски полей для слов заметки"""
+        terms = fuzzy.note_terms("Отчет", "отчет и план", '["план", "дом"]')
+        self.assertEqual(terms, {"отчет": 3, "план": 6, "дом": 4})
+        self.assertEqual(fuzzy.note_terms("Отчет", "", "[]"), {"отчет": 1})
+
+    def test_deletes(self):
+        """Тест вариантов с удалениями"""
+        self.assertEqual(fuzzy.deletes("abc", 1), {"abc", "bc", "ac", "ab"})
+        self.assertEqual(fuzzy.deletes("abc", 2), {"abc", "bc", "ac", "ab", "a", "b", "c"})
+        self.assertEqual(fuzzy.deletes("ab", 0), {"ab"})
+
+    def test_distance(self):
+        """Тест расстояния: замена, вставка, перестановка соседних букв и предел"""
+        self.assertEqual(fuzzy.distance("отчет", "отчет", 2), 0)
+        self.assertEqual(fuzzy.distance("отчот", "отчет", 2), 1)
+        self.assertEqual(fuzzy.distance("отет", "отчет", 2), 1)
+        self.assertEqual(fuzzy.distance("отчте", "отчет", 2), 1)
+        self.assertEqual(fuzzy.distance("бюджте", "бюджет", 2), 1)
+        self.assertEqual(fuzzy.distance("abcdef", "badcfe", 2), 3)
+        self.assertEqual(fuzzy.distance("a", "abcd", 2), 3)
+
+    def test_symmetric_delete_finds_candidates(self):
+        """Тест: у слов на расстоянии до k есть общий вариант удаления"""
+        for word, term in (("отчот", "отчет"), ("встерча", "встреча"), ("sqllite", "sqlite"),
+                           ("migraton", "migration"), ("budgte", "budget")):
+            depth = fuzzy.max_distance(word)
+            self.assertLessEqual(fuzzy.distance(word, term, depth), depth)
+            self.assertTrue(fuzzy.deletes(word, depth) & fuzzy.deletes(term), word)
+
+    def test_max_distance(self):
+        """Тест допустимого числа опечаток по длине слова"""
+        self.assertEqual([fuzzy.max_distance(w) for w in ("ab", "дом", "отчет", "проект")],
+                         [0, 1, 1, 2])
+
+    def test_rank(self):
+        """Тест порядка: число найденных слов, затем близость, затем новизна"""
+        matches = [{1: 1.0, 2: 0.8, 3: 0.8}, {2: 0.5, 4: 1.0}]
+        self.assertEqual(fuzzy.rank(matches), [2, 4, 1, 3])
+        self.assertEqual(fuzzy.rank(matches, limit=2), [2, 4])
+        self.assertEqual(fuzzy.rank([{}]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# tests/test_importer.py
+import unittest
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.importer import (detect_format, iter_json_array, iter_jsonl, iter_csv,
+                               record_to_note, read_notes)
+from notebook.models import Status, NotePriority, NoteCategory
+
+
+class TestImporter(unittest.TestCase):
+    """Тесты для importer.py"""
+
+    def test_detect_format(self):
+        """Тест определения формата по расширению"""
+        self.assertEqual(detect_format("Notes.json"), "json")
+        self.assertEqual(detect_format("dump.JSONL"), "jsonl")
+        self.assertEqual(detect_format("dump.ndjson"), "jsonl")
+        self.assertEqual(detect_format("table.csv"), "csv")
+        with self.assertRaises(ValueError):
+            detect_format("notes.txt")
+
+    def test_iter_json_array_small_chunks(self):
+        """Тест потокового разбора массива, когда объекты пересекают границы блоков"""
+        data = '[\n {"title": "Первая", "tags": ["a", "b"]},\n {"title": "Вторая"} ]'
+        records = list(iter_json_array(io.StringIO(data), chunk_size=4))
+        self.assertEqual([r["title"] for r in records], ["Первая", "Вторая"])
+        self.assertEqual(records[0]["tags"], ["a", "b"])
+
+    def test_iter_json_array_empty_and_invalid(self):
+        """Тест пустого и некорректного массива"""
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"title": "x"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"title": "x"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"title": "x"} {"title": "y"}]')))
+
+    def test_iter_json_array_skips_malformed_element(self):
+        """Тест: испорченный элемент выдается как ValueError, разбор идет дальше
+        и не дочитывает файл до конца ради одной ошибки"""
+        bad = '{"title": "bad" "x": 1}'
+        data = '[{"title": "a"}, ' + bad + ', {"title": "q,]\\"{"}, ' + ', '.join(
+            '{"title": "n%d"}' % i for i in range(2000)) + ']'
+        for chunk_size in (3, 64, 1 << 16):
+            records = list(iter_json_array(io.StringIO(data), chunk_size=chunk_size))
+            self.assertIsInstance(records[1], ValueError)
+            self.assertEqual(records[2], {"title": 'q,]"{'})
+            self.assertEqual(len(records), 2003)
+
+        class CountingReader(io.StringIO):
+            reads = 0
+
+            def read(self, size=-1):
+                self.reads += 1
+                return super().read(size)
+
+        fp = CountingReader(data)
+        records = iter_json_array(fp, chunk_size=64)
+        next(records)
+        self.assertIsInstance(next(records), ValueError)
+        self.assertLess(fp.reads, 3)
+
+    def test_read_notes_json_skips_malformed_element(self):
+        """Тест: в JSON-массиве испорченный элемент пропускается, как строка JSONL"""
+        data = '[{"title": "ok"}, {"title": oops}, {"title": "ok2"}]'
+        errors = []
+        notes = list(read_notes(io.StringIO(data), "json", errors))
+
+        self.assertEqual([n.title for n in notes], ["ok", "ok2"])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("запись 2: некорректный JSON"))
+
+    def test_iter_jsonl(self):
+        """Тест чтения JSONL с пустыми строками"""
+        data = '{"title": "a"}\n\n{"title": "b"}\n'
+        self.assertEqual([r["title"] for r in iter_jsonl(io.StringIO(data))], ["a", "b"])
+
+    def test_iter_csv_tags(self):
+        """Тест чтения тегов из CSV в обоих форматах"""
+        data = 'title,content,tags\nA,text,"[""x"", ""y""]"\nB,text,"x, y"\nC,text,\n'
+        records = list(iter_csv(io.StringIO(data)))
+        self.assertEqual([r["tags"] for r in records], [["x", "y"], ["x", "y"], []])
+
+    def test_record_to_note_validation(self):
+        """Тест проверки записи через перечисления"""
+        note = record_to_note({"id": 7, "title": "T", "category": "WORK", "priority": "high",
+                               "status": "archived", "tags": ["a"]})
+        self.assertIsNone(note.id)
+        self.assertEqual(note.category, NoteCategory.WORK)
+        self.assertEqual(note.priority, NotePriority.HIGH)
+        self.assertEqual(note.status, Status.ARCHIVED)
+
+        defaults = record_to_note({"title": "T"})
+        self.assertEqual(defaults.category, NoteCategory.OTHER)
+        self.assertEqual(defaults.content, "")
+
+        for bad in ({"content": "no title"}, {"title": "T", "category": "nope"},
+                    {"title": "T", "tags": "a,b"}):
+            with self.assertRaises(ValueError):
+                record_to_note(bad)
+
+    def test_read_notes_skips_invalid(self):
+        """Тест пропуска невалидных записей с описанием ошибок"""
+        data = '{"title": "ok"}\n{"title": "bad", "priority": "urgent"}\n[1, 2]\n'
+        errors = []
+        notes = list(read_notes(io.StringIO(data), "jsonl", errors))
+
+        self.assertEqual([n.title for n in notes], ["ok"])
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("запись 2"))
+
+    def test_read_notes_skips_malformed_lines(self):
+        """Тест: испорченная строка JSONL или JSON тегов в CSV пропускается, импорт продолжается"""
+        errors = []
+        data = '{"title": "a"}\n{"title": "b",\n{"title": "c"}\n'
+        notes = list(read_notes(io.StringIO(data), "jsonl", errors))
+        self.assertEqual([n.title for n in notes], ["a", "c"])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("запись 2: некорректный JSON"))
+
+        errors = []
+        data = 'title,tags\nA,"[""x"""\nB,y\n'
+        notes = list(read_notes(io.StringIO(data), "csv", errors))
+        self.assertEqual([n.title for n in notes], ["B"])
+        self.assertTrue(errors[0].startswith("запись 1: некорректный JSON тегов"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,11 +4,13 @@ from unittest.mock import patch, MagicMock
 import sys
 import os
 import argparse
+import tempfile
 
 # Добавляем корневую директорию проекта в путь для импорта
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from main import main
+from main import main, build_parser
+from notebook.timings import Timings
 
 
 class TestMain(unittest.TestCase):
@@ -36,7 +38,7 @@ class TestMain(unittest.TestCase):
             main()
 
             # Проверяем, что Commands был создан с правильным storage
-            mock_commands.assert_called_once_with(mock_storage_instance)
+            mock_commands.assert_called_once_with(mock_storage_instance, timings=None)
 
             # Проверяем, что add_note был вызван с правильными аргументами
             mock_commands_instance.add_note.assert_called_once_with(
@@ -92,7 +94,9 @@ class TestMain(unittest.TestCase):
                 category=None,
                 priority=None,
                 status='active',
-                show_content=False
+                show_content=False,
+                limit=None,
+                after=None
             )
 
     @patch('main.Storage')
@@ -113,9 +117,71 @@ class TestMain(unittest.TestCase):
                 category='work',
                 priority='high',
                 status='archived',
-                show_content=True
+                show_content=True,
+                limit=None,
+                after=None
             )
 
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', 'list', '--page-size', '20', '--after', 'TOKEN'])
+    def test_main_list_command_pagination(self, mock_commands, mock_storage):
+        """Тест параметров пагинации команды list"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+
+        with patch('builtins.print'):
+            main()
+
+            kwargs = mock_commands_instance.list_notes.call_args.kwargs
+            self.assertEqual(kwargs['limit'], 20)
+            self.assertEqual(kwargs['after'], 'TOKEN')
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    def test_main_rejects_non_positive_limit(self, mock_commands, mock_storage):
+        """Тест: --limit и --top меньше 1 отклоняются при разборе аргументов"""
+        for argv in (['script.py', 'list', '--limit', '-1'],
+                     ['script.py', 'search', 'x', '--limit', '0'],
+                     ['script.py', 'search', 'x', '--top', '-5']):
+            with patch('sys.argv', argv), patch('sys.stderr'):
+                with self.assertRaises(SystemExit) as cm:
+                    main()
+            self.assertEqual(cm.exception.code, 2)
+        mock_commands.return_value.list_notes.assert_not_called()
+        mock_commands.return_value.search_notes.assert_not_called()
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', '--timings', 'tags'])
+    def test_main_timings_flag(self, mock_commands, mock_storage):
+        """Тест флага --timings: хранилище и команды получают Timings, отчет - в stderr"""
+        mock_commands.return_value.list_tags.return_value = "tags"
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        timings = mock_storage.call_args.kwargs['timings']
+        self.assertIsInstance(timings, Timings)
+        mock_commands.assert_called_once_with(mock_storage.return_value, timings=timings)
+        self.assertIn('argparse', timings.phases)
+        report_call = mock_print.call_args_list[-1]
+        self.assertIn("=== Тайминги ===", report_call.args[0])
+        self.assertIs(report_call.kwargs['file'], sys.stderr)
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    def test_main_profile_flag(self, mock_commands, mock_storage):
+        """Тест флага --profile: дамп cProfile читается pstats"""
+        import pstats
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.out')
+            with patch('sys.argv', ['script.py', '--profile', path, 'tags']), \
+                    patch('builtins.print'):
+                main()
+
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
     @patch('main.Storage')
     @patch('main.Commands')
     @patch('sys.argv', ['script.py', 'search', 'test', '--in', 'title'])
@@ -132,9 +198,31 @@ class TestMain(unittest.TestCase):
 
             mock_commands_instance.search_notes.assert_called_once_with(
                 search_term='test',
-                search_in='title'
+                search_in='title',
+                limit=None,
+                after=None,
+                show_content=False,
+                mode='substring',
+                top=None
             )
 
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', 'search', 'e.t', '--regex'])
+    def test_main_search_regex(self, mock_commands, mock_storage):
+        """Тест: флаги --regex, --substring, --words и --fuzzy выбирают режим поиска"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+
+        with patch('builtins.print'):
+            main()
+
+        self.assertEqual(mock_commands_instance.search_notes.call_args.kwargs['mode'], 'regex')
+        for flag, mode in (('--substring', 'substring'), ('--words', 'words'),
+                           ('--fuzzy', 'fuzzy')):
+            argv = ['search', 'x', flag]
+            self.assertEqual(build_parser(argv).parse_args(argv).mode, mode)
+
     @patch('main.Storage')
     @patch('main.Commands')
     @patch('sys.argv', ['script.py', 'delete', '1'])
@@ -206,6 +294,84 @@ class TestMain(unittest.TestCase):
 
             mock_commands_instance.list_tags.assert_called_once()
 
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', 'import', 'dump.jsonl', '--chunk-size', '500', '--keep-indexes'])
+    def test_main_import_command(self, mock_commands, mock_storage):
+        """Тест команды import"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+
+        with patch('builtins.print'):
+            main()
+
+            mock_commands_instance.import_notes.assert_called_once_with(
+                path='dump.jsonl',
+                fmt=None,
+                chunk_size=500,
+                defer_indexes=False
+            )
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', 'export', 'backup.csv', '-f', 'csv', '--gzip'])
+    def test_main_export_command(self, mock_commands, mock_storage):
+        """Тест команды export"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+
+        with patch('builtins.print'):
+            main()
+
+            mock_commands_instance.export_notes.assert_called_once_with(
+                path='backup.csv',
+                fmt='csv',
+                compress=True
+            )
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('sys.argv', ['script.py', 'migrate', '--dry-run'])
+    def test_main_migrate_command(self, mock_commands, mock_storage):
+        """Тест команды migrate: хранилище открывается без автоматической миграции"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+
+        with patch('builtins.print'):
+            main()
+
+            mock_storage.assert_called_once_with(auto_migrate=False)
+            mock_commands_instance.migrate.assert_called_once_with(
+                dry_run=True, batch_size=None, trigram=None)
+
+    @patch('main.Storage')
+    @patch('notebook.client.request')
+    @patch('sys.argv', ['script.py', 'delete', '3'])
+    def test_main_forwards_to_daemon(self, mock_request, mock_storage):
+        """Тест: при запущенном демоне команда выполняется в нем, хранилище не открывается"""
+        mock_request.return_value = {'ok': True, 'output': '', 'result': "Заметка удалена"}
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        self.assertEqual(mock_request.call_args[0][1:], ('delete_note', (3,), {}))
+        mock_print.assert_called_once_with("Заметка удалена")
+        mock_storage.assert_not_called()
+
+    @patch('main.Storage')
+    @patch('main.Commands')
+    @patch('notebook.client.request')
+    @patch('sys.argv', ['script.py', 'tags'])
+    def test_main_falls_back_without_daemon(self, mock_request, mock_commands, mock_storage):
+        """Тест: без демона команда выполняется в этом процессе"""
+        mock_request.return_value = None
+
+        with patch('builtins.print'):
+            main()
+
+        mock_request.assert_called_once()
+        mock_commands.return_value.list_tags.assert_called_once_with()
+
     @patch('main.Storage')
     @patch('main.Commands')
     @patch('sys.argv', ['script.py'])
@@ -255,6 +421,8 @@ class TestMain(unittest.TestCase):
                 mock_args.category = 'other'
                 mock_args.priority = 'medium'
                 mock_args.tags = None
+                mock_args.timings = False
+                mock_args.profile = None
                 mock_parse.return_value = mock_args
 
                 main()
@@ -284,6 +452,62 @@ class TestMain(unittest.TestCase):
             # Проверяем, что sys.exit был вызван с кодом 1
             mock_exit.assert_called_once_with(1)
 
+    @patch('main.Storage')
+    @patch('main.Commands')
+    def test_main_batch_command(self, mock_commands, mock_storage):
+        """Тест команды batch: строки выполняются через один Commands, ошибка - код 1"""
+        mock_commands_instance = MagicMock()
+        mock_commands.return_value = mock_commands_instance
+        mock_commands_instance.add_note.return_value = "Заметка добавлена"
+        mock_commands_instance.delete_note.return_value = "Ошибка: Заметка не найдена"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'commands.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("add T C -t x\n# комментарий\ndelete 5\n")
+            with patch('sys.argv', ['script.py', '--no-daemon', 'batch', path]), \
+                    patch('builtins.print') as mock_print, \
+                    self.assertRaises(SystemExit) as exit_info:
+                main()
+
+        self.assertEqual(exit_info.exception.code, 1)
+        mock_commands.assert_called_once()
+        mock_commands_instance.add_note.assert_called_once_with(
+            title='T', content='C', category='other', priority='medium', tags=['x'])
+        mock_commands_instance.delete_note.assert_called_once_with(5)
+        printed = [call.args[0] for call in mock_print.call_args_list]
+        self.assertIn("1: Заметка добавлена", printed)
+        self.assertIn("3: Ошибка: Заметка не найдена", printed)
+
+
+class TestExportToStdout(unittest.TestCase):
+    """Тест export - через CLI в отдельном процессе"""
+
+    def test_export_stdout_round_trip(self):
+        """Тест: в stdout только записи (JSONL или gzip), итог - в stderr"""
+        import gzip
+        import json
+        import subprocess
+
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        with tempfile.TemporaryDirectory() as tmp:
+            def cli(*argv):
+                return subprocess.run([sys.executable, os.path.join(root, 'main.py'),
+                                       '--no-daemon', *argv],
+                                      cwd=tmp, capture_output=True, check=True)
+
+            cli('add', 'Первая', 'текст', '-t', 'a')
+            cli('add', 'Вторая', 'текст')
+
+            plain = cli('export', '-', '-f', 'jsonl')
+            records = [json.loads(line) for line in plain.stdout.decode('utf-8').splitlines()]
+            self.assertEqual(sorted(r['title'] for r in records), ['Вторая', 'Первая'])
+            self.assertIn("Экспортировано заметок: 2", plain.stderr.decode('utf-8'))
+
+            packed = cli('export', '-', '-f', 'jsonl', '-z')
+            lines = gzip.decompress(packed.stdout).decode('utf-8').splitlines()
+            self.assertEqual(len([json.loads(line) for line in lines]), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
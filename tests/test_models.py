@@ -8,7 +8,7 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from notebook.models import Note, Status, NotePriority, NoteCategory
+from notebook.models import Note, NoteRow, Status, NotePriority, NoteCategory
 
 
 class TestEnums(unittest.TestCase):
@@ -683,6 +683,56 @@ class TestNote(unittest.TestCase):
         # Проверяем, что объекты разные (не переопределен __eq__)
         self.assertIsNot(note1, note2)
 
+    def test_dirty_fields_tracking(self):
+        """Тест отслеживания измененных полей"""
+        note = Note(id=1, title="Test", content="Content")
+        self.assertFalse(note.is_dirty)
+
+        note.title = "Changed"
+        note.status = Status.ARCHIVED
+        self.assertEqual(note.dirty_fields, frozenset({"title", "status"}))
+
+        note.mark_clean()
+        self.assertFalse(note.is_dirty)
+
+        note.update(content="New")
+        self.assertEqual(note.dirty_fields, frozenset({"content", "updated_at"}))
+
+    def test_note_has_no_instance_dict(self):
+        """Тест компактной заметки на __slots__"""
+        note = Note(id=1, title="Test", content="Content")
+        self.assertFalse(hasattr(note, '__dict__'))
+        with self.assertRaises(AttributeError):
+            note.unknown_field = 1
+
+    def test_note_row_view(self):
+        """Тест представления строки БД: поля разбираются при обращении"""
+        row = NoteRow(7, "Title", "Текст", "work", "high", '["a", "b"]', "archived",
+                      "2024-01-01T10:00:00", "2024-01-02T10:00:00")
+
+        self.assertEqual(row.category, NoteCategory.WORK)
+        self.assertEqual(row.priority, NotePriority.HIGH)
+        self.assertEqual(row.status, Status.ARCHIVED)
+        self.assertEqual(row.tags, ["a", "b"])
+        self.assertEqual(row.to_dict(), row.to_note().to_dict())
+        self.assertEqual(str(row), str(row.to_note()))
+        self.assertFalse(row.to_note().is_dirty)
+
+        # Значения по умолчанию для пустых колонок, как у Storage._row_to_note
+        empty = NoteRow(1, "T", "", None, None, "[]", None, "2024-01-01", "2024-01-01")
+        self.assertEqual(empty.category, NoteCategory.OTHER)
+        self.assertEqual(empty.status, Status.ACTIVE)
+        self.assertEqual(empty.tags, [])
+
+        with self.assertRaises(AttributeError):
+            row.title = "Changed"
+
+    def test_note_row_is_preview(self):
+        """Тест признака превью, загруженного без полного текста"""
+        self.assertFalse(NoteRow(1, "T", "Текст", None, None, "[]", None, "", "").is_preview)
+        self.assertFalse(NoteRow(1, "T", "Текст", None, None, "[]", None, "", "", 10).is_preview)
+        self.assertTrue(NoteRow(1, "T", "Текст", None, None, "[]", None, "", "", 4000).is_preview)
+
     def test_note_with_invalid_datetime_string(self):
         """Тест создания заметки с невалидной строкой времени"""
         # Должно принимать любую строку для created_at/updated_at
@@ -0,0 +1,128 @@
+# tests/test_render.py
+import unittest
+import tempfile
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+from notebook.models import Note, NoteRow, Status, NotePriority, NoteCategory
+from notebook.render import RenderCache, format_date, render_note
+
+
+class TestRender(unittest.TestCase):
+    """Тесты для render.py"""
+
+    def test_render_note(self):
+        """Тест отрисовки заметки и превью строки БД одним форматом"""
+        note = Note(id=3, title="Title", content="x" * 150, category=NoteCategory.IDEAS,
+                    priority=NotePriority.HIGH, tags=["a", "b"], status=Status.ARCHIVED,
+                    created_at="2024-03-05T10:00:00.123456")
+
+        self.assertEqual(render_note(note),
+                         "📁 [⬆] 💡 #3: Title\n"
+                         "   Created: 05.03.2024 | Tags: a, b\n"
+                         f"   {'x' * 100}...")
+
+        row = NoteRow(3, "Title", "x" * 101, "ideas", "high", '["a", "b"]', "archived",
+                      "2024-03-05T10:00:00.123456", note.updated_at, 150)
+        self.assertEqual(render_note(row), render_note(note))
+
+    def test_format_date(self):
+        """Тест форматирования даты по ISO-метке"""
+        self.assertEqual(format_date("2024-12-31T23:59:59.999999"), "31.12.2024")
+        self.assertEqual(format_date("2024-12-31"), "31.12.2024")
+        with self.assertRaises(ValueError):
+            format_date("invalid-datetime")
+
+    def test_cache_hits_and_invalidation(self):
+        """Тест: повторная отрисовка берется из кэша, изменение заметки ее сбрасывает"""
+        cache = RenderCache()
+        note = Note(id=1, title="Old", content="Content", updated_at="2024-01-01T00:00:00")
+
+        with patch('notebook.render.render_note', side_effect=render_note) as render:
+            first = cache.render(note)
+            self.assertEqual(cache.render(note), first)
+            self.assertEqual(render.call_count, 1)
+
+            note.update(title="New")
+            self.assertIn("New", cache.render(note))
+            self.assertEqual(render.call_count, 2)
+
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_cache_is_bounded(self):
+        """Тест вытеснения давно не использованных блоков"""
+        cache = RenderCache(maxsize=2)
+        notes = [Note(id=i, title=f"Note {i}", content="") for i in range(1, 4)]
+
+        cache.render_many(notes[:2])
+        cache.render(notes[0])
+        cache.render(notes[2])
+
+        self.assertEqual(len(cache), 2)
+        cache.render(notes[0])
+        self.assertEqual(cache.hits, 2)
+        cache.render(notes[1])
+        self.assertEqual(cache.misses, 4)
+
+    def test_unsaved_note_is_not_cached(self):
+        """Тест: заметка без ID отрисовывается, но не попадает в кэш"""
+        cache = RenderCache()
+        note = Note(id=None, title="Draft", content="")
+
+        self.assertIn("Draft", cache.render(note))
+        self.assertEqual(len(cache), 0)
+
+
+class TestRenderCachePersistence(unittest.TestCase):
+    """Тесты сохранения RenderCache в таблице render_cache"""
+
+    def setUp(self):
+        self.db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.db_file.close()
+        self.storage = Storage(db_path=self.db_file.name)
+        for i in range(1, 4):
+            self.storage.add_note(Note(id=None, title=f"Note {i}", content="Content"))
+
+    def tearDown(self):
+        del self.storage
+        try:
+            os.unlink(self.db_file.name)
+        except OSError:
+            pass
+
+    def test_blocks_survive_new_cache(self):
+        """Тест: новый кэш (новый процесс) находит блоки в таблице"""
+        notes = self.storage.find_notes(full=False)
+        expected = RenderCache(storage=self.storage).render_many(notes)
+
+        cache = RenderCache(storage=self.storage)
+        with patch('notebook.render.render_note') as render:
+            self.assertEqual(cache.render_many(notes), expected)
+            render.assert_not_called()
+        self.assertEqual((cache.hits, cache.misses), (3, 0))
+
+    def test_stale_and_deleted_blocks(self):
+        """Тест: блок измененной заметки не используется, удаленной - удаляется"""
+        RenderCache(storage=self.storage).render_many(self.storage.find_notes())
+
+        note = self.storage.get_note_by_id(1)
+        note.update(title="Changed")
+        self.storage.update_note(note)
+        self.storage.delete_note(2)
+
+        cache = RenderCache(storage=self.storage)
+        blocks = cache.render_many(self.storage.find_notes())
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertTrue(any("Changed" in block for block in blocks))
+
+        with self.storage.connection as conn:
+            ids = [row[0] for row in conn.execute('SELECT note_id FROM render_cache ORDER BY note_id')]
+        self.assertEqual(ids, [1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# tests/test_session.py
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+from notebook.models import Note, Status, NoteCategory
+
+
+class TestSession(unittest.TestCase):
+    """Тесты для session.py"""
+
+    def setUp(self):
+        self.db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.db_file.close()
+        self.storage = Storage(db_path=self.db_file.name)
+        for i in range(1, 4):
+            self.storage.add_note(Note(id=None, title=f"Note {i}", content="Content",
+                                       tags=["tag"], created_at=f"2024-01-0{i}",
+                                       updated_at=f"2024-01-0{i}"))
+
+    def tearDown(self):
+        del self.storage
+        try:
+            os.unlink(self.db_file.name)
+        except OSError:
+            pass
+
+    def test_commit_writes_all_changes(self):
+        """Тест записи вставок, изменений и удалений при выходе из блока"""
+        with self.storage.session() as s:
+            note = s.get(1)
+            note.title = "Changed"
+            s.delete(2)
+            new_note = s.add(Note(id=None, title="New", content="New content"))
+
+        self.assertEqual(new_note.id, 4)
+        notes = {n.id: n for n in self.storage.load_notes()}
+        self.assertEqual(sorted(notes), [1, 3, 4])
+        self.assertEqual(notes[1].title, "Changed")
+        self.assertNotEqual(notes[1].updated_at, "2024-01-01")
+        self.assertEqual(notes[4].title, "New")
+
+    def test_only_changed_rows_are_written(self):
+        """Тест, что неизмененные заметки не перезаписываются"""
+        statements = []
+
+        with self.storage.session() as s:
+            s.get(1).status = Status.ARCHIVED
+            s.get(2)  # Загружена, но не изменена
+            self.storage.connection.set_trace_callback(statements.append)
+            try:
+                s.commit()
+            finally:
+                self.storage.connection.set_trace_callback(None)
+
+        updates = [st for st in statements if st.lstrip().startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('status = ', updates[0])
+        self.assertNotIn('title = ', updates[0])
+        self.assertFalse(any('DELETE' in st for st in statements))
+        self.assertEqual(self.storage.get_note_by_id(2).updated_at, "2024-01-02")
+
+    def test_in_place_tag_change_is_detected(self):
+        """Тест обнаружения изменения списка тегов на месте"""
+        with self.storage.session() as s:
+            s.get(1).tags.append("new")
+
+        self.assertEqual(self.storage.get_note_by_id(1).tags, ["tag", "new"])
+
+    def test_exception_discards_changes(self):
+        """Тест отката изменений при исключении"""
+        with self.assertRaises(RuntimeError):
+            with self.storage.session() as s:
+                s.get(1).category = NoteCategory.WORK
+                s.delete(3)
+                raise RuntimeError("boom")
+
+        self.assertEqual(self.storage.get_note_by_id(1).category, NoteCategory.OTHER)
+        self.assertIsNotNone(self.storage.get_note_by_id(3))
+
+    def test_identity_map(self):
+        """Тест, что сессия выдает один и тот же объект для одного ID"""
+        with self.storage.session() as s:
+            self.assertIs(s.get(1), s.get(1))
+            s.delete(1)
+            self.assertIsNone(s.get(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
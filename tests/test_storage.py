@@ -2,7 +2,9 @@
 import unittest
 import tempfile
 import os
+import sqlite3
 import sys
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -178,25 +180,966 @@ class TestStorageAdvanced(unittest.TestCase):
         expected = sorted(["python", "test", "code", "debug"])
         self.assertEqual(tags, expected)
 
-    def test_save_notes_overwrites(self):
-        """Тест что save_notes перезаписывает данные"""
-        # Сохраняем первую заметку
-        note1 = Note(id=1, title="First", content="Content")
-        self.storage.save_notes([note1])
+    def test_update_status(self):
+        """Тест атомарного изменения статуса"""
+        self.storage.add_note(Note(id=1, title="Test", content="Content"))
 
-        # Проверяем
-        notes = self.storage.load_notes()
-        self.assertEqual(len(notes), 1)
-        self.assertEqual(notes[0].title, "First")
+        # Первое изменение проходит
+        self.assertTrue(self.storage.update_status(1, Status.ARCHIVED, "2024-01-02"))
+        note = self.storage.get_note_by_id(1)
+        self.assertEqual(note.status, Status.ARCHIVED)
+        self.assertEqual(note.updated_at, "2024-01-02")
 
-        # Сохраняем другую заметку
-        note2 = Note(id=2, title="Second", content="Content")
-        self.storage.save_notes([note2])
+        # Повторное изменение на тот же статус ничего не трогает
+        self.assertIs(self.storage.update_status(1, Status.ARCHIVED, "2024-01-03"), False)
+        self.assertEqual(self.storage.get_note_by_id(1).updated_at, "2024-01-02")
 
-        # Должна остаться только вторая
-        notes = self.storage.load_notes()
-        self.assertEqual(len(notes), 1)
-        self.assertEqual(notes[0].title, "Second")
+        # Несуществующая заметка
+        self.assertIs(self.storage.update_status(999, Status.ARCHIVED, "2024-01-03"), False)
+        self.assertIs(self.storage.delete_note(999), False)
+
+    def test_find_notes_filters_and_order(self):
+        """Тест фильтрации и сортировки заметок в SQL"""
+        self.storage.add_note(Note(id=None, title="Work high", content="",
+                                   category=NoteCategory.WORK, priority=NotePriority.HIGH,
+                                   created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="Work high new", content="",
+                                   category=NoteCategory.WORK, priority=NotePriority.HIGH,
+                                   created_at="2024-01-03"))
+        self.storage.add_note(Note(id=None, title="Work low", content="",
+                                   category=NoteCategory.WORK, priority=NotePriority.LOW,
+                                   created_at="2024-01-02"))
+        self.storage.add_note(Note(id=None, title="Archived", content="",
+                                   category=NoteCategory.WORK, priority=NotePriority.HIGH,
+                                   status=Status.ARCHIVED, created_at="2024-01-04"))
+
+        notes = self.storage.find_notes(category=NoteCategory.WORK,
+                                        priority=NotePriority.HIGH,
+                                        status=Status.ACTIVE)
+        self.assertEqual([n.title for n in notes], ["Work high new", "Work high"])
+
+        notes = self.storage.find_notes(status=Status.ACTIVE)
+        self.assertEqual(len(notes), 3)
+
+        self.assertEqual(len(self.storage.find_notes()), 4)
+        self.assertEqual(self.storage.find_notes(category=NoteCategory.IDEAS), [])
+
+    def test_build_where(self):
+        """Тест построения параметризованного условия WHERE"""
+        where, params = Storage.build_where(category=NoteCategory.WORK, status=Status.ACTIVE)
+        self.assertEqual(where, "WHERE status = ? AND category = ?")
+        self.assertEqual(params, ["active", "work"])
+
+        self.assertEqual(Storage.build_where(), ("", []))
+
+    def test_migration_creates_indexes(self):
+        """Тест применения миграций и создания индексов"""
+        import sqlite3
+        from notebook.storage import MIGRATIONS
+
+        self.storage.connection  # схема создается при первом обращении к базе
+        with sqlite3.connect(self.db_file.name) as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM notes '
+                'WHERE status = ? AND category = ? AND priority = ? ORDER BY created_at DESC',
+                ("active", "work", "high")
+            ).fetchall()
+
+        self.assertEqual(version, len(MIGRATIONS))
+        self.assertIn("idx_notes_status_category_priority_created", plan[0][-1])
+
+    def test_search_notes_fts(self):
+        """Тест полнотекстового поиска с ограничением по полям"""
+        self.storage.add_note(Note(id=None, title="Проект отчет", content="Первый текст",
+                                   tags=["работа"], created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="Покупки", content="Купить ПРОЕКТОР",
+                                   tags=["дом"], created_at="2024-01-02"))
+
+        # Регистр не важен, последнее слово ищется по префиксу
+        found = self.storage.search_notes("проект")
+        self.assertEqual([n.title for n in found], ["Покупки", "Проект отчет"])
+
+        self.assertEqual([n.title for n in self.storage.search_notes("проект", "title")],
+                         ["Проект отчет"])
+        self.assertEqual([n.title for n in self.storage.search_notes("дом", "tags")],
+                         ["Покупки"])
+        self.assertEqual(self.storage.search_notes("дом", "content"), [])
+        self.assertEqual(self.storage.search_notes("!!!"), [])
+
+    def test_search_top_ranked_by_bm25_with_field_boosts(self):
+        """Тест --top: совпадение в заголовке выше, чем в тегах, а в тегах - чем в тексте"""
+        self.storage.set_trigram_index(True)
+        self.storage.add_note(Note(id=None, title="Отчет", content="", created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="Тексты", content="годовой отчет",
+                                   created_at="2024-01-03"))
+        self.storage.add_note(Note(id=None, title="Теги", content="", tags=["отчет"],
+                                   created_at="2024-01-02"))
+        self.storage.add_note(Note(id=None, title="Другое", content="", created_at="2024-01-04"))
+
+        for search in (self.storage.search_notes, self.storage.scan_notes):
+            self.assertEqual([n.title for n in search("отчет")], ["Тексты", "Теги", "Отчет"])
+            self.assertEqual([n.title for n in search("отчет", top=3)],
+                             ["Отчет", "Теги", "Тексты"])
+            self.assertEqual([n.title for n in search("отчет", top=1, full=False)], ["Отчет"])
+
+        # Статистика индекса обновляется вместе с заметками, без пересчета
+        self.storage.update_note(Note(id=2, title="Отчет отчет", content="годовой отчет"))
+        self.storage.delete_note(1)
+        self.assertEqual([n.title for n in self.storage.search_notes("отчет", top=2)],
+                         ["Отчет отчет", "Теги"])
+
+    def test_scan_top_without_index_keeps_newest(self):
+        """Тест --top для выражений и коротких подстрок: самые новые совпадения"""
+        self.storage.add_note(Note(id=None, title="ab 1", content="", created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="ab 2", content="", created_at="2024-01-02"))
+        self.storage.add_note(Note(id=None, title="ab 3", content="", created_at="2024-01-03"))
+
+        self.assertEqual([n.title for n in self.storage.scan_notes("ab", top=2)], ["ab 3", "ab 2"])
+        self.assertEqual([n.title for n in self.storage.scan_notes(r"ab [12]", regex=True, top=1)],
+                         ["ab 2"])
+
+    def test_search_index_follows_changes(self):
+        """Тест синхронизации FTS-индекса триггерами"""
+        self.storage.add_note(Note(id=1, title="Old title", content=""))
+        self.assertEqual(len(self.storage.search_notes("old")), 1)
+
+        self.storage.update_note(Note(id=1, title="New title", content=""))
+        self.assertEqual(self.storage.search_notes("old"), [])
+        self.assertEqual(len(self.storage.search_notes("new")), 1)
+
+        self.storage.delete_note(1)
+        self.assertEqual(self.storage.search_notes("new"), [])
+
+    def test_build_fts_query(self):
+        """Тест построения запроса FTS5"""
+        self.assertEqual(Storage.build_fts_query("Note 1", "title"), '{title} : "note 1"*')
+        self.assertEqual(Storage.build_fts_query('a "b"', "all"),
+                         '{title content tags} : "a b"*')
+        self.assertIsNone(Storage.build_fts_query("  ", "all"))
+
+    def test_get_tag_counts(self):
+        """Тест подсчета заметок по тегам через note_tags"""
+        self.storage.add_note(Note(id=1, title="Note 1", content="", tags=["python", "test"]))
+        self.storage.add_note(Note(id=2, title="Note 2", content="", tags=["python", "python"]))
+        self.storage.add_note(Note(id=3, title="Note 3", content="", tags=["тест"]))
+
+        self.assertEqual(self.storage.get_tag_counts(),
+                         [("python", 2), ("test", 1), ("тест", 1)])
+
+        # Изменение и удаление заметок поддерживают связи в актуальном состоянии
+        self.storage.update_note(Note(id=1, title="Note 1", content="", tags=["code"]))
+        self.storage.delete_note(3)
+        self.assertEqual(self.storage.get_tag_counts(), [("code", 1), ("python", 1)])
+
+    def test_tags_migrated_from_json_column(self):
+        """Тест переноса тегов из JSON-колонки при миграции"""
+        import sqlite3
+
+        self.storage.connection
+        with sqlite3.connect(self.db_file.name) as conn:
+            # Имитируем старую БД: теги есть только в JSON-колонке
+            conn.execute("INSERT INTO notes (title, content, tags) VALUES ('A', '', '[\"x\", \"y\"]')")
+            conn.execute("INSERT INTO notes (title, content, tags) VALUES ('B', '', 'not json')")
+            conn.execute('DELETE FROM note_tags')
+            conn.execute('DELETE FROM tags')
+            conn.execute('PRAGMA user_version = 2')
+
+        storage = Storage(db_path=self.db_file.name)
+        self.assertEqual(storage.get_tag_counts(), [("x", 1), ("y", 1)])
+
+    def test_unchanged_resave_skips_index_triggers(self):
+        """Тест: пересохранение без изменения текста не переписывает индексы"""
+        self.storage.set_trigram_index(True)
+        notes = [Note(id=None, title=f"Заметка {i}", content="текст", tags=["a", "b"])
+                 for i in range(20)]
+        self.storage.save_notes(notes)
+        conn = self.storage.connection
+
+        before = conn.total_changes
+        self.storage.save_notes(self.storage.load_notes())
+        # Только сами строки notes, без строк индексов из триггеров
+        self.assertEqual(conn.total_changes - before, 20)
+
+        notes[0].tags = ["c"]
+        self.storage.save_notes([notes[0]])
+        self.assertIn(("c", 1), self.storage.get_tag_counts())
+        self.assertEqual(len(self.storage.search_notes("c", "tags")), 1)
+        self.assertEqual(len(self.storage.scan_notes("c", "tags")), 1)
+
+    def test_index_triggers_guarded_on_upgrade(self):
+        """Тест: миграция 8 заменяет триггеры обновления индексов, включая
+        триграммный, если он есть"""
+        from notebook.storage import MIGRATIONS, TRIGRAM_INDEX
+
+        self.storage.set_trigram_index(True)
+        self.storage.close()
+        with sqlite3.connect(self.db_file.name) as conn:
+            # Имитируем БД версии 7: триггеры без условия
+            for name in ('notes_fts_au', 'note_tags_au', 'notes_trigram_au'):
+                conn.execute(f'DROP TRIGGER {name}')
+            for statement in MIGRATIONS[1].statements + MIGRATIONS[2].statements + TRIGRAM_INDEX:
+                if '_au AFTER UPDATE' in statement:
+                    conn.execute(statement.replace(
+                        'WHEN old.title IS NOT new.title OR old.content IS NOT new.content '
+                        'OR old.tags IS NOT new.tags ', ''))
+            conn.execute('PRAGMA user_version = 7')
+
+        storage = Storage(db_path=self.db_file.name)
+        with patch('sys.stderr'):
+            triggers = dict(storage.connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_au'"))
+        self.assertEqual(storage.schema_version(), len(MIGRATIONS))
+        for name in ('notes_fts_au', 'note_tags_au', 'notes_trigram_au'):
+            self.assertIn("WHEN old.", triggers[name])
+        storage.close()
+
+    def test_migrate_dry_run_and_batched_backfill(self):
+        """Тест плана миграций и дозаполнения тегов пачками"""
+        from notebook.storage import MIGRATIONS
+
+        self.storage.add_note(Note(id=None, title="A", content="", tags=["x", "y"]))
+        self.storage.add_note(Note(id=None, title="B", content="", tags=["y"]))
+        self.storage.add_note(Note(id=None, title="C", content=""))
+        self.storage.close()
+        with sqlite3.connect(self.db_file.name) as conn:
+            # Имитируем БД версии 2: нормализованных тегов еще нет
+            conn.execute('DELETE FROM note_tags')
+            conn.execute('DELETE FROM tags')
+            conn.execute('PRAGMA user_version = 2')
+
+        storage = Storage(db_path=self.db_file.name, auto_migrate=False)
+        plan = storage.migrate(dry_run=True, batch_size=2)
+        self.assertEqual([step['version'] for step in plan], list(range(3, len(MIGRATIONS) + 1)))
+        self.assertEqual((plan[0]['backfill_ids'], plan[0]['batches']), (3, 2))
+        self.assertEqual(storage.schema_version(), 2)
+
+        messages = []
+        storage.migrate(batch_size=2, progress=messages.append)
+        self.assertEqual(storage.schema_version(), len(MIGRATIONS))
+        self.assertEqual(storage.get_tag_counts(), [("x", 1), ("y", 2)])
+        self.assertTrue(any("дозаполнение: id 3 из 3" in m for m in messages))
+        self.assertEqual(storage.migrate(), [])
+        storage.close()
+
+    def test_connection_is_reused(self):
+        """Тест, что Storage держит одно соединение между вызовами"""
+        conn = self.storage.connection
+        self.storage.add_note(Note(id=None, title="Test", content=""))
+        self.storage.load_notes()
+        self.assertIs(self.storage.connection, conn)
+
+    def test_database_opened_lazily(self):
+        """Тест: база создается при первом обращении, а не в конструкторе"""
+        import io
+        from contextlib import redirect_stdout
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "notes.db")
+            output = io.StringIO()
+            with redirect_stdout(output):
+                storage = Storage(db_path=path)
+                self.assertFalse(os.path.exists(path))
+
+                self.assertFalse(storage.has_notes())
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual(output.getvalue(), "")
+            storage.close()
+
+    def test_current_schema_skips_ddl(self):
+        """Тест: при актуальной версии схемы DDL не выполняется"""
+        self.storage.add_note(Note(id=None, title="Test", content=""))
+        self.storage.close()
+
+        statements = []
+        connect = sqlite3.connect
+
+        def traced_connect(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        storage = Storage(db_path=self.db_file.name)
+        with patch.object(Storage, '_migrate') as migrate, \
+                patch('notebook.storage.sqlite3.connect', side_effect=traced_connect):
+            storage.get_note_by_id(1)
+
+        migrate.assert_not_called()
+        self.assertTrue(statements)
+        self.assertFalse([s for s in statements if s.lstrip().upper().startswith("CREATE")])
+        storage.close()
+
+    def test_pragma_profiles(self):
+        """Тест применения профилей PRAGMA"""
+        fast = Storage(db_path=self.db_file.name, profile="fast")
+        self.assertEqual(fast.connection.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        self.assertEqual(fast.connection.execute('PRAGMA journal_mode').fetchone()[0], "wal")
+        fast.close()
+
+        self.assertEqual(self.storage.connection.execute('PRAGMA synchronous').fetchone()[0], 2)  # FULL
+
+        with self.assertRaises(ValueError):
+            Storage(db_path=self.db_file.name, profile="unknown")
+
+    def test_close_and_context_manager(self):
+        """Тест закрытия соединений и работы как контекстного менеджера"""
+        with Storage(db_path=self.db_file.name) as storage:
+            conn = storage.connection
+            storage.add_note(Note(id=None, title="Test", content=""))
+
+        # После close() старое соединение закрыто, а новое открывается по требованию
+        with self.assertRaises(Exception):
+            conn.execute('SELECT 1')
+        self.assertEqual(len(storage.load_notes()), 1)
+        self.assertIsNot(storage.connection, conn)
+        storage.close()
+
+    def test_bulk_insert(self):
+        """Тест массовой вставки с отложенными индексами и триггерами"""
+        self.storage.add_note(Note(id=None, title="Existing", content="", tags=["old"]))
+        schema_before = self.storage.connection.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name = 'notes' ORDER BY name"
+        ).fetchall()
+
+        notes = (Note(id=None, title=f"Bulk {i}", content="Массовая вставка",
+                      tags=["bulk", "old"] if i % 2 else ["bulk"]) for i in range(25))
+        inserted = self.storage.bulk_insert(notes, chunk_size=10)
+
+        self.assertEqual(inserted, 25)
+        self.assertEqual(len(self.storage.load_notes()), 26)
+        # Индексы и триггеры восстановлены
+        schema_after = self.storage.connection.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name = 'notes' ORDER BY name"
+        ).fetchall()
+        self.assertEqual(schema_before, schema_after)
+        # Производные таблицы дозаполнены
+        self.assertEqual(len(self.storage.search_notes("массовая")), 25)
+        self.assertEqual(self.storage.get_tag_counts(), [("bulk", 25), ("old", 13)])
+        # Триггеры снова работают для обычной записи
+        self.storage.add_note(Note(id=None, title="After", content="", tags=["new"]))
+        self.assertIn(("new", 1), self.storage.get_tag_counts())
+
+    def test_bulk_insert_rolls_back_on_error(self):
+        """Тест отката всей загрузки при ошибке"""
+        def notes():
+            yield Note(id=None, title="First", content="")
+            raise ValueError("broken input")
+
+        with self.assertRaises(ValueError):
+            self.storage.bulk_insert(notes(), chunk_size=1)
+
+        self.assertEqual(self.storage.load_notes(), [])
+        triggers = self.storage.connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+        ).fetchone()[0]
+        self.assertGreater(triggers, 0)
+
+    def test_keyset_pagination(self):
+        """Тест постраничного чтения по ключу (created_at, id) без пропусков и повторов"""
+        # Несколько заметок с одинаковой датой создания проверяют стабильность порядка
+        for i in range(7):
+            self.storage.add_note(Note(id=None, title=f"Note {i}", content="общий текст",
+                                       created_at=f"2024-01-0{i // 3 + 1}"))
+
+        for fetch in (lambda **kw: self.storage.find_notes(**kw),
+                      lambda **kw: self.storage.search_notes("общий", **kw)):
+            seen = []
+            after = None
+            while True:
+                page = fetch(limit=3, after=after)
+                if not page:
+                    break
+                seen.extend(note.id for note in page)
+                after = Storage.decode_cursor(Storage.encode_cursor(page[-1]))
+
+            self.assertEqual(seen, [7, 6, 5, 4, 3, 2, 1])
+
+    def test_summary_projection(self):
+        """Тест краткой проекции: в списках загружается только начало текста"""
+        note_id = self.storage.add_note(Note(id=None, title="Лог", content="лог " * 1000))
+        self.storage.add_note(Note(id=None, title="Короткая", content="лог"))
+
+        for notes in (self.storage.find_notes(full=False),
+                      self.storage.search_notes("лог", full=False)):
+            long_note = next(note for note in notes if note.id == note_id)
+            self.assertEqual(len(long_note.content), 101)
+            self.assertEqual(long_note.content_size, len(("лог " * 1000).encode('utf-8')))
+            self.assertTrue(long_note.is_preview)
+            self.assertIn("...", str(long_note))
+
+            short_note = next(note for note in notes if note.id != note_id)
+            self.assertEqual(short_note.content, "лог")
+            self.assertFalse(short_note.is_preview)
+
+        full_note = self.storage.find_notes()[-1]
+        self.assertEqual(full_note.content, "лог " * 1000)
+        self.assertIsInstance(full_note, Note)
+
+        # Превью не должно перезаписать полный текст
+        with patch('builtins.print'):
+            self.assertFalse(self.storage.update_note(long_note))
+        self.assertEqual(self.storage.get_note_by_id(note_id).content, "лог " * 1000)
+
+    def test_load_rows(self):
+        """Тест массовой загрузки строк в NoteRow"""
+        self.storage.add_note(Note(id=None, title="A", content="a", tags=["x"],
+                                   created_at="2024-01-01T00:00:00"))
+        self.storage.add_note(Note(id=None, title="B", content="b", category=NoteCategory.WORK,
+                                   created_at="2024-01-02T00:00:00"))
+
+        rows = self.storage.load_rows()
+
+        self.assertEqual([row.title for row in rows], ["B", "A"])
+        self.assertEqual(rows[0].category, NoteCategory.WORK)
+        self.assertEqual(rows[1].tags, ["x"])
+        self.assertEqual([row.to_dict() for row in rows],
+                         [note.to_dict() for note in self.storage.load_notes()])
+
+    def test_query_cache(self):
+        """Тест кэша запросов: повторы из кэша, сброс при записи любого соединения"""
+        storage = Storage(db_path=self.db_file.name, cache_size=16)
+        storage.add_note(Note(id=None, title="A", content="a", tags=["x"]))
+
+        first = storage.find_notes()
+        # Изменение возвращенной заметки не должно попасть в кэш
+        first[0].title = "Changed in memory"
+        self.assertEqual(storage.find_notes()[0].title, "A")
+        storage.get_tag_counts()
+        storage.get_tag_counts()
+        self.assertEqual(storage.cache_stats(), {'hits': 2, 'misses': 2, 'size': 2})
+
+        # Запись через то же хранилище
+        storage.add_note(Note(id=None, title="B", content="b"))
+        self.assertEqual(len(storage.find_notes()), 2)
+
+        # Запись из другого соединения (как из другого процесса)
+        with sqlite3.connect(self.db_file.name) as other:
+            other.execute("DELETE FROM notes WHERE title = 'A'")
+        other.close()
+        self.assertEqual([note.title for note in storage.find_notes()], ["B"])
+        self.assertEqual(storage.get_tag_counts(), [])
+        storage.close()
+
+    def test_query_cache_session_commit(self):
+        """Тест сброса кэша запросов после записи сессией"""
+        storage = Storage(db_path=self.db_file.name, cache_size=16)
+        note_id = storage.add_note(Note(id=None, title="A", content="a"))
+        storage.get_note_by_id(note_id)
+
+        with storage.session() as s:
+            s.get(note_id).title = "B"
+
+        self.assertEqual(storage.get_note_by_id(note_id).title, "B")
+        storage.close()
+
+    def test_decode_cursor_invalid(self):
+        """Тест разбора поврежденного токена продолжения"""
+        for token in ("###", "bm90IGpzb24", Storage.encode_cursor(Note(id="x", title="", content=""))):
+            with self.assertRaises(ValueError):
+                Storage.decode_cursor(token)
+
+    def test_has_notes(self):
+        """Тест проверки наличия заметок"""
+        self.assertFalse(self.storage.has_notes())
+        self.storage.add_note(Note(id=None, title="Test", content=""))
+        self.assertTrue(self.storage.has_notes())
+
+    def test_save_notes_upserts(self):
+        """Тест: save_notes обновляет и добавляет переданные заметки, не трогая остальные"""
+        self.storage.save_notes([Note(id=1, title="First", content="Content")])
+        # Заметка, добавленная "другим процессом" между чтением и сохранением
+        other_id = self.storage.add_note(Note(id=None, title="Other", content=""))
+
+        new_note = Note(id=None, title="New", content="")
+        self.storage.save_notes([Note(id=1, title="First edited", content="Content"), new_note])
+
+        titles = {note.id: note.title for note in self.storage.load_notes()}
+        self.assertEqual(titles[1], "First edited")
+        self.assertEqual(titles[other_id], "Other")
+        self.assertEqual(titles[new_note.id], "New")
+        self.assertEqual(len(titles), 3)
+
+    def test_save_notes_updates_tagged_note(self):
+        """Тест: save_notes обновляет существующую заметку с тегами"""
+        note_id = self.storage.add_note(Note(id=None, title="Tagged", content="Old", tags=["a", "b"]))
+        note = self.storage.get_note_by_id(note_id)
+        note.title = "Tagged edited"
+        note.content = "New"
+        self.storage.save_notes([note])
+
+        saved = self.storage.get_note_by_id(note_id)
+        self.assertEqual(saved.title, "Tagged edited")
+        self.assertEqual(saved.content, "New")
+        self.assertEqual(saved.tags, ["a", "b"])
+        self.assertEqual(dict(self.storage.get_tag_counts()), {"a": 1, "b": 1})
+
+    def test_nested_write_transaction(self):
+        """Тест: вложенная транзакция - точка сохранения, ее ошибка не откатывает внешнюю"""
+        with self.storage.write_transaction():
+            kept_id = self.storage.add_note(Note(id=None, title="Kept", content=""))
+            with self.assertRaises(RuntimeError):
+                with self.storage.write_transaction() as conn:
+                    conn.execute("UPDATE notes SET title = 'Lost' WHERE id = ?", (kept_id,))
+                    raise RuntimeError("сбой команды")
+            self.storage.add_note(Note(id=None, title="Second", content=""))
+
+        titles = sorted(note.title for note in self.storage.load_notes())
+        self.assertEqual(titles, ["Kept", "Second"])
+
+        with self.assertRaises(RuntimeError):
+            with self.storage.write_transaction():
+                self.storage.add_note(Note(id=None, title="Rolled back", content=""))
+                raise RuntimeError("сбой пакета")
+        self.assertEqual(len(self.storage.load_notes()), 2)
+
+    def test_reads_inside_transaction_do_not_commit(self):
+        """Тест: чтения внутри write_transaction не фиксируют ее раньше времени"""
+        with self.assertRaises(RuntimeError):
+            with self.storage.write_transaction():
+                note_id = self.storage.add_note(Note(id=None, title="Draft", content=""))
+                self.storage.load_notes()
+                self.storage.load_rows()
+                self.storage.get_next_id()
+                self.storage.load_rendered([(note_id, "2024-01-01")])
+                self.storage.save_rendered([(note_id, "2024-01-01", "block")])
+                raise RuntimeError("откат")
+
+        self.assertEqual(self.storage.load_notes(), [])
+        self.assertEqual(self.storage.load_rendered([(note_id, "2024-01-01")]), {})
+
+
+# Процесс-писатель для стресс-теста: ждет общего старта, добавляет заметки
+# через Commands, часть архивирует и пересохраняет, печатает выданные ID
+_WRITER_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+from notebook.storage import Storage
+from notebook.commands import Commands
+from notebook.models import Note
+
+db_path, worker, count, start_file = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5]
+storage = Storage(db_path=db_path)
+commands = Commands(storage)
+while not os.path.exists(start_file):
+    time.sleep(0.001)
+
+ids = []
+for i in range(count):
+    result = commands.add_note(f"w{worker}-{i}", "stress текст", "work", tags=[f"w{worker}"])
+    ids.append(int(result.split("ID: ")[1].split(")")[0]))
+    if i % 3 == 0:
+        commands.archive_note(ids[-1])
+    if i % 4 == 0:
+        note = storage.get_note_by_id(ids[-1])
+        note.content = "stress пересохранена"
+        storage.save_notes([note])
+print(json.dumps(ids))
+"""
+
+
+class TestConcurrentWriters(unittest.TestCase):
+    """Тесты параллельной записи из нескольких процессов"""
+
+    WRITERS = 32
+    NOTES_PER_WRITER = 15
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "notes.db")
+        # Схема создается заранее, чтобы писатели не мигрировали одновременно
+        storage = Storage(db_path=self.db_path)
+        storage.has_notes()
+        storage.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_no_lost_or_duplicated_notes(self):
+        """Стресс-тест: 32 процесса пишут одновременно, заметки не теряются и не дублируются"""
+        import json
+        import subprocess
+
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        start_file = os.path.join(self.tmp.name, "start")
+        writers = [
+            subprocess.Popen([sys.executable, '-c', _WRITER_SCRIPT, root, self.db_path,
+                              str(worker), str(self.NOTES_PER_WRITER), start_file],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            for worker in range(self.WRITERS)
+        ]
+        open(start_file, 'w').close()
+
+        ids = []
+        for writer in writers:
+            out, err = writer.communicate(timeout=120)
+            self.assertEqual(writer.returncode, 0, err)
+            ids.extend(json.loads(out.strip().splitlines()[-1]))
+
+        total = self.WRITERS * self.NOTES_PER_WRITER
+        self.assertEqual(len(ids), total)
+        self.assertEqual(len(set(ids)), total)
+
+        storage = Storage(db_path=self.db_path)
+        notes = storage.load_notes()
+        self.assertEqual(sorted(note.id for note in notes), sorted(ids))
+        self.assertEqual({note.title for note in notes},
+                         {f"w{w}-{i}" for w in range(self.WRITERS)
+                          for i in range(self.NOTES_PER_WRITER)})
+        # Производные таблицы согласованы с заметками
+        self.assertEqual(sum(count for _, count in storage.get_tag_counts()), total)
+        self.assertEqual(len(storage.search_notes("stress")), total)
+        archived = storage.find_notes(status=Status.ARCHIVED)
+        self.assertEqual(len(archived), self.WRITERS * len(range(0, self.NOTES_PER_WRITER, 3)))
+        # Пересохраненные через save_notes заметки с тегами действительно обновлены
+        resaved = [note for note in notes if note.content == "stress пересохранена"]
+        self.assertEqual(len(resaved), self.WRITERS * len(range(0, self.NOTES_PER_WRITER, 4)))
+        self.assertTrue(all(note.tags for note in resaved))
+        storage.close()
+
+    def test_edit_does_not_undo_concurrent_archive(self):
+        """Тест: архивирование между чтением и записью edit не теряется"""
+        import threading
+        from notebook.commands import Commands
+
+        storage = Storage(db_path=self.db_path)
+        other = Storage(db_path=self.db_path)
+        note_id = storage.add_note(Note(id=None, title="Old", content="text"))
+        commands = Commands(storage)
+        archived, writers = [], []
+        read = storage.get_note_by_id
+
+        def get_then_archive(note_id):
+            note = read(note_id)
+            # Другой писатель архивирует заметку, пока edit держит прочитанную копию
+            writer = threading.Thread(target=lambda: archived.append(
+                Commands(other).archive_note(note_id)))
+            writers.append(writer)
+            writer.start()
+            writer.join(0.5)
+            return note
+
+        with patch.object(storage, 'get_note_by_id', side_effect=get_then_archive):
+            result = commands.edit_note(note_id, title="New")
+        writers[0].join(10)
+
+        self.assertTrue(result.startswith("Заметка обновлена"))
+        self.assertTrue(archived[0].startswith("Заметка архивирована"))
+        note = Storage(db_path=self.db_path).get_note_by_id(note_id)
+        self.assertEqual(note.title, "New")
+        self.assertEqual(note.status, Status.ARCHIVED)
+        storage.close()
+        other.close()
+
+    def test_busy_writer_retries(self):
+        """Тест: запись дожидается чужой транзакции через повтор BEGIN IMMEDIATE"""
+        import threading
+
+        storage = Storage(db_path=self.db_path, busy_timeout=10)
+        storage.has_notes()
+        holder = sqlite3.connect(self.db_path, check_same_thread=False)
+        holder.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(0.2, holder.rollback)
+        timer.start()
+
+        note_id = storage.add_note(Note(id=None, title="После ожидания", content=""))
+
+        timer.join()
+        holder.close()
+        self.assertEqual(storage.get_note_by_id(note_id).title, "После ожидания")
+        storage.close()
+
+    def test_busy_writer_gives_up(self):
+        """Тест: без повторов занятая база дает ошибку, а не зависание"""
+        storage = Storage(db_path=self.db_path, busy_timeout=10, write_retries=0)
+        storage.has_notes()
+        holder = sqlite3.connect(self.db_path)
+        holder.execute('BEGIN IMMEDIATE')
+        try:
+            with patch('builtins.print') as mock_print:
+                self.assertEqual(storage.add_note(Note(id=None, title="X", content="")), 0)
+            self.assertIn("locked", mock_print.call_args[0][0])
+        finally:
+            holder.rollback()
+            holder.close()
+            storage.close()
+
+    def test_locked_database_reported_as_error(self):
+        """Тест: при занятой базе delete и archive сообщают об ошибке,
+        а не об отсутствии заметки или архиве"""
+        from notebook.commands import Commands
+
+        storage = Storage(db_path=self.db_path, busy_timeout=10, write_retries=0)
+        note_id = storage.add_note(Note(id=None, title="Заметка", content=""))
+        holder = sqlite3.connect(self.db_path)
+        holder.execute('BEGIN IMMEDIATE')
+        try:
+            with patch('builtins.print'):
+                self.assertIsNone(storage.delete_note(note_id))
+                self.assertIsNone(storage.update_status(note_id, Status.ARCHIVED, "2024-01-02"))
+                commands = Commands(storage)
+                self.assertEqual(commands.delete_note(note_id),
+                                 f"Ошибка: не удалось удалить заметку #{note_id}")
+                self.assertEqual(commands.archive_note(note_id),
+                                 f"Ошибка: не удалось архивировать заметку #{note_id}")
+        finally:
+            holder.rollback()
+            holder.close()
+        self.assertEqual(storage.get_note_by_id(note_id).status, Status.ACTIVE)
+        storage.close()
+
+
+class TestScanSearch(unittest.TestCase):
+    """Тесты поиска перебором (scan.py и Storage.scan_notes)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "notes.db")
+        self.storage = Storage(db_path=self.db_path)
+        self.storage.add_note(Note(id=None, title="Проект отчет", content="Первый текст",
+                                   tags=["работа"], created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="Покупки", content="Купить ПРОЕКТОР, код A-17",
+                                   tags=["дом", "x\"y"], created_at="2024-01-02"))
+        self.storage.add_note(Note(id=None, title="Идея", content="", created_at="2024-01-03"))
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def titles(self, *args, **kwargs):
+        return [note.title for note in self.storage.scan_notes(*args, **kwargs)]
+
+    def test_substring(self):
+        """Тест: подстрока находится внутри слова, без учета регистра"""
+        self.assertEqual(self.titles("ект"), ["Покупки", "Проект отчет"])
+        self.assertEqual(self.titles("ЕКТ", "title"), ["Проект отчет"])
+        self.assertEqual(self.titles("бот", "tags"), ["Проект отчет"])
+        self.assertEqual(self.titles('x"y', "tags"), ["Покупки"])
+        self.assertEqual(self.titles("бот", "content"), [])
+
+    def test_regex(self):
+        """Тест поиска по регулярному выражению"""
+        self.assertEqual(self.titles(r"\b[a-z]-\d+", regex=True), ["Покупки"])
+        self.assertEqual(self.titles(r"^(идея|покупки)$", "title", regex=True),
+                         ["Идея", "Покупки"])
+        with self.assertRaises(ValueError):
+            self.storage.scan_notes("(", regex=True)
+
+    def test_pagination_and_preview(self):
+        """Тест: фильтр after, limit и превью, как у search_notes"""
+        first = self.storage.scan_notes("ект", limit=1, full=False)
+        self.assertEqual([row.title for row in first], ["Покупки"])
+        after = (first[0].created_at, first[0].id)
+        self.assertEqual(self.titles("ект", after=after), ["Проект отчет"])
+
+    def test_parallel_matches_serial(self):
+        """Тест: перебор по шардам в пуле процессов дает тот же результат"""
+        for i in range(40):
+            self.storage.add_note(Note(id=None, title=f"Заметка {i}", content=f"код B-{i}",
+                                       created_at=f"2024-02-{i % 28 + 1:02d}"))
+        serial = [note.id for note in self.storage.scan_notes(r"b-\d*7", regex=True)]
+
+        parallel = Storage(db_path=self.db_path, scan_threshold=0, scan_workers=2)
+        try:
+            with patch('notebook.scan.scan_rows', side_effect=AssertionError):
+                ids = [note.id for note in parallel.scan_notes(r"b-\d*7", regex=True)]
+            self.assertIsNotNone(parallel._scan_pool)
+        finally:
+            parallel.close()
+
+        self.assertEqual(ids, serial)
+        self.assertEqual(len(ids), 4)
+        self.assertIsNone(parallel._scan_pool)
+
+    def test_trigram_index_matches_full_scan(self):
+        """Тест: кандидаты из триграммного индекса после проверки дают тот же
+        результат, что перебор всех заметок"""
+        from benchmarks.corpus import generate_notes
+        self.storage.bulk_insert(generate_notes(100))
+        self.assertTrue(self.storage.set_trigram_index(True))
+        self.storage.bulk_insert(generate_notes(200))
+        self.storage.update_note(Note(id=1, title="Переименована", content="ПРОЕКТОР"))
+        self.storage.delete_note(2)
+
+        for term, search_in in (("ект", "all"), ("ОТЧЕТ ВСТ", "content"), ("tag1", "tags"),
+                                ("eting t", "all"), ("ерЕИме", "title"), ("zzz", "all")):
+            self.assertIsNotNone(Storage.build_trigram_query(term, search_in))
+            with_index = [note.id for note in self.storage.scan_notes(term, search_in)]
+            with patch.object(Storage, 'build_trigram_query', return_value=None):
+                full_scan = [note.id for note in self.storage.scan_notes(term, search_in)]
+            self.assertEqual(with_index, full_scan, term)
+
+    def test_trigram_index_is_opt_in(self):
+        """Тест: триграммного индекса нет по умолчанию - поиск идет перебором;
+        импорт его не строит, а удаление возвращает перебор"""
+        self.storage.add_note(Note(id=None, title="Проектор", content=""))
+        self.assertFalse(self.storage.has_trigram_index())
+        self.assertEqual([n.title for n in self.storage.scan_notes("ектор", "title")], ["Проектор"])
+        self.assertEqual([n.title for n in self.storage.scan_notes("ектор", "title", top=1)], ["Проектор"])
+        self.assertFalse(self.storage.set_trigram_index(False))
+
+        self.assertTrue(self.storage.set_trigram_index(True))
+        self.assertFalse(self.storage.set_trigram_index(True))
+        self.storage.bulk_insert([Note(id=None, title="Инспектор", content="")])
+        statements = []
+        self.storage.connection.set_trace_callback(statements.append)
+        self.assertEqual(sorted(n.title for n in self.storage.scan_notes("ектор", "title")),
+                         ["Инспектор", "Проектор"])
+        self.assertTrue(any("notes_trigram MATCH" in sql for sql in statements))
+
+        self.assertTrue(self.storage.set_trigram_index(False))
+        self.assertFalse(self.storage.has_trigram_index())
+        self.storage.add_note(Note(id=None, title="Детектор", content=""))
+        statements.clear()
+        self.assertEqual(len(self.storage.scan_notes("ектор", "title")), 3)
+        self.assertFalse(any("notes_trigram MATCH" in sql for sql in statements))
+
+    def test_build_trigram_query(self):
+        """Тест запроса к триграммному индексу и случаев, когда он не поможет"""
+        self.assertEqual(Storage.build_trigram_query('ек"т', "title"), '{title} : "ек""т"')
+        self.assertEqual(Storage.build_trigram_query("ект", "all"),
+                         '{title content tags} : "ект"')
+        self.assertIsNone(Storage.build_trigram_query("ек", "all"))
+        self.assertIsNone(Storage.build_trigram_query('x"y', "tags"))
+
+    def test_shards_cover_range(self):
+        """Тест: шарды покрывают диапазон ID без пропусков и пересечений"""
+        from notebook.scan import shards
+        self.assertEqual(shards(1, 10, 3), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(shards(5, 6, 8), [(4, 5), (5, 6)])
+
+
+class TestFuzzySearch(unittest.TestCase):
+    """Тесты нечеткого поиска и поддержки его словаря"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "notes.db")
+        self.storage = Storage(db_path=self.db_path)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def titles(self, *args, **kwargs):
+        return [note.title for note in self.storage.fuzzy_notes(*args, **kwargs)]
+
+    def vocabulary(self):
+        conn = self.storage.connection
+        terms = {row[0] for row in conn.execute('SELECT term FROM fuzzy_terms')}
+        orphans = conn.execute('SELECT count(*) FROM fuzzy_deletes WHERE term_id NOT IN '
+                               '(SELECT id FROM fuzzy_terms)').fetchone()[0]
+        self.assertEqual(orphans, 0)
+        return terms
+
+    def test_typos_ranked_by_similarity(self):
+        """Тест: слова с опечатками находятся, более полные совпадения выше"""
+        self.storage.add_note(Note(id=None, title="Квартальный отчет", content="бюджет",
+                                   created_at="2024-01-01"))
+        self.storage.add_note(Note(id=None, title="Встреча", content="обсудить отчет и бюджет",
+                                   created_at="2024-01-02"))
+        self.storage.add_note(Note(id=None, title="Покупки", content="хлеб", tags=["отчет"],
+                                   created_at="2024-01-03"))
+
+        self.assertEqual(self.titles("отчот бюджте"), ["Встреча", "Квартальный отчет", "Покупки"])
+        self.assertEqual(self.titles("отчот бюджте", limit=1), ["Встреча"])
+        self.assertEqual(self.titles("атчет", "title"), ["Квартальный отчет"])
+        self.assertEqual(self.titles("очтет", "tags"), ["Покупки"])
+        self.assertEqual(self.titles("совсемнепохоже"), [])
+        self.assertEqual(self.titles("!!"), [])
+
+    def test_index_maintained_on_add_edit_delete(self):
+        """Тест: словарь обновляется при добавлении, изменении и удалении"""
+        note_id = self.storage.add_note(Note(id=None, title="Старый заголовок", content=""))
+        self.assertEqual(self.vocabulary(), {"старый", "заголовок"})
+
+        self.storage.update_note(Note(id=note_id, title="Новый заголовок", content=""))
+        self.assertEqual(self.vocabulary(), {"новый", "заголовок"})
+        self.assertEqual(self.titles("старй"), [])
+        self.assertEqual(self.titles("новй"), ["Новый заголовок"])
+
+        self.storage.delete_note(note_id)
+        self.assertEqual(self.vocabulary(), set())
+
+    def test_bulk_and_external_writes_caught_up(self):
+        """Тест: заметки из bulk_insert и записи в обход Storage попадают в словарь
+        при разборе очереди, а не при поиске"""
+        self.storage.bulk_insert([Note(id=None, title=f"Импорт {i}", content="молоко")
+                                  for i in range(3)])
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE notes SET content = 'кефир' WHERE id = 1")
+
+        self.assertEqual(self.storage.fuzzy_backlog(), 3)
+        self.assertEqual(self.titles("малоко"), [])
+        self.assertEqual(self.storage.fuzzy_backlog(), 3)
+
+        self.assertEqual(self.storage.sync_fuzzy_backlog(batch_size=2), 3)
+        self.assertEqual(len(self.titles("малоко")), 2)
+        self.assertEqual(self.titles("кифир"), ["Импорт 0"])
+        self.assertEqual(self.storage.fuzzy_backlog(), 0)
+
+    def test_point_write_syncs_only_own_notes(self):
+        """Тест: запись переносит в словарь только свои заметки, не очередь импорта"""
+        self.storage.bulk_insert([Note(id=None, title=f"Импорт {i}", content="молоко")
+                                  for i in range(5)])
+        self.storage.add_note(Note(id=None, title="Новая", content="кефир"))
+        self.assertEqual(self.titles("кифир"), ["Новая"])
+        self.assertEqual(self.storage.fuzzy_backlog(), 5)
+
+        # Правка заметки из очереди переносит ее, остальные ждут
+        note = self.storage.get_note_by_id(1)
+        note.content = "творог"
+        self.storage.update_note(note)
+        self.assertEqual(self.titles("тварог"), ["Импорт 0"])
+        self.assertEqual(self.storage.fuzzy_backlog(), 4)
+
+    def test_upgrade_builds_fuzzy_index(self):
+        """Тест: автоматическое обновление до словаря сразу строит его по старым заметкам"""
+        self.storage.add_note(Note(id=None, title="Старая", content="молоко"))
+        self.storage.close()
+        with sqlite3.connect(self.db_path) as conn:
+            # Имитируем БД версии 5: словаря нечеткого поиска еще нет
+            for name in ('fuzzy_dirty_ai', 'fuzzy_dirty_au', 'fuzzy_notes_ad',
+                         'fuzzy_postings_ad', 'fuzzy_terms_ad'):
+                conn.execute(f'DROP TRIGGER {name}')
+            for table in ('fuzzy_dirty', 'fuzzy_deletes', 'fuzzy_postings', 'fuzzy_terms'):
+                conn.execute(f'DROP TABLE {table}')
+            conn.execute('PRAGMA user_version = 5')
+
+        self.storage = Storage(db_path=self.db_path)
+        with patch('sys.stderr'):
+            self.assertEqual(self.titles("малоко"), ["Старая"])
+        self.assertEqual(self.storage.fuzzy_backlog(), 0)
+
+    def test_import_builds_fuzzy_index(self):
+        """Тест: после import_notes заметки сразу находятся нечетким поиском"""
+        from notebook.commands import Commands
+
+        path = os.path.join(self.tmp.name, "notes.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"title": "Импорт", "content": "молоко"}\n')
+        result = Commands(self.storage).import_notes(path)
+
+        self.assertNotIn("не в словаре", result)
+        self.assertEqual(self.titles("малоко"), ["Импорт"])
+
+    def test_unchanged_resave_not_queued(self):
+        """Тест: пересохранение заметки без изменения текста не ставит ее в очередь"""
+        self.storage.bulk_insert([Note(id=None, title="Старая", content="молоко")])
+        self.storage.sync_fuzzy_backlog()
+        note = self.storage.get_note_by_id(1)
+        with self.storage.write_transaction() as conn:
+            self.storage.save_notes([note])
+            queued = conn.execute('SELECT count(*) FROM fuzzy_dirty').fetchone()[0]
+        self.assertEqual(queued, 0)
+
+    def test_queue_seq_not_reused_after_delete(self):
+        """Тест: после удаления последней заметки очереди новая запись все равно индексируется"""
+        self.storage.bulk_insert([Note(id=None, title="Старая", content="молоко")])
+        with self.storage.write_transaction():
+            self.storage.delete_note(1)
+            self.storage.add_note(Note(id=None, title="Новая", content="кефир"))
+        self.assertEqual(self.titles("кифир"), ["Новая"])
+        self.assertEqual(self.storage.fuzzy_backlog(), 0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,90 @@
+# tests/test_timings.py
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from notebook.storage import Storage
+from notebook.commands import Commands
+from notebook.models import Note
+from notebook.timings import Timings
+
+
+class TestTimings(unittest.TestCase):
+    """Тесты для timings.py"""
+
+    def test_phase_and_counters(self):
+        """Тест накопления фаз и счетчиков"""
+        timings = Timings()
+        with timings.phase('a'):
+            pass
+        timings.record('a', 0.5)
+        timings.count_rows([(1, "ab", "где", b"\x00\x01", None)])
+
+        self.assertEqual(timings.phases['a'][1], 2)
+        self.assertGreaterEqual(timings.phases['a'][0], 0.5)
+        self.assertEqual(timings.counters['строк прочитано'], 1)
+        # "ab" - 2 байта, "где" - 6 байт UTF-8, BLOB - 2 байта
+        self.assertEqual(timings.counters['байт декодировано'], 10)
+
+        report = timings.report()
+        self.assertIn("=== Тайминги ===", report)
+        self.assertIn("строк прочитано", report)
+
+    def test_instrument_only_wraps_instance(self):
+        """Тест: замер ставится на экземпляр, класс остается без оберток"""
+        class Service:
+            def work(self, value):
+                return value * 2
+
+        timings = Timings()
+        service = Service()
+        timings.instrument(service, 'service', ['work'])
+
+        self.assertEqual(service.work(21), 42)
+        self.assertEqual(timings.phases['service.work'][1], 1)
+        self.assertNotIn('work', vars(Service()))
+
+
+class TestInstrumentedStorage(unittest.TestCase):
+    """Тесты таймингов хранилища и команд"""
+
+    def setUp(self):
+        self.db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.db_file.close()
+
+    def tearDown(self):
+        try:
+            os.unlink(self.db_file.name)
+        except OSError:
+            pass
+
+    def test_storage_and_commands_phases(self):
+        """Тест фаз хранилища, отрисовки и счетчиков прочитанных строк"""
+        timings = Timings()
+        storage = Storage(db_path=self.db_file.name, timings=timings)
+        storage.add_note(Note(id=None, title="Отчет", content="текст отчета"))
+        commands = Commands(storage, timings=timings)
+
+        commands.search_notes("отчет")
+
+        for phase in ('storage.connect', 'storage.init_db', 'storage.add_note',
+                      'storage.scan_notes', 'storage.decode', 'commands.search_notes',
+                      'commands.render'):
+            self.assertIn(phase, timings.phases)
+        self.assertEqual(timings.counters['строк прочитано'], 1)
+        storage.close()
+
+    def test_disabled_by_default(self):
+        """Тест: без таймингов методы не оборачиваются"""
+        storage = Storage(db_path=self.db_file.name)
+
+        self.assertIsNone(storage.timings)
+        self.assertNotIn('find_notes', vars(storage))
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()